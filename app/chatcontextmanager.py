@@ -2,9 +2,10 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
-import requests
 import os
 
+from app.services.http.clients import http_client
+
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -12,6 +13,32 @@ MAX_CONTEXT_MESSAGES = 10  # Keep last 10 messages for context
 CONTEXT_RETENTION_DAYS = 30  # Keep context for 30 days
 MAX_CONTEXT_LENGTH = 4000  # Max characters for context summary
 
+CHAT_CONTEXTS_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS chat_contexts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            message_id TEXT,
+            role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+            message_text TEXT NOT NULL,
+            message_type TEXT DEFAULT 'text',
+            metadata TEXT,
+            timestamp TEXT NOT NULL,
+            session_id TEXT,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        );
+        """
+
+CHAT_CONTEXTS_USER_INDEX_SQL = """
+        CREATE INDEX IF NOT EXISTS idx_chat_contexts_user_timestamp 
+        ON chat_contexts(user_id, timestamp DESC);
+        """
+
+CHAT_CONTEXTS_SESSION_INDEX_SQL = """
+        CREATE INDEX IF NOT EXISTS idx_chat_contexts_session 
+        ON chat_contexts(session_id);
+        """
+
 class ChatContextManager:
     def __init__(self, cf_account_id: str, cf_d1_database_id: str, cf_api_token: str):
         self.cf_account_id = cf_account_id
@@ -30,7 +57,7 @@ class ChatContextManager:
             "params": params or []
         }
         try:
-            response = requests.post(url, json=data, headers=headers, timeout=15)
+            response = http_client("d1").post(url, json=data, headers=headers)
             response.raise_for_status()
             result = response.json()
             
@@ -48,37 +75,11 @@ class ChatContextManager:
             raise
 
     def create_chat_context_table(self):
-        """Create chat context table in D1"""
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS chat_contexts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT NOT NULL,
-            message_id TEXT,
-            role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
-            message_text TEXT NOT NULL,
-            message_type TEXT DEFAULT 'text',
-            metadata TEXT,
-            timestamp TEXT NOT NULL,
-            session_id TEXT,
-            created_at TEXT NOT NULL,
-            expires_at TEXT NOT NULL
-        );
-        """
-        
-        create_index_sql = """
-        CREATE INDEX IF NOT EXISTS idx_chat_contexts_user_timestamp 
-        ON chat_contexts(user_id, timestamp DESC);
-        """
-        
-        create_session_index_sql = """
-        CREATE INDEX IF NOT EXISTS idx_chat_contexts_session 
-        ON chat_contexts(session_id);
-        """
-        
+        """Create chat context table in D1 (startup uses d1_migrations)"""
         try:
-            self.execute_d1_query(create_table_sql)
-            self.execute_d1_query(create_index_sql)
-            self.execute_d1_query(create_session_index_sql)
+            self.execute_d1_query(CHAT_CONTEXTS_TABLE_SQL)
+            self.execute_d1_query(CHAT_CONTEXTS_USER_INDEX_SQL)
+            self.execute_d1_query(CHAT_CONTEXTS_SESSION_INDEX_SQL)
             logger.info("Chat context table and indexes created successfully")
         except Exception as e:
             logger.error(f"Failed to create chat context table: {e}")
@@ -402,7 +403,7 @@ def call_ai_service_with_context(prompt: str) -> str:
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     
     try:
-        response = requests.post(f"{worker_url}/chat", json=llm_payload, headers=headers, timeout=60)
+        response = http_client("worker").post(f"{worker_url}/chat", json=llm_payload, headers=headers)
         response.raise_for_status()
         result = response.json()
         return result.get("response", "I'm here to help with your cosmic journey.")
@@ -170,6 +170,11 @@ PROMPTS = {
         "hi": "🌆 कृपया अपना *जन्म शहर* बताएं। आप इसे टाइप कर सकते हैं (जैसे: *मुंबई, भारत*) या अधिक सटीकता के लिए लोकेशन 📍 भेज सकते हैं।",
         "hi-en": "🌆 Kripya apna *janam sheher* batayein. Aap type kar sakte hain (Udaharan: *Mumbai, India*) ya accurate ke liye location 📍 bhej sakte hain."
     },
+    "confirm_birth_city": {
+        "en": "📍 Did you mean *{city}*? Reply *Yes*, or type your birth city again.",
+        "hi": "📍 क्या आपका मतलब *{city}* है? *हाँ* लिखें, या अपना जन्म शहर फिर से टाइप करें।",
+        "hi-en": "📍 Kya aapka matlab *{city}* hai? *Haan* likhein, ya apna janam sheher dobara type karein."
+    },
     "profile_complete": {
         "en": "🎉 Your cosmic profile is ready! Ask me anything, or select an option below to explore your universe further ✨",
         "hi": "🎉 आपकी कॉस्मिक प्रोफाइल तैयार है! मुझसे कुछ भी पूछें, या नीचे विकल्प चुनकर अपने ब्रह्मांड की खोज जारी रखें ✨",
@@ -15,6 +15,7 @@ class Settings(BaseSettings):
     PORT: int = 8000
     WORKERS: int = 1
     RELOAD: bool = False
+    ADMIN_TOKEN: Optional[str] = None  # bearer token for /metrics* and /charts/batch; unset = those routes answer 403
     
     # ==============================================
     # CLOUDFLARE WORKER CONFIGURATION
@@ -28,6 +29,9 @@ class Settings(BaseSettings):
     CF_ACCOUNT_ID: str
     CF_D1_DATABASE_ID: str
     CF_API_TOKEN: str
+    D1_MIGRATIONS_ON_STARTUP: bool = True  # apply pending schema migrations (one version check on a warm boot)
+    D1_MIGRATION_LEASE_SECONDS: int = 300  # cross-instance migration lease; expires if the leader dies
+    D1_MIGRATION_WAIT_TIMEOUT: float = 120.0  # how long followers wait for the leader to finish
     
     # ==============================================
     # WHATSAPP BUSINESS API CONFIGURATION
@@ -94,12 +98,109 @@ class Settings(BaseSettings):
     # Free tier configuration
     FREE_TIER_QUESTIONS: int = 3
     MESSAGE_TTL: int = 300  # 5 minutes
-    MAX_PROCESSED_MESSAGES: int = 1000
-    
+    MAX_PROCESSED_MESSAGES: int = 1000  # per-process dedup cache size
+
+    # ==============================================
+    # SHARED LOCAL STATE CONFIGURATION
+    # ==============================================
+    STATE_DB_PATH: str = "./state/state.db"  # SQLite file shared by all workers in the container
+    DEDUP_BACKEND: str = "sqlite"  # "sqlite" (shared across workers) or "memory"
+    SESSION_BACKEND: str = "sqlite"  # conversation state: "sqlite" (shared) or "memory"
+    SESSION_MAX_ENTRIES: int = 50000
+    SESSION_TTL_USERS: int = 7 * 24 * 3600  # onboarding / profile flow state
+    SESSION_TTL_FLOWS: int = 24 * 3600  # compatibility, feedback, question and payment flows
+
+    # ==============================================
+    # WEBHOOK PROCESSING CONFIGURATION
+    # ==============================================
+    WEBHOOK_ASYNC_MODE: bool = True  # ack webhook immediately, process on background queue
+    WEBHOOK_QUEUE_WORKERS: int = 16  # per-user lanes keep each sender's messages ordered
+    WEBHOOK_QUEUE_MAXSIZE: int = 500
+    WEBHOOK_QUEUE_DRAIN_TIMEOUT: float = 25.0  # seconds to finish queued jobs on shutdown
+    CAPTURE_PATH: Optional[str] = None  # append /whatsapp and /webhook/payment bodies to this JSONL file (replay_webhooks.py)
+
+    # ==============================================
+    # STARTUP CONFIGURATION
+    # ==============================================
+    FAST_STARTUP: bool = True  # load models/ephemeris on a background thread after binding; False blocks startup until warm
+    PRELOAD_APP: bool = True  # gunicorn: load the app and shared models in the master, share them copy-on-write with workers
+
+    # ==============================================
+    # OUTBOUND HTTP CONFIGURATION
+    # ==============================================
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 50  # per host
+    HTTP_MAX_KEEPALIVE: int = 20  # per host
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_TIMEOUT_D1: float = 30.0
+    HTTP_TIMEOUT_GRAPH: float = 15.0
+    HTTP_TIMEOUT_GRAPH_UPLOAD: float = 30.0  # media uploads (chart PDFs) to graph.facebook.com
+    HTTP_TIMEOUT_WORKER: float = 60.0
+    HTTP_TIMEOUT_LAGO: float = 20.0
+
+    # ==============================================
+    # OUTBOUND WHATSAPP CONFIGURATION
+    # ==============================================
+    OUTBOUND_ASYNC: bool = True  # send replies through the paced background dispatcher
+    OUTBOUND_GLOBAL_RATE: float = 80.0  # msgs/s per phone number (Meta standard tier; raise for higher tiers)
+    OUTBOUND_RATE_BACKEND: str = "sqlite"  # global bucket: "sqlite" (shared by all workers) or "memory" (rate / WORKERS each)
+    OUTBOUND_PER_RECIPIENT_RATE: float = 2.0  # msgs/s to a single user once the burst is spent
+    OUTBOUND_PER_RECIPIENT_BURST: int = 3
+    OUTBOUND_MAX_ATTEMPTS: int = 4  # retries on 429/5xx/transport errors with exponential backoff
+    OUTBOUND_MAX_PENDING: int = 5000  # beyond this, sends fall back to synchronous
+    OUTBOUND_DRAIN_TIMEOUT: float = 10.0
+
     # ==============================================
     # SWISS EPHEMERIS CONFIGURATION
     # ==============================================
-    SWEPH_EPHE_PATH: str = "./ephe"
+    SWEPH_EPHE_PATH: str = "./ephe"  # .se1 files and the skyfield kernel, checked against SHA256SUMS
+    SKYFIELD_KERNEL: str = "de421.bsp"
+    EPHEMERIS_ALLOW_DOWNLOAD: bool = True  # fetch a missing kernel at startup; False fails immediately
+    EPHEMERIS_DOWNLOAD_TIMEOUT: float = 30.0
+    EPHEMERIS_VERIFY_CHECKSUMS: bool = True
+    EPHEMERIS_WARM_START_YEAR: int = 1940  # warmup touches the ephemerides from here...
+    EPHEMERIS_WARM_YEARS_AHEAD: int = 2  # ...through this many years after the current one
+
+    # ==============================================
+    # GEO CONFIGURATION
+    # ==============================================
+    DEFAULT_TIMEZONE: str = "Asia/Kolkata"  # when a location has no resolvable timezone
+    TIMEZONE_IN_MEMORY: bool = True  # load timezonefinder polygons into memory (shared copy-on-write when preloading)
+    TIMEZONE_GRID_DEGREES: float = 0.01  # coordinates snapped to this grid for the lookup cache (~1.1 km)
+    TIMEZONE_CACHE_SIZE: int = 100000  # cached grid cells per worker (LRU)
+    GAZETTEER_PATH: str = "./state/gazetteer.bin"  # offline city index, built on first use from the sources below
+    GAZETTEER_GEONAMES_PATH: Optional[str] = None  # GeoNames dump (e.g. cities15000.txt) indexed alongside CITY_COORDINATES
+    GAZETTEER_MIN_SCORE: float = 0.75  # typed city names matching below this fall back to the default city; inexact matches above it are confirmed with the user
+
+    # ==============================================
+    # CHART CACHE CONFIGURATION
+    # ==============================================
+    CHART_CACHE_SIZE: int = 4096  # natal charts kept in memory per worker (LRU)
+    CHART_CACHE_PATH: Optional[str] = "./state/charts.db"  # persistent SQLite cache shared by workers; None = memory only
+    CHART_COORD_PRECISION: int = 4  # lat/lng decimals in the cache key (~11 m)
+    TRANSIT_PREFILL_DAYS: int = 30  # daily transits cached for ±N days around today (UTC), rolled at midnight
+    GENERATE_CHART_ENGINE: str = "swisseph"  # /generate natal chart: "swisseph" (memoized) or "kerykeion"
+    CHART_BATCH_WORKERS: int = 0  # processes in the /charts/batch pool; 0 = CPU count
+    CHART_BATCH_CHUNK_SIZE: int = 32  # birth records per pool task
+    CHART_BATCH_MAX_RECORDS: int = 500  # largest /charts/batch request body; bigger backfills use the chart_batch CLI
+    EVENT_INDEX_PATH: Optional[str] = "./state/events.db"  # precomputed ingresses/stations/lunations/eclipses; None = memory only
+    EVENT_INDEX_YEARS_AHEAD: int = 1  # years after the current one computed at startup
+
+    # ==============================================
+    # DAILY HOROSCOPE PRECOMPUTE CONFIGURATION
+    # ==============================================
+    HOROSCOPE_PRECOMPUTE_ENABLED: bool = True  # run the nightly precompute scheduler in one worker per container
+    HOROSCOPE_PRECOMPUTE_INTERVAL_MINUTES: int = 15  # how often due users are checked
+    HOROSCOPE_PRECOMPUTE_AFTER_MINUTES: int = 5  # generate once the user's local clock passes midnight + this
+    HOROSCOPE_PRECOMPUTE_CONCURRENCY: int = 4  # Worker /personal calls in flight
+    HOROSCOPE_PRECOMPUTE_MAX_PER_RUN: int = 500  # horoscopes generated per pass at most; the rest wait for the next
+    HOROSCOPE_ACTIVE_DAYS: int = 7  # users who messaged within this many days get one
+    HOROSCOPE_CLAIM_SECONDS: int = 300  # a claimed horoscope can be retried by another container after this
+    HOROSCOPE_MAX_ATTEMPTS: int = 3  # generation attempts per user and day
+    HOROSCOPE_RETENTION_DAYS: int = 7  # stored horoscopes older than this are deleted
+    HOROSCOPE_GENERATION_MODE: str = "personal"  # "personal": one Worker call per user; "archetype": one per (sun, moon, rising, date, language)
+    HOROSCOPE_ARCHETYPE_CACHE_SIZE: int = 4096  # archetype readings kept in memory per worker
     
 
     # ==============================================
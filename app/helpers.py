@@ -1,118 +1,212 @@
 
+import logging
+import re
 from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from app.config.constants import CITY_COORDINATES
-
-
-
-def parse_date_flexible(date_str: str) -> datetime:
-    date_str = date_str.strip().lower()
-    
-    if date_str in ['unknown', 'not known', 'dont know', "don't know", 'na', 'n/a']:
-        raise ValueError("Date unknown - using fallback") 
-
-    formats_with_year = [
-        "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y",
-        "%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%y", "%d-%m-%y"
-    ]
-    formats_without_year = [
-        "%d/%m", "%d-%m", "%d.%m", "%d %m", "%m/%d", "%m-%d"
-    ]
-
-    for fmt in formats_with_year:
-        try:
-            parsed = datetime.strptime(date_str, fmt)
-            if parsed.year < 100:
-                parsed = parsed.replace(year=parsed.year + (2000 if parsed.year <= 30 else 1900))
-            return parsed
-        except ValueError:
+from app.config.settings import settings
+from app.services.geo.gazetteer import get_gazetteer
+
+logger = logging.getLogger(__name__)
+
+
+
+UNKNOWN_ANSWERS = frozenset(['unknown', 'not known', 'dont know', "don't know", 'na', 'n/a'])
+YES_ANSWERS = frozenset(['yes', 'y', 'yes please', 'yeah', 'yep', 'correct', 'right', 'ok', 'okay', 'haan', 'han', 'ha', 'हाँ', 'हां', 'जी हाँ'])
+NO_ANSWERS = frozenset(['no', 'n', 'nope', 'wrong', 'nahi', 'nahin', 'na', 'नहीं'])
+
+_MONTHS = r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+MONTH_NUMBERS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+# One pass classifies a (stripped, lowercased) date as numeric ("15/08/1990", "1990-08-15",
+# "15.8", "15 08 1990"), day-first textual ("15th aug, 1990", "15-Aug-90") or month-first
+# textual ("August 15 1990"). A number after a punctuation separator may carry one leading
+# space, as strptime's %d allowed.
+_DATE_RE = re.compile(rf"""
+    (?P<n1>\d+) (?P<s1>[/.\-]|\s+) (?P<n2>\ ?\d+) (?: (?P<s2>[/.\-]|\s+) (?P<n3>\ ?\d+) )?
+  | (?P<day>\d{{1,2}}) (?:st|nd|rd|th)? [\s,/.\-]* (?P<month>{_MONTHS}) \.? (?: [\s,/.\-]+ (?P<year>\d{{4}}|\d{{2}}) )?
+  | (?P<month_>{_MONTHS}) \.? [\s,/.\-]* (?P<day_>\d{{1,2}}) (?:st|nd|rd|th)? (?: [\s,/.\-]+ (?P<year_>\d{{4}}|\d{{2}}) )?
+""", re.VERBOSE)
+
+# Numeric field orders per separator, in the order they are tried: day-first, then
+# ISO year-first, then (slashes only) US month-first. Y is a 4-digit year, y a 2-digit one.
+_NUMERIC_ORDERS = {
+    ("/", 3): ("dmY", "Ymd", "mdY", "dmy"),
+    ("-", 3): ("dmY", "Ymd", "dmy"),
+    (".", 3): ("dmY",),
+    (" ", 3): ("dmY",),
+    ("/", 2): ("dm", "md"),
+    ("-", 2): ("dm", "md"),
+    (".", 2): ("dm",),
+    (" ", 2): ("dm",),
+}
+
+# "10:30", "10.30pm", "7 p.m.", "1030", "22:15:00" after spaces are removed
+_TIME_RE = re.compile(r"""
+    (?: (?P<h>\d{1,2}) (?: [:.\-] (?P<m>\d{1,2}) (?: :\d{2} )? )? | (?P<hhmm>\d{3,4}) )
+    (?: (?P<ap>[ap]) \.?m\.? )?
+""", re.VERBOSE)
+
+
+def _full_year(year: int) -> int:
+    # Two-digit years: 00-30 are 2000s, 31-99 are 1900s
+    return year + (2000 if year <= 30 else 1900) if year < 100 else year
+
+
+def _numeric_field(token: str, kind: str) -> Optional[int]:
+    if kind == "d" and len(token) == 2 and token[0] == " " and token[1] in "123456789":
+        return int(token)
+    if not token.isdecimal():
+        return None
+    if kind in "dm":
+        return int(token) if len(token) <= 2 else None
+    return int(token) if len(token) == (4 if kind == "Y" else 2) else None
+
+
+def _numeric_date(match, default_year: int) -> Optional[datetime]:
+    tokens = [match["n1"], match["n2"]] + ([match["n3"]] if match["n3"] is not None else [])
+    separators = [match["s1"]] + ([match["s2"]] if match["s2"] is not None else [])
+    kinds = {" " if sep.isspace() else sep for sep in separators}
+    if len(kinds) != 1:
+        return None
+    for order in _NUMERIC_ORDERS[(kinds.pop(), len(tokens))]:
+        fields = {kind: _numeric_field(token, kind) for kind, token in zip(order, tokens)}
+        if None in fields.values():
             continue
-
-    default_year = datetime.now().year - 30  
-    for fmt in formats_without_year:
+        year = fields.get("Y", fields.get("y"))
         try:
-            partial = datetime.strptime(date_str, fmt)
-            return partial.replace(year=default_year)
+            if year is None:
+                # Validate as strptime did (against 1900, so no Feb 29), then use the default year
+                return datetime(1900, fields["m"], fields["d"]).replace(year=default_year)
+            return datetime(_full_year(year), fields["m"], fields["d"])
         except ValueError:
             continue
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_normalized(date_str: str, default_year: int) -> Optional[datetime]:
+    match = _DATE_RE.fullmatch(date_str)
+    if match is None:
+        return None
+    if match["n1"] is not None:
+        return _numeric_date(match, default_year)
+    month, day, year = (match["month"], match["day"], match["year"]) if match["month"] else \
+        (match["month_"], match["day_"], match["year_"])
+    try:
+        return datetime(_full_year(int(year)) if year else default_year, MONTH_NUMBERS[month[:3]], int(day))
+    except ValueError:
+        return None
 
-    raise ValueError(f"Unable to parse date: {date_str}")
+
+def parse_date_flexible(date_str: str) -> datetime:
+    """Birth date from free text; a date without a year gets the year 30 years ago"""
+    date_str = date_str.strip().lower()
+    if date_str in UNKNOWN_ANSWERS:
+        raise ValueError("Date unknown - using fallback")
+    parsed = _parse_date_normalized(date_str, datetime.now().year - 30)
+    if parsed is None:
+        raise ValueError(f"Unable to parse date: {date_str}")
+    return parsed
+
+
+@lru_cache(maxsize=4096)
+def _parse_time_normalized(time_str: str) -> Tuple[int, int]:
+    match = _TIME_RE.fullmatch(time_str)
+    if match is None:
+        return 12, 0
+    if match["hhmm"] is not None:
+        hour, minute = divmod(int(match["hhmm"]), 100)
+    else:
+        hour, minute = int(match["h"]), int(match["m"] or 0)
+    if match["ap"] and hour <= 12:
+        hour = hour % 12 + (12 if match["ap"] == "p" else 0)
+    if hour > 23 or minute > 59:
+        return 12, 0
+    return hour, minute
 
 
 def parse_time_flexible(time_str: str):
-    """Parse time with multiple formats"""
-    if time_str.lower() in ['unknown', 'not known', 'dont know', "don't know", 'na', 'n/a']:
+    """Parse time with multiple formats; unknown or unparseable times default to noon"""
+    if time_str.lower() in UNKNOWN_ANSWERS:
         return 12, 0  # Default to noon
-    
-    time_str = time_str.strip().replace(' ', '')
-    
-    # Handle AM/PM format
-    if 'am' in time_str.lower() or 'pm' in time_str.lower():
-        try:
-            is_pm = 'pm' in time_str.lower()
-            time_str = time_str.lower().replace('am', '').replace('pm', '')
-            
-            if ':' in time_str:
-                hour, minute = map(int, time_str.split(':'))
-            else:
-                hour = int(time_str)
-                minute = 0
-            
-            if is_pm and hour != 12:
-                hour += 12
-            elif not is_pm and hour == 12:
-                hour = 0
-                
-            return hour, minute
-        except ValueError:
-            pass
-    
-    # Handle 24-hour format
-    formats = [
-        "%H:%M",    # HH:MM
-        "%H.%M",    # HH.MM
-        "%H-%M",    # HH-MM
-        "%H %M",    # HH MM
-    ]
-    
-    for fmt in formats:
-        try:
-            time_obj = datetime.strptime(time_str, fmt).time()
-            return time_obj.hour, time_obj.minute
-        except ValueError:
-            continue
-    
-    # Try to parse as just hour
-    try:
-        hour = int(time_str)
-        if 0 <= hour <= 23:
-            return hour, 0
-    except ValueError:
-        pass
-    
-    # Default fallback
-    return 12, 0
+    return _parse_time_normalized(time_str.strip().replace(' ', '').lower())
+
 
 def parse_date_flexible_safe(val):
-    from datetime import datetime
     if isinstance(val, datetime):
         return val
     return parse_date_flexible(str(val))
 
+
 def parse_time_flexible_safe(val):
-    h, m = parse_time_flexible(str(val))
-    return int(h), int(m)
+    return parse_time_flexible(str(val))
+
 
 def coerce_time_to_hm(time_str):
-    h, m = parse_time_flexible(str(time_str))
-    return int(h), int(m)
+    return parse_time_flexible(str(time_str))
 
 
 def get_city_info(city_name):
-    """Get coordinates and timezone for a city"""
+    """
+    Get coordinates and timezone for a city, tolerating typos via the offline gazetteer.
+    Conversation flows use resolve_birth_city instead, which asks before using a typo match.
+    """
     city_key = city_name.lower().strip()
     if city_key in CITY_COORDINATES:
         return CITY_COORDINATES[city_key]
+    try:
+        match = get_gazetteer().best(city_name, min_score=settings.GAZETTEER_MIN_SCORE)
+    except Exception as e:
+        logger.error(f"[GAZETTEER] lookup failed for {city_name!r}: {e}")
+        match = None
+    if match:
+        return {"lat": match["lat"], "lng": match["lng"], "tz": match["tz"]}
     # Default to Mumbai if city not found
+    logger.warning(f"[GAZETTEER] no match for {city_name!r}, defaulting to Mumbai")
     return CITY_COORDINATES["mumbai"]
+
+
+def resolve_birth_city(text, state, key="city_suggestion"):
+    """
+    Resolve a birth city typed in a conversation flow, asking before trusting a guess.
+
+    Returns (city_info, suggestion). city_info ({"name", "lat", "lng", "tz"}) when the text
+    names a city exactly, or is a "yes" to the suggestion made on the previous message.
+    Otherwise suggestion is the closest city's display name, remembered in state[key] so
+    the next message can confirm it: a typo-corrected match may be a different town
+    hundreds of km away (Bhiwani -> Bhiwandi). (None, None) means the user said no to the
+    suggestion and should be asked for the city again. Places with no match at all fall
+    back to Mumbai, as get_city_info does.
+    """
+    suggested = state.pop(key, None)
+    answer = text.strip().lower()
+    if suggested:
+        if answer in YES_ANSWERS:
+            return suggested, None
+        if answer in NO_ANSWERS:
+            return None, None
+    if answer in CITY_COORDINATES:
+        return {"name": text.strip(), **CITY_COORDINATES[answer]}, None
+    try:
+        match = get_gazetteer().best(text, min_score=settings.GAZETTEER_MIN_SCORE)
+    except Exception as e:
+        logger.error(f"[GAZETTEER] lookup failed for {text!r}: {e}")
+        match = None
+    if match is None:
+        logger.warning(f"[GAZETTEER] no match for {text!r}, defaulting to Mumbai")
+        return {"name": text.strip(), **CITY_COORDINATES["mumbai"]}, None
+    city_info = {"name": match["name"], "lat": match["lat"], "lng": match["lng"], "tz": match["tz"]}
+    if match["exact"]:
+        return city_info, None
+    state[key] = city_info
+    return None, f"{match['name']}, {match['country']}" if match["country"] else match["name"]
+
+
+def search_cities(city_name, limit=5):
+    """Ranked city candidates (name, country, lat, lng, tz, score) for a typed place name"""
+    return get_gazetteer().search(city_name, limit=limit)
     
\ No newline at end of file
@@ -19,6 +19,23 @@ class HoroscopeRequest(BaseModel):
     language: Optional[str] = "en"
 
 
+class ChartBatchRecord(BaseModel):
+    id: Optional[Any] = None
+    name: str
+    birth_year: int
+    birth_month: int
+    birth_day: int
+    birth_hour: int
+    birth_minute: int
+    lat: float
+    lng: float
+    timezone: str
+
+class ChartBatchRequest(BaseModel):
+    records: List[ChartBatchRecord]
+    chunk_size: Optional[int] = None
+
+
 class HoroscopeResponse(BaseModel):
     horoscope: Any
     generation_time_seconds: float
@@ -0,0 +1,243 @@
+"""
+Two-level daily horoscopes: one LLM reading per archetype, personalized per user.
+
+An archetype is (Sun sign, Moon sign, rising sign, date, language), so there are at most
+12^3 = 1728 readings per language and day, however many users there are. The reading
+comes from the Worker /personal and is built from:
+  * only those three placements
+  * the day's shared transits and retrogrades
+  * passages retrieved for the archetype
+
+Readings are cached per worker (LRU) and shared across workers and containers through D1
+(archetype_horoscopes). Concurrent requests for the same archetype wait for a single
+Worker call.
+
+Each user then gets a local layer on top, with no LLM involved:
+  * their own transit-to-natal aspects and natal retrogrades, listed in personal_aspects
+    and natal_retrogrades and summed up in personal_line, which the webhook shows under
+    the summary
+  * their name in place of NAME_TOKEN, which the Worker is given as the archetype's name
+  * their actual signs in generation_info
+  * lucky numbers/colours seeded by their birth data and the date
+
+stats() counts the /personal calls saved (memory and D1 hits) against those made.
+"""
+import copy
+import logging
+import random
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import settings
+from app.schemas import HoroscopeRequest
+from app.services.astrology.aspects import find_aspects, transit_aspect_labels
+from app.services.astrology.chart_calculations import get_transits_swisseph
+from app.services.astrology.chart_service import get_ascendant, get_generate_natal
+from app.services.astrology.event_index import event_index
+from app.services.astrology.horoscope import add_lucky, request_horoscope
+from app.services.chroma_cloud.chromadbClient import safe_get_relevant_passages
+from app.services.cloudflare.horoscope_service import get_archetype_horoscope, save_archetype_horoscope
+from app.services.observability.metrics import registry
+from app.services.observability.tracing import span
+
+logger = logging.getLogger(__name__)
+
+NAME_TOKEN = "{{NAME}}"  # the name the Worker addresses the archetype reading to; personalize() fills it in
+DEFAULT_NAME = "Friend"  # the webhook's name for a user without one
+ARCHETYPE_LOOKUPS = registry.counter(
+    "astro_archetype_horoscopes_total", "Archetype reading lookups", ["outcome"]
+)
+PERSONAL_ASPECTS_SHOWN = 2
+PERSONAL_LINE = {
+    "aspects": {
+        "en": "Your chart today: {aspects}.",
+        "hi": "आज आपकी कुंडली में: {aspects}।",
+        "hi-en": "Aaj aapki kundli mein: {aspects}.",
+    },
+    "retrogrades": {
+        "en": "Retrograde in your birth chart: {bodies}.",
+        "hi": "आपकी जन्म कुंडली में वक्री: {bodies}।",
+        "hi-en": "Aapki janam kundli mein vakri: {bodies}.",
+    },
+}
+
+
+def archetype_key(sun: str, moon: str, rising: str, horoscope_date: str, language: str) -> str:
+    return f"{sun}|{moon}|{rising}|{horoscope_date}|{language}"
+
+
+def personal_line(natal: Dict[str, dict], transits: Dict[str, dict], retro: List[str], language: str) -> str:
+    """The user's tightest transit-to-natal aspects and natal retrogrades, as one sentence or two."""
+    hits = sorted(find_aspects(natal, transits), key=lambda h: h["orb"])[:PERSONAL_ASPECTS_SHOWN]
+    parts = []
+    if hits:
+        aspects = ", ".join(f"{h['b']} {h['aspect']} natal {h['a']}" for h in hits)
+        parts.append(PERSONAL_LINE["aspects"].get(language, PERSONAL_LINE["aspects"]["en"]).format(aspects=aspects))
+    if retro:
+        parts.append(PERSONAL_LINE["retrogrades"].get(language, PERSONAL_LINE["retrogrades"]["en"]).format(bodies=", ".join(retro)))
+    return " ".join(parts)
+
+
+def _named(value: Any, name: str) -> Any:
+    """The reading with NAME_TOKEN, as the Worker addressed it, replaced by the user's name."""
+    if isinstance(value, str):
+        return value.replace(NAME_TOKEN, name)
+    if isinstance(value, dict):
+        return {k: _named(v, name) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_named(v, name) for v in value]
+    return value
+
+
+def _day_retrogrades(horoscope_date: str) -> List[str]:
+    try:
+        noon = datetime.strptime(horoscope_date, "%Y-%m-%d").replace(hour=12, tzinfo=timezone.utc)
+        return [r["body"] for r in event_index.retrogrades_at(noon)]
+    except Exception as e:
+        logger.warning(f"[HOROSCOPE] retrogrades unavailable for {horoscope_date}: {e}")
+        return []
+
+
+class ArchetypeHoroscopes:
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max(1, max_entries)
+        self._lru: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, list] = {}  # key -> [lock, threads holding or waiting for it]
+        self._stats = {"memory_hits": 0, "store_hits": 0, "generated": 0, "errors": 0}
+
+    def archetype_payload(self, sun: str, moon: str, rising: str, horoscope_date: str, language: str) -> Dict[str, Any]:
+        """The Worker /personal payload for an archetype: same shape as /generate, no personal data."""
+        transits = get_transits_swisseph(0.0, 0.0, horoscope_date)
+        retrogrades = _day_retrogrades(horoscope_date)
+        query = (f"Vedic horoscope: Sun {sun}, Moon {moon}, Ascendant {rising}, Date {horoscope_date}, "
+                 f"Transits {transits}, Retrogrades {retrogrades}")
+        return {
+            "name": NAME_TOKEN,
+            "natal_chart": {"Sun": {"sign": sun}, "Moon": {"sign": moon}, "Ascendant": {"sign": rising}},
+            "current_transits": transits,
+            "aspects": [],  # degree-level aspects are personal; added per user
+            "retrogrades": retrogrades,
+            "passages": safe_get_relevant_passages(query),
+            "date": horoscope_date,
+            "language": language,
+        }
+
+    def _remember(self, key: str, reading: Any):
+        with self._lock:
+            self._lru[key] = reading
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _count(self, outcome: str, stat: str):
+        with self._lock:
+            self._stats[stat] += 1
+        ARCHETYPE_LOOKUPS.inc(outcome=outcome)
+
+    def _cached(self, key: str) -> Optional[Any]:
+        with self._lock:
+            reading = self._lru.get(key)
+            if reading is not None:
+                self._lru.move_to_end(key)
+        return reading
+
+    @span("horoscope.archetype")
+    def reading(self, sun: str, moon: str, rising: str, horoscope_date: str, language: str) -> Any:
+        """The shared reading for an archetype: memory, then D1, then one Worker call."""
+        key = archetype_key(sun, moon, rising, horoscope_date, language)
+        reading = self._cached(key)
+        if reading is not None:
+            self._count("memory", "memory_hits")
+            return reading
+
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                return self._fill(key, sun, moon, rising, horoscope_date, language)
+        finally:
+            # Dropped only by the last thread out, so a late arrival never gets a second
+            # lock (and a second Worker call) while others still hold or wait for this one
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    def _fill(self, key: str, sun: str, moon: str, rising: str, horoscope_date: str, language: str) -> Any:
+        # Another thread may have filled it while we waited
+        reading = self._cached(key)
+        if reading is not None:
+            self._count("memory", "memory_hits")
+            return reading
+        try:
+            reading = get_archetype_horoscope(key)
+        except Exception as e:
+            logger.warning(f"[HOROSCOPE] archetype store read failed for {key}: {e}")
+        if reading is not None:
+            self._count("store", "store_hits")
+        else:
+            try:
+                reading = request_horoscope(self.archetype_payload(sun, moon, rising, horoscope_date, language))
+            except Exception:
+                self._count("error", "errors")
+                raise
+            self._count("generated", "generated")
+            try:
+                save_archetype_horoscope(key, horoscope_date, language, reading)
+            except Exception as e:
+                logger.warning(f"[HOROSCOPE] archetype store write failed for {key}: {e}")
+        self._remember(key, reading)
+        return reading
+
+    def personalize(self, reading: Any, req: HoroscopeRequest, natal: Dict[str, dict], retro: List[str],
+                    rising: str, transits: Dict[str, dict], key: str) -> Any:
+        """The user's copy of an archetype reading: their name, aspects, retrogrades, signs and lucky picks."""
+        if not isinstance(reading, dict):
+            return reading
+        content = _named(copy.deepcopy(reading), req.name or DEFAULT_NAME)
+        content["personal_aspects"] = transit_aspect_labels(natal, transits)
+        content["natal_retrogrades"] = retro
+        content["personal_line"] = personal_line(natal, transits, retro, req.language or "en")
+        info = content.get("generation_info") if isinstance(content.get("generation_info"), dict) else {}
+        info.update(sun_sign=natal["Sun"]["sign"], moon_sign=natal["Moon"]["sign"], ascendant=rising,
+                    archetype=key, mode="archetype")
+        content["generation_info"] = info
+        # Stable for the user and day, different across users sharing the archetype
+        seed = f"{req.name}|{req.birth_year}-{req.birth_month}-{req.birth_day} {req.birth_hour}:{req.birth_minute}|{key}"
+        add_lucky(content, random.Random(seed))
+        return content
+
+    def horoscope(self, req: HoroscopeRequest) -> Any:
+        natal, retro = get_generate_natal(
+            req.name, req.birth_year, req.birth_month, req.birth_day,
+            req.birth_hour, req.birth_minute, req.lat, req.lng, req.timezone
+        )
+        rising = get_ascendant(req.birth_year, req.birth_month, req.birth_day,
+                               req.birth_hour, req.birth_minute, req.lat, req.lng, req.timezone)["sign"]
+        horoscope_date = req.date or date.today().isoformat()
+        language = req.language or "en"
+        sun, moon = natal["Sun"]["sign"], natal["Moon"]["sign"]
+        reading = self.reading(sun, moon, rising, horoscope_date, language)
+        transits = get_transits_swisseph(req.lat, req.lng, horoscope_date)
+        return self.personalize(reading, req, natal, retro, rising, transits,
+                                archetype_key(sun, moon, rising, horoscope_date, language))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self._stats["memory_hits"] + self._stats["store_hits"]
+            lookups = saved + self._stats["generated"]
+            return {
+                "cached": len(self._lru),
+                "max_entries": self.max_entries,
+                "hit_rate": round(saved / lookups, 4) if lookups else None,
+                "worker_calls_saved": saved,
+                "worker_calls_made": self._stats["generated"],
+                **self._stats,
+            }
+
+
+archetype_horoscopes = ArchetypeHoroscopes(max_entries=settings.HOROSCOPE_ARCHETYPE_CACHE_SIZE)
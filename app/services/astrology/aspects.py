@@ -0,0 +1,141 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config.constants import SIGNS
+
+logger = logging.getLogger(__name__)
+
+SIGN_INDEX = {sign: i for i, sign in enumerate(SIGNS)}
+
+# (angle, name, orb, nature, strength). At most one aspect can match a separation: the
+# angles are >= 30 degrees apart and no orb exceeds 15.
+MAJOR_ASPECTS: List[Tuple[int, str, float, str, str]] = [
+    (0, "conjunction", 8, "neutral", "strong"),
+    (60, "sextile", 8, "harmonious", "moderate"),
+    (90, "square", 8, "challenging", "strong"),
+    (120, "trine", 8, "harmonious", "strong"),
+    (180, "opposition", 8, "challenging", "strong"),
+]
+# Synastry keeps the tighter sextile orb it has always used
+SYNASTRY_ASPECTS = [(a, n, 6 if n == "sextile" else orb, nature, s) for a, n, orb, nature, s in MAJOR_ASPECTS]
+SYNASTRY_PLANETS = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn"]
+
+
+def chart_longitudes(chart: Dict[str, dict], bodies: Optional[Sequence[str]] = None) -> Tuple[List[str], np.ndarray]:
+    """
+    Absolute longitudes (sign index * 30 + degree) for the bodies of a chart. Bodies that
+    are missing or whose sign is Unknown get NaN, so they never form an aspect.
+    """
+    names = list(bodies) if bodies is not None else list(chart)
+    lon = np.full(len(names), np.nan)
+    for i, name in enumerate(names):
+        data = chart.get(name)
+        if not isinstance(data, dict):
+            continue
+        sign_idx = SIGN_INDEX.get(data.get("sign"))
+        if sign_idx is not None:
+            lon[i] = sign_idx * 30 + float(data.get("degree", 0) or 0)
+    return names, lon
+
+
+def aspect_matrix(lon_a: np.ndarray, lon_b: np.ndarray, aspects=MAJOR_ASPECTS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pairwise aspects between two longitude arrays in one vectorized pass.
+
+    lon_a has shape (..., n) and lon_b (m,) or (..., m); leading dimensions broadcast, so
+    a (charts x n) batch against one transit set costs a single call. Returns
+    (aspect_index, orb, separation) arrays of shape (..., n, m); aspect_index is -1
+    where no aspect is within orb.
+    """
+    separation = np.abs(lon_a[..., :, None] - lon_b[..., None, :]) % 360.0
+    separation = np.where(separation > 180.0, 360.0 - separation, separation)
+    angles = np.array([a[0] for a in aspects], dtype=float)
+    orbs = np.array([a[2] for a in aspects], dtype=float)
+    deviation = np.abs(separation[..., None] - angles)
+    within = deviation <= orbs  # NaN compares False: unknown bodies drop out here
+    index = np.where(within.any(axis=-1), within.argmax(axis=-1), -1)
+    orb = np.take_along_axis(deviation, np.maximum(index, 0)[..., None], axis=-1)[..., 0]
+    return index, np.where(index >= 0, orb, np.nan), separation
+
+
+def _hits(names_a, names_b, index, orb, separation, aspects, upper_only=False) -> List[dict]:
+    rows, cols = np.nonzero(np.triu(index >= 0, k=1) if upper_only else index >= 0)
+    hits = []
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        angle, name, _, nature, strength = aspects[index[i, j]]
+        hits.append({
+            "a": names_a[i],
+            "b": names_b[j],
+            "aspect": name,
+            "angle": angle,
+            "orb": float(orb[i, j]),
+            "separation": float(separation[i, j]),
+            "nature": nature,
+            "strength": strength,
+        })
+    return hits
+
+
+def find_aspects(chart_a: Dict[str, dict], chart_b: Dict[str, dict], aspects=MAJOR_ASPECTS,
+                 bodies_a: Optional[Sequence[str]] = None, bodies_b: Optional[Sequence[str]] = None) -> List[dict]:
+    """Aspects between every body of chart_a and every body of chart_b, in (a, b) row-major order."""
+    names_a, lon_a = chart_longitudes(chart_a, bodies_a)
+    names_b, lon_b = chart_longitudes(chart_b, bodies_b)
+    index, orb, separation = aspect_matrix(lon_a, lon_b, aspects)
+    return _hits(names_a, names_b, index, orb, separation, aspects)
+
+
+def find_internal_aspects(chart: Dict[str, dict], aspects=MAJOR_ASPECTS,
+                          bodies: Optional[Sequence[str]] = None) -> List[dict]:
+    """Aspects between the bodies of one chart, each unordered pair once (chart order)."""
+    names, lon = chart_longitudes(chart, bodies)
+    index, orb, separation = aspect_matrix(lon, lon, aspects)
+    return _hits(names, names, index, orb, separation, aspects, upper_only=True)
+
+
+def find_aspects_batch(charts: Iterable[Dict[str, dict]], transits: Dict[str, dict], aspects=MAJOR_ASPECTS,
+                       bodies: Optional[Sequence[str]] = None) -> List[List[dict]]:
+    """Many natal charts against one transit set, as one (charts x bodies x transits) pass."""
+    charts = list(charts)
+    if not charts:
+        return []
+    if bodies is None:
+        bodies = list(dict.fromkeys(name for chart in charts for name in chart))
+    names_b, lon_b = chart_longitudes(transits)
+    lon_a = np.stack([chart_longitudes(chart, bodies)[1] for chart in charts])
+    index, orb, separation = aspect_matrix(lon_a, lon_b, aspects)
+    return [
+        _hits(list(bodies), names_b, index[k], orb[k], separation[k], aspects)
+        for k in range(len(charts))
+    ]
+
+
+def transit_aspect_labels(natal: Dict[str, dict], transits: Dict[str, dict]) -> List[str]:
+    """'<Transit> <aspect> natal <Planet>' strings, as /generate sends them to the worker."""
+    return [f"{h['b']} {h['aspect']} natal {h['a']}" for h in find_aspects(natal, transits)]
+
+
+def natal_aspect_labels(natal: Dict[str, dict]) -> List[str]:
+    """'<Planet> <aspect> <Planet>' strings for aspects within one natal chart."""
+    return [f"{h['a']} {h['aspect']} {h['b']}" for h in find_internal_aspects(natal)]
+
+
+def synastry_aspects(user_chart: Dict[str, dict], partner_chart: Dict[str, dict]) -> List[dict]:
+    """Synastry aspects in the structure calculate_synastry_aspects has always returned."""
+    aspects = [
+        {
+            "user_planet": h["a"],
+            "partner_planet": h["b"],
+            "aspect": h["aspect"],
+            "angle": h["angle"],
+            "orb": h["orb"],
+            "nature": h["nature"],
+            "strength": h["strength"],
+            "description": f"{h['a']} {h['aspect']} {h['b']}",
+        }
+        for h in find_aspects(user_chart, partner_chart, SYNASTRY_ASPECTS, SYNASTRY_PLANETS, SYNASTRY_PLANETS)
+    ]
+    aspects.sort(key=lambda x: (x["strength"] == "strong", x["orb"]))
+    return aspects
@@ -0,0 +1,296 @@
+"""
+Bulk natal chart computation on a process pool.
+
+swisseph keeps global state and is not thread-safe, so charts are computed in separate
+processes, a chunk of records per task. Results come back as they finish (not in input
+order), one dict per record carrying the record's id, followed by a summary with the
+throughput per core. Used by POST /charts/batch and by the CLI:
+
+    python -m app.services.astrology.chart_batch births.ndjson > charts.ndjson
+    cat births.ndjson | python -m app.services.astrology.chart_batch - --workers 8
+
+Input lines are JSON objects with name, birth_year, birth_month, birth_day, birth_hour,
+birth_minute, lat, lng, timezone and an optional id (the line number by default).
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from app.config.settings import settings
+from app.services.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RECORD_FIELDS = ("name", "birth_year", "birth_month", "birth_day", "birth_hour", "birth_minute", "lat", "lng", "timezone")
+
+BATCH_CHARTS = registry.counter("astro_batch_charts_total", "Charts computed by the batch pool", ["outcome"])
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    from app.services.astrology.ephemeris_files import ephemeris_files
+
+    # Spawned workers don't import main, which points swisseph at the bundled files
+    ephemeris_files.configure_swisseph()
+    # The per-planet INFO lines of the calculators would dominate a batch's output
+    logging.getLogger("app.services.astrology").setLevel(logging.WARNING)
+
+
+def _compute_chunk(chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Runs in a pool process: charts for a chunk of records, plus the CPU time they took."""
+    from app.services.astrology.chart_service import get_natal_chart, is_complete_chart
+
+    started = time.process_time()
+    results = []
+    for record in chunk:
+        try:
+            chart = get_natal_chart(*(record[field] for field in RECORD_FIELDS))
+            if is_complete_chart(chart):
+                results.append({"id": record["id"], "chart": chart})
+            else:
+                results.append({"id": record["id"], "chart": chart, "error": "incomplete chart"})
+        except Exception as e:
+            results.append({"id": record["id"], "error": f"{type(e).__name__}: {e}"})
+    return {"results": results, "cpu_seconds": time.process_time() - started, "pid": os.getpid()}
+
+
+def pool_size() -> int:
+    return settings.CHART_BATCH_WORKERS or os.cpu_count() or 1
+
+
+def get_chart_pool() -> ProcessPoolExecutor:
+    """
+    The process pool, started on first use and kept for later batches. Workers are spawned
+    rather than forked so they never inherit the server's threads, sockets or locks.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = pool_size()
+            _pool = ProcessPoolExecutor(
+                max_workers=_pool_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"[CHART BATCH] started process pool with {_pool_workers} workers")
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Forget a pool whose worker died, so the next get_chart_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_chart_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _after_fork_in_child():
+    # The pool's processes and management thread belong to the parent
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def normalize_record(record: Dict[str, Any], default_id: Any) -> Dict[str, Any]:
+    """Validate one input record; raises ValueError naming the missing or bad field."""
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    if "_invalid" in record:
+        raise ValueError(f"invalid JSON: {record['_invalid']}")
+    missing = [field for field in RECORD_FIELDS if record.get(field) is None]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    try:
+        normalized = {field: int(record[field]) for field in RECORD_FIELDS[1:6]}
+        normalized.update(lat=float(record["lat"]), lng=float(record["lng"]))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"bad numeric field: {e}")
+    normalized.update(name=str(record["name"]), timezone=str(record["timezone"]))
+    normalized["id"] = record.get("id") if record.get("id") is not None else default_id
+    return normalized
+
+
+def iter_charts(records: Iterable[Dict[str, Any]], chunk_size: Optional[int] = None,
+                pool: Optional[ProcessPoolExecutor] = None, workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield {"id", "chart"} (or {"id", "error"}) per record as chunks complete, then
+    {"summary": {...}}. At most a few chunks per worker are in flight, so input of any
+    length is streamed with bounded memory. If a pool process dies (a crash in swisseph,
+    the OOM killer), the chunks it took down become error lines and the shared pool is
+    replaced, so the stream still ends with a summary and later batches work.
+    """
+    owns_pool = pool is None
+    if owns_pool:
+        pool = get_chart_pool()
+        workers = _pool_workers
+    workers = workers or pool_size()
+    chunk_size = max(1, chunk_size or settings.CHART_BATCH_CHUNK_SIZE)
+    max_in_flight = workers * 2
+
+    started = time.perf_counter()
+    totals = {"records": 0, "ok": 0, "errors": 0, "cpu_seconds": 0.0, "pool_restarts": 0}
+    pids = set()
+    pending = set()
+    submitted = {}  # future -> (chunk, pool it went to)
+
+    def restart(failed_pool: ProcessPoolExecutor, error: Exception):
+        nonlocal pool
+        if owns_pool and failed_pool is pool:
+            logger.error(f"[CHART BATCH] pool process died ({error!r}); restarting the pool")
+            _discard_pool(pool)
+            pool = get_chart_pool()
+            totals["pool_restarts"] += 1
+
+    def lost(chunk: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for record in chunk:
+            totals["errors"] += 1
+            BATCH_CHARTS.inc(outcome="error")
+            yield {"id": record["id"], "error": "BrokenProcessPool: a chart worker process died"}
+
+    def submit(chunk: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        # A pool found broken at submit time is replaced and the chunk retried once
+        for _ in range(2 if owns_pool else 1):
+            target = pool
+            try:
+                future = target.submit(_compute_chunk, chunk)
+            except BrokenProcessPool as e:
+                restart(target, e)
+                continue
+            submitted[future] = (chunk, target)
+            pending.add(future)
+            return
+        yield from lost(chunk)
+
+    def drain(block_until_below: int) -> Iterator[Dict[str, Any]]:
+        nonlocal pending
+        while len(pending) > block_until_below:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk, chunk_pool = submitted.pop(future)
+                try:
+                    outcome = future.result()
+                except BrokenProcessPool as e:
+                    restart(chunk_pool, e)
+                    yield from lost(chunk)
+                    continue
+                totals["cpu_seconds"] += outcome["cpu_seconds"]
+                pids.add(outcome["pid"])
+                for result in outcome["results"]:
+                    key = "errors" if "error" in result else "ok"
+                    totals[key] += 1
+                    BATCH_CHARTS.inc(outcome="error" if key == "errors" else "ok")
+                    yield result
+
+    chunk: List[Dict[str, Any]] = []
+    for index, record in enumerate(records):
+        totals["records"] += 1
+        try:
+            chunk.append(normalize_record(record, index))
+        except ValueError as e:
+            totals["errors"] += 1
+            BATCH_CHARTS.inc(outcome="invalid")
+            yield {"id": record.get("id", index) if isinstance(record, dict) else index, "error": str(e)}
+            continue
+        if len(chunk) >= chunk_size:
+            yield from submit(chunk)
+            chunk = []
+            yield from drain(max_in_flight - 1)
+    if chunk:
+        yield from submit(chunk)
+    yield from drain(0)
+
+    wall = time.perf_counter() - started
+    computed = totals["ok"]
+    summary = {
+        **totals,
+        "cpu_seconds": round(totals["cpu_seconds"], 3),
+        "wall_seconds": round(wall, 3),
+        "workers": workers,
+        "processes_used": len(pids),
+        "charts_per_second": round(computed / wall, 1) if wall else None,
+        # Per core of CPU actually spent in the workers; wall-clock rate / workers is the
+        # lower bound when the pool was not kept busy
+        "charts_per_second_per_core": round(computed / totals["cpu_seconds"], 1) if totals["cpu_seconds"] else None,
+    }
+    logger.info(f"[CHART BATCH] {summary}")
+    yield {"summary": summary}
+
+
+def to_ndjson(results: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result, separators=(",", ":")) + "\n"
+
+
+def _read_ndjson(stream) -> Iterator[Dict[str, Any]]:
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = {"id": line_no, "_invalid": str(e)}
+        if isinstance(record, dict):
+            record.setdefault("id", line_no)
+        yield record
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compute natal charts in bulk on a process pool (NDJSON in, NDJSON out)")
+    parser.add_argument("input", help="NDJSON file of birth records, or - for stdin")
+    parser.add_argument("--output", "-o", default="-", help="Output NDJSON file (default stdout)")
+    parser.add_argument("--workers", type=int, default=0, help="Pool processes (default CHART_BATCH_WORKERS or CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Records per task (default CHART_BATCH_CHUNK_SIZE)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+
+    if args.workers:
+        settings.CHART_BATCH_WORKERS = args.workers
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    summary = {}
+    try:
+        for result in iter_charts(_read_ndjson(source), chunk_size=args.chunk_size or None):
+            summary = result.get("summary", summary)
+            sink.write(json.dumps(result, separators=(",", ":")) + "\n")
+    finally:
+        shutdown_chart_pool()
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    print(
+        f"{summary.get('ok', 0)}/{summary.get('records', 0)} charts in {summary.get('wall_seconds')}s: "
+        f"{summary.get('charts_per_second')} charts/s, {summary.get('charts_per_second_per_core')} charts/s per core "
+        f"({summary.get('workers')} workers)",
+        file=sys.stderr,
+    )
+    return 0 if summary.get("errors", 1) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,45 +4,34 @@ import pytz
 import requests
 from datetime import datetime
 import swisseph as swe
-from kerykeion import AstrologicalSubject
 
 from app.config.constants import PLANET_IDS, SIGN_ABBREV_TO_FULL, SIGNS
+from app.services.observability.tracing import span
+from app.services.runtime.singletons import singletons
+from app.services.runtime.warmup import timed_import
 
 logger = logging.getLogger(__name__)
 
 # --- Ephemeris: Get daily transits ---
-from skyfield.api import load
-from datetime import datetime
+# Skyfield and the memory-mapped DE421 kernel are loaded on first use (or by the startup
+# warmup); never downloaded here unless EPHEMERIS_ALLOW_DOWNLOAD allows it
+def _load_skyfield():
+    from app.services.astrology.ephemeris_files import ephemeris_files
+    return ephemeris_files.load_timescale(), ephemeris_files.load_kernel()
+
+
+def get_skyfield():
+    """(timescale, ephemeris) for skyfield transit calculations."""
+    return singletons.get("skyfield", _load_skyfield)
 
-ts = load.timescale()
-planets = load('de421.bsp')
 
 def get_transits_swisseph(lat: float, lng: float, dt_str: str) -> dict:
-    dt_obj = datetime.strptime(dt_str, "%Y-%m-%d")
-    t = ts.utc(dt_obj.year, dt_obj.month, dt_obj.day, 12)
-    observer = planets['earth'].at(t)
-    planet_keys = {
-        "Sun": "sun",
-        "Moon": "moon",
-        "Mercury": "mercury",
-        "Venus": "venus",
-        "Mars": "mars",
-        "Jupiter": "jupiter barycenter",
-        "Saturn": "saturn barycenter",
-    }
-    SIGNS = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
-             "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
-    results = {}
-    for name, key in planet_keys.items():
-        planet = planets[key]
-        astrometric = observer.observe(planet).ecliptic_latlon()
-        lon = astrometric[1].degrees % 360
-        sign_idx = int(lon // 30)
-        sign_name = SIGNS[sign_idx]
-        degree = round(lon % 30, 1)
-        results[name] = {"sign": sign_name, "degree": degree}
-        logger.info(f"Transit {name}: {sign_name} {degree}°")
-    return results
+    """
+    Geocentric transits at 12:00 UTC on dt_str (YYYY-MM-DD). lat/lng don't affect the
+    result, so it comes from the shared daily transit cache.
+    """
+    from app.services.astrology.transit_cache import transit_cache
+    return transit_cache.get(dt_str)
 
 
 
@@ -497,6 +486,7 @@ def calculate_natal_chart_kerykeion_fallback(name, year, month, day, hour, minut
         logger.info(f"Kerykeion calculation for: {name}, {year}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}")
         logger.info(f"Location: {lat}, {lng}, Timezone: {tz_str}")
         
+        AstrologicalSubject = timed_import("kerykeion").AstrologicalSubject
         subj = AstrologicalSubject(
             name=name,
             year=year,
@@ -754,6 +744,7 @@ def calculate_simplified_chart(birth_date):
             "Ascendant": {"sign": "Unknown", "degree": 0.0, "house": 1, "retrograde": False}
         }
 
+@span("ephemeris.natal_chart")
 def calculate_natal_chart_multi_method(name, year, month, day, hour, minute, lat, lng, tz_str):
     """
     Multi-method calculation with proper validation and Swiss Ephemeris as primary
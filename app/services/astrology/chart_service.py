@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
+import swisseph as swe
+
+from app.config.settings import settings
+from app.config.constants import SIGN_ABBREV_TO_FULL, SIGNS
+from app.services.astrology.chart_calculations import calculate_natal_chart_multi_method
+from app.services.observability.metrics import registry
+from app.services.observability.tracing import span
+from app.services.runtime.warmup import timed_import
+
+logger = logging.getLogger(__name__)
+
+# Bump when the chart calculation changes (new bodies, ayanamsa, node type, rounding) so
+# previously cached charts are recomputed instead of served stale.
+CHART_ENGINE_VERSION = 1
+HOUSE_SYSTEM = "P"  # Placidus, as used by calculate_natal_chart_swiss_ephemeris
+
+# A full Swiss Ephemeris chart; degraded fallbacks (Kerykeion, simplified) are not cached
+COMPLETE_CHART_BODIES = ("Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Rahu", "Ketu", "Ascendant")
+
+# /generate reports the ten classical + modern planets with Placidus houses, labelled the
+# way Kerykeion labels them so the worker prompt is the same whichever engine ran
+GENERATE_PLANETS = {
+    "Sun": swe.SUN, "Moon": swe.MOON, "Mercury": swe.MERCURY, "Venus": swe.VENUS, "Mars": swe.MARS,
+    "Jupiter": swe.JUPITER, "Saturn": swe.SATURN, "Uranus": swe.URANUS, "Neptune": swe.NEPTUNE, "Pluto": swe.PLUTO,
+}
+HOUSE_NAMES = [
+    "First_House", "Second_House", "Third_House", "Fourth_House", "Fifth_House", "Sixth_House",
+    "Seventh_House", "Eighth_House", "Ninth_House", "Tenth_House", "Eleventh_House", "Twelfth_House",
+]
+GENERATE_ENGINES = ("swisseph", "kerykeion")
+
+CHART_CACHE = registry.counter(
+    "astro_chart_cache_total", "Natal chart cache lookups", ["layer", "outcome"]
+)
+GENERATE_CHARTS = registry.counter(
+    "astro_generate_chart_total", "/generate natal charts by engine", ["engine", "outcome"]
+)
+
+
+def chart_key(year: int, month: int, day: int, hour: int, minute: int, lat: float, lng: float, tz_str: str,
+              house_system: str = HOUSE_SYSTEM) -> str:
+    """Canonical key: UTC birth instant to the minute, rounded coordinates, house system, engine version."""
+    local_dt = pytz.timezone(tz_str).localize(datetime(int(year), int(month), int(day), int(hour), int(minute)))
+    utc_dt = local_dt.astimezone(pytz.UTC)
+    precision = settings.CHART_COORD_PRECISION
+    return (
+        f"v{CHART_ENGINE_VERSION}|{utc_dt:%Y-%m-%dT%H:%M}Z|"
+        f"{round(float(lat), precision):.{precision}f}|{round(float(lng), precision):.{precision}f}|{house_system}"
+    )
+
+
+class ChartCache:
+    """
+    Natal charts by chart_key: a bounded in-process LRU in front of a SQLite table on
+    local disk (WAL, shared by every worker, kept across restarts). Values are stored as
+    JSON and decoded per lookup, so callers always get their own copy to mutate.
+    """
+
+    def __init__(self, max_entries: int = 4096, db_path: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.db_path = db_path
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conns = threading.local()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stored": 0, "disk_errors": 0}
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except Exception as e:
+                logger.error(f"[CHARTS] disk cache at {self.db_path} unavailable, using memory only: {e}")
+                self.db_path = None
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+        self._conns = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._conns, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conns.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS natal_charts (chart_key TEXT PRIMARY KEY, chart TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def _remember(self, key: str, value: str):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self._stats["memory_hits"] += 1
+        if value is not None:
+            CHART_CACHE.inc(layer="memory", outcome="hit")
+            return json.loads(value)
+        CHART_CACHE.inc(layer="memory", outcome="miss")
+
+        if self.db_path:
+            try:
+                row = self._connect().execute("SELECT chart FROM natal_charts WHERE chart_key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                row = None
+                with self._lock:
+                    self._stats["disk_errors"] += 1
+                logger.error(f"[CHARTS] disk lookup failed for {key}: {e}")
+            if row is not None:
+                CHART_CACHE.inc(layer="disk", outcome="hit")
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                self._remember(key, row[0])
+                return json.loads(row[0])
+            CHART_CACHE.inc(layer="disk", outcome="miss")
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, chart: Dict[str, Any]):
+        value = json.dumps(chart, separators=(",", ":"))
+        self._remember(key, value)
+        with self._lock:
+            self._stats["stored"] += 1
+        if self.db_path:
+            try:
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO natal_charts (chart_key, chart, created_at) VALUES (?, ?, ?)",
+                    (key, value, time.time()),
+                )
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._stats["disk_errors"] += 1
+                logger.error(f"[CHARTS] failed to persist {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            return {
+                "backend": "sqlite" if self.db_path else "memory",
+                "engine_version": CHART_ENGINE_VERSION,
+                "memory_size": len(self._lru),
+                "max_entries": self.max_entries,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                **self._stats,
+            }
+
+
+chart_cache = ChartCache(max_entries=settings.CHART_CACHE_SIZE, db_path=settings.CHART_CACHE_PATH)
+
+
+def is_complete_chart(chart: Optional[dict]) -> bool:
+    if not isinstance(chart, dict):
+        return False
+    for body in COMPLETE_CHART_BODIES:
+        data = chart.get(body)
+        if not isinstance(data, dict) or data.get("sign") in (None, "Unknown") or "longitude" not in data:
+            return False
+    return True
+
+
+def get_natal_chart(name, year, month, day, hour, minute, lat, lng, tz_str) -> dict:
+    """
+    Natal chart for a birth instant and place, computed at most once per key.
+
+    Same arguments and result as calculate_natal_chart_multi_method. Only complete charts
+    are cached, so a degraded fallback result is retried next time.
+    """
+    try:
+        key = chart_key(year, month, day, hour, minute, lat, lng, tz_str)
+    except Exception as e:
+        # Unknown timezone or invalid date: let the calculator handle/log it uncached
+        logger.warning(f"[CHARTS] uncacheable chart request ({e})")
+        return calculate_natal_chart_multi_method(name, year, month, day, hour, minute, lat, lng, tz_str)
+
+    chart = chart_cache.get(key)
+    if chart is not None:
+        return chart
+
+    chart = calculate_natal_chart_multi_method(name, year, month, day, hour, minute, lat, lng, tz_str)
+    if is_complete_chart(chart):
+        chart_cache.put(key, chart)
+    return chart
+
+
+def _house_of(longitude: float, cusps) -> int:
+    """1-based house whose [cusp, next cusp) arc contains the longitude."""
+    for i in range(12):
+        start, end = cusps[i], cusps[(i + 1) % 12]
+        if (longitude - start) % 360 < (end - start) % 360:
+            return i + 1
+    return 1
+
+
+@span("ephemeris.swisseph")
+def calculate_generate_natal(year, month, day, hour, minute, lat, lng, tz_str) -> Dict[str, dict]:
+    """
+    Sign, degree, Placidus house and retrograde flag of the ten /generate planets, straight
+    from Swiss Ephemeris (tropical, like Kerykeion). Raises on bad input instead of
+    degrading, so the caller can fall back.
+    """
+    local_dt = pytz.timezone(tz_str).localize(datetime(int(year), int(month), int(day), int(hour), int(minute)))
+    utc_dt = local_dt.astimezone(pytz.UTC)
+    jd = swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour + utc_dt.minute / 60.0, swe.GREG_CAL)
+    cusps, _ = swe.houses(jd, float(lat), float(lng), HOUSE_SYSTEM.encode())
+
+    chart = {}
+    for name, planet_id in GENERATE_PLANETS.items():
+        result, _ = swe.calc_ut(jd, planet_id, swe.FLG_SWIEPH | swe.FLG_SPEED)
+        longitude = float(result[0]) % 360
+        chart[name] = {
+            "sign": SIGNS[int(longitude // 30)],
+            "degree": round(longitude % 30, 1),
+            "house": HOUSE_NAMES[_house_of(longitude, cusps) - 1],
+            "retrograde": float(result[3]) < 0,
+        }
+    return chart
+
+
+@span("ephemeris.kerykeion")
+def calculate_generate_natal_kerykeion(name, year, month, day, hour, minute, lat, lng, tz_str) -> Dict[str, dict]:
+    """The original /generate path: a full Kerykeion subject per request."""
+    AstrologicalSubject = timed_import("kerykeion").AstrologicalSubject
+    subj = AstrologicalSubject(
+        name=name, year=year, month=month, day=day,
+        hour=hour, minute=minute, lat=lat, lng=lng, tz_str=tz_str, online=False
+    )
+    chart = {}
+    for planet in GENERATE_PLANETS:
+        d = getattr(subj, planet.lower())
+        chart[planet] = {
+            "sign": SIGN_ABBREV_TO_FULL.get(d.get("sign"), "Unknown"),
+            "degree": round(d["position"], 1),
+            "house": d["house"],
+            "retrograde": bool(d.get("retrograde")),
+        }
+    return chart
+
+
+def _cached_generate_natal(year, month, day, hour, minute, lat, lng, tz_str) -> Dict[str, dict]:
+    # Shares the natal chart cache (and its SQLite table) under its own key suffix
+    key = chart_key(year, month, day, hour, minute, lat, lng, tz_str) + "|generate"
+    chart = chart_cache.get(key)
+    if chart is None:
+        chart = calculate_generate_natal(year, month, day, hour, minute, lat, lng, tz_str)
+        chart_cache.put(key, chart)
+    return chart
+
+
+def get_ascendant(year, month, day, hour, minute, lat, lng, tz_str) -> Dict[str, Any]:
+    """Rising sign and degree (tropical, Placidus), memoized per birth key like the /generate chart."""
+    key = chart_key(year, month, day, hour, minute, lat, lng, tz_str) + "|ascendant"
+    ascendant = chart_cache.get(key)
+    if ascendant is None:
+        local_dt = pytz.timezone(tz_str).localize(datetime(int(year), int(month), int(day), int(hour), int(minute)))
+        utc_dt = local_dt.astimezone(pytz.UTC)
+        jd = swe.julday(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour + utc_dt.minute / 60.0, swe.GREG_CAL)
+        _, ascmc = swe.houses(jd, float(lat), float(lng), HOUSE_SYSTEM.encode())
+        longitude = float(ascmc[0]) % 360
+        ascendant = {"sign": SIGNS[int(longitude // 30)], "degree": round(longitude % 30, 1)}
+        chart_cache.put(key, ascendant)
+    return ascendant
+
+
+def get_generate_natal(name, year, month, day, hour, minute, lat, lng, tz_str,
+                       engine: Optional[str] = None) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    (natal, retrogrades) for /generate: natal is {Planet: {"sign", "degree", "house"}} and
+    retrogrades lists the retrograde planets.
+
+    engine defaults to settings.GENERATE_CHART_ENGINE. "swisseph" is memoized per birth
+    key, so a known user costs a cache lookup; if it fails the request falls back to
+    Kerykeion, which can also be selected outright.
+    """
+    engine = (engine or settings.GENERATE_CHART_ENGINE).lower()
+    if engine not in GENERATE_ENGINES:
+        logger.warning(f"[CHARTS] unknown /generate engine {engine!r}, using swisseph")
+        engine = "swisseph"
+
+    chart = None
+    if engine == "swisseph":
+        try:
+            chart = _cached_generate_natal(year, month, day, hour, minute, lat, lng, tz_str)
+            GENERATE_CHARTS.inc(engine="swisseph", outcome="ok")
+        except Exception as e:
+            GENERATE_CHARTS.inc(engine="swisseph", outcome="error")
+            logger.error(f"[CHARTS] swisseph /generate chart failed, falling back to Kerykeion: {e}")
+    if chart is None:
+        chart = calculate_generate_natal_kerykeion(name, year, month, day, hour, minute, lat, lng, tz_str)
+        GENERATE_CHARTS.inc(engine="kerykeion", outcome="ok")
+
+    natal = {planet: {"sign": d["sign"], "degree": d["degree"], "house": d["house"]} for planet, d in chart.items()}
+    retro = [planet for planet, d in chart.items() if d.get("retrograde")]
+    return natal, retro
@@ -0,0 +1,106 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from app.services.astrology.chart_calculations import get_skyfield
+from app.services.observability.tracing import span
+from app.services.runtime.singletons import singletons
+from app.services.runtime.warmup import timed_import
+
+logger = logging.getLogger(__name__)
+
+# Skyfield kernel names for the bodies we report; the Jupiter/Saturn barycentres are what
+# de421 provides (and what get_transits_swisseph has always used)
+BODIES: Dict[str, str] = {
+    "Sun": "sun",
+    "Moon": "moon",
+    "Mercury": "mercury",
+    "Venus": "venus",
+    "Mars": "mars",
+    "Jupiter": "jupiter barycenter",
+    "Saturn": "saturn barycenter",
+}
+
+
+class EphemerisEngine:
+    """
+    Geocentric ecliptic longitudes and speeds for many instants at once.
+
+    Every call evaluates the whole time array in one vectorized skyfield observe per
+    body, so a year at hourly resolution costs about as much as a handful of scalar
+    calls. Longitudes are in degrees [0, 360) on the J2000 ecliptic (the frame
+    ecliptic_latlon() uses, so results match get_transits_swisseph), or on the true
+    ecliptic and equinox of date with of_date=True (tropical positions, as used for exact
+    ingress times); speeds are in degrees/day, negative when retrograde.
+    """
+
+    def __init__(self, ts=None, planets=None, bodies: Optional[Dict[str, str]] = None, of_date: bool = False):
+        if ts is None or planets is None:
+            ts, planets = get_skyfield()
+        self.ts = ts
+        self.planets = planets
+        self.bodies = dict(bodies or BODIES)
+        self.names = list(self.bodies)
+        self._earth = planets["earth"]
+        self._targets = [planets[key] for key in self.bodies.values()]
+        framelib = timed_import("skyfield.framelib")
+        self.of_date = of_date
+        self._frame = framelib.ecliptic_frame if of_date else framelib.ecliptic_J2000_frame
+        self._np = timed_import("numpy")
+
+    def times_utc(self, start: datetime, count: int, step_hours: float = 1.0):
+        """Skyfield Time array: `count` instants every `step_hours` from `start` (UTC)."""
+        if start.tzinfo is not None:
+            start = start.astimezone(timezone.utc)
+        np = self._np
+        hours = start.hour + start.minute / 60.0 + start.second / 3600.0 + np.arange(count) * step_hours
+        return self.ts.utc(start.year, start.month, start.day, hours)
+
+    def _as_time(self, times):
+        # A skyfield Time passes through; a NumPy array (or sequence) is taken as TT Julian dates
+        if hasattr(times, "tt"):
+            return times
+        return self.ts.tt_jd(self._np.asarray(times, dtype=float))
+
+    @span("ephemeris.vectorized")
+    def longitudes(self, times, with_speed: bool = True) -> Tuple["numpy.ndarray", Optional["numpy.ndarray"]]:
+        """
+        (longitudes, speeds) as (n_times x n_bodies) float arrays, columns in self.names
+        order. `times` is a skyfield Time (scalar or array) or a NumPy array of TT Julian
+        dates. speeds is None when with_speed=False (skips the velocity transform).
+        """
+        np = self._np
+        t = self._as_time(times)
+        observer = self._earth.at(t)
+        n = 1 if np.ndim(t.tt) == 0 else len(t.tt)
+        lon = np.empty((n, len(self._targets)))
+        speed = np.empty((n, len(self._targets))) if with_speed else None
+        for j, target in enumerate(self._targets):
+            astrometric = observer.observe(target)
+            if with_speed:
+                _, body_lon, _, _, lon_rate, _ = astrometric.frame_latlon_and_rates(self._frame)
+                speed[:, j] = lon_rate.degrees.per_day
+            else:
+                _, body_lon, _ = astrometric.frame_latlon(self._frame)
+            lon[:, j] = body_lon.degrees % 360.0
+        return lon, speed
+
+    def latitudes(self, times, body: str) -> "numpy.ndarray":
+        """Ecliptic latitude (degrees) of one body at every instant, in the engine's frame."""
+        t = self._as_time(times)
+        body_lat, _, _ = self._earth.at(t).observe(self.planets[self.bodies[body]]).frame_latlon(self._frame)
+        return self._np.atleast_1d(body_lat.degrees)
+
+    def longitudes_by_name(self, times, with_speed: bool = True) -> Dict[str, Dict[str, "numpy.ndarray"]]:
+        """Same as longitudes(), as {body: {"longitude": array, "speed": array}}."""
+        lon, speed = self.longitudes(times, with_speed=with_speed)
+        return {
+            name: {"longitude": lon[:, j], "speed": speed[:, j] if speed is not None else None}
+            for j, name in enumerate(self.names)
+        }
+
+
+def get_ephemeris_engine() -> EphemerisEngine:
+    """Process-wide engine over the shared skyfield timescale and de421 kernel."""
+    return singletons.get("ephemeris_engine", EphemerisEngine)
+
@@ -0,0 +1,274 @@
+"""
+Ephemeris data files: Swiss Ephemeris (.se1) and the JPL kernel skyfield reads (de421.bsp).
+
+Both live in SWEPH_EPHE_PATH. They are verified at startup: the files must be present,
+each must have a checksum in SHA256SUMS that matches, the kernel must have a DAF/SPK header, and
+swisseph must actually read its files rather than fall back to the Moshier model. A
+missing kernel is downloaded only when EPHEMERIS_ALLOW_DOWNLOAD is on, with a hard
+timeout. Otherwise startup fails with an error naming the file, instead of skyfield's
+load() blocking on a download with no timeout.
+
+The kernel is opened through jplephem, which memory-maps it, so the gunicorn master and
+every worker read the same page-cache pages. The warmup touches the served date range
+so those pages are resident before the first request.
+
+    python -m app.services.astrology.ephemeris_files            # verify, print a report
+    python -m app.services.astrology.ephemeris_files --download # fetch the kernel if missing
+    python -m app.services.astrology.ephemeris_files --write-manifest
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import swisseph as swe
+
+from app.config.settings import settings
+from app.services.runtime.warmup import timed_import
+
+logger = logging.getLogger(__name__)
+
+SWISSEPH_FILES = ("sepl_18.se1", "semo_18.se1")  # planets and Moon, 1800-2399
+SPK_MAGIC = b"DAF/SPK "
+KERNEL_URLS = {"de421.bsp": "https://ssd.jpl.nasa.gov/ftp/eph/planets/bsp/de421.bsp"}
+MANIFEST = "SHA256SUMS"
+
+
+class EphemerisUnavailable(RuntimeError):
+    """Required ephemeris data is missing or corrupt and can't be fetched."""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class EphemerisManager:
+    def __init__(self, directory: str, kernel: str = "de421.bsp", allow_download: bool = True,
+                 download_timeout: float = 30.0, verify_checksums: bool = True):
+        self.directory = directory
+        self.kernel = kernel
+        self.allow_download = allow_download
+        self.download_timeout = download_timeout
+        self.verify_checksums = verify_checksums
+        self._lock = threading.Lock()
+        self._report: Optional[Dict[str, Any]] = None
+        self._kernel_obj = None
+        self._touched: Optional[Dict[str, Any]] = None
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _after_fork_in_child(self):
+        # swisseph keeps its files open with a shared seek offset; reopen them per process
+        self._lock = threading.Lock()
+        swe.close()
+        self.configure_swisseph()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def kernel_path(self) -> str:
+        path = self.path(self.kernel)
+        # Older deployments let skyfield drop the kernel in the working directory
+        if not os.path.exists(path) and os.path.exists(self.kernel):
+            return os.path.abspath(self.kernel)
+        return path
+
+    def configure_swisseph(self):
+        swe.set_ephe_path(self.directory)
+
+    def _manifest(self) -> Dict[str, str]:
+        try:
+            with open(self.path(MANIFEST), encoding="utf-8") as f:
+                lines = [line.split() for line in f if line.strip() and not line.startswith("#")]
+        except FileNotFoundError:
+            return {}
+        return {parts[1].lstrip("*"): parts[0].lower() for parts in lines if len(parts) == 2}
+
+    def verify(self) -> Dict[str, Any]:
+        """Check every required file; returns a report whose "problems" list is empty when all is well."""
+        manifest = self._manifest() if self.verify_checksums else {}
+        files: Dict[str, Dict[str, Any]] = {}
+        problems: List[str] = []
+        for name in list(SWISSEPH_FILES) + [self.kernel]:
+            path = self.kernel_path() if name == self.kernel else self.path(name)
+            entry: Dict[str, Any] = {"path": path, "exists": os.path.isfile(path)}
+            files[name] = entry
+            if not entry["exists"]:
+                problems.append(f"{name} missing from {self.directory}")
+                continue
+            entry["size"] = os.path.getsize(path)
+            if name == self.kernel:
+                with open(path, "rb") as f:
+                    if f.read(len(SPK_MAGIC)) != SPK_MAGIC:
+                        problems.append(f"{name} is not a DAF/SPK kernel")
+            if self.verify_checksums and name not in manifest:
+                problems.append(f"{name} has no checksum in {MANIFEST}; add one with --write-manifest")
+            elif name in manifest:
+                entry["sha256_ok"] = _sha256(path) == manifest[name]
+                if not entry["sha256_ok"]:
+                    problems.append(f"{name} does not match its {MANIFEST} checksum")
+
+        if all(files[name]["exists"] for name in SWISSEPH_FILES):
+            self.configure_swisseph()
+            _, flags = swe.calc_ut(swe.julday(2000, 1, 1, 12.0), swe.MOON, swe.FLG_SWIEPH)
+            if not flags & swe.FLG_SWIEPH:
+                problems.append("swisseph fell back to the Moshier model; its files are unreadable")
+
+        report = {"directory": self.directory, "files": files, "problems": problems, "ok": not problems}
+        self._report = report
+        return report
+
+    def check(self):
+        """
+        Startup gate: verify, fetch a missing kernel if allowed, and raise
+        EphemerisUnavailable naming what's wrong otherwise.
+        """
+        report = self.verify()
+        missing_kernel = not report["files"][self.kernel]["exists"]
+        if missing_kernel and self.allow_download:
+            self.download_kernel()
+            report = self.verify()
+        if report["problems"]:
+            hint = "" if self.allow_download else " (EPHEMERIS_ALLOW_DOWNLOAD is off)"
+            raise EphemerisUnavailable("; ".join(report["problems"]) + hint)
+        logger.info(f"[EPHEMERIS] verified {len(report['files'])} files in {self.directory}")
+
+    def download_kernel(self):
+        url = KERNEL_URLS.get(self.kernel)
+        if url is None:
+            raise EphemerisUnavailable(f"no download URL known for {self.kernel}")
+        httpx = timed_import("httpx")
+        target = self.path(self.kernel)
+        # Per-process partial file: workers starting together may all fetch; the last rename wins
+        partial = f"{target}.{os.getpid()}.part"
+        with self._lock:
+            if os.path.exists(target):
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            started = time.perf_counter()
+            logger.info(f"[EPHEMERIS] downloading {url} (timeout {self.download_timeout}s)")
+            try:
+                with httpx.stream("GET", url, timeout=self.download_timeout, follow_redirects=True) as response:
+                    response.raise_for_status()
+                    with open(partial, "wb") as f:
+                        for chunk in response.iter_bytes(1 << 20):
+                            f.write(chunk)
+                os.replace(partial, target)
+            except Exception as e:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise EphemerisUnavailable(f"could not download {self.kernel} from {url}: {e}")
+            logger.info(f"[EPHEMERIS] downloaded {self.kernel} in {time.perf_counter() - started:.1f}s")
+
+    def load_timescale(self):
+        # Built-in leap second and Delta T tables: never a network fetch
+        return timed_import("skyfield.api").load.timescale(builtin=True)
+
+    def load_kernel(self):
+        """The memory-mapped SPK kernel; downloads it first only when allowed."""
+        path = self.kernel_path()
+        if not os.path.exists(path):
+            if not self.allow_download:
+                raise EphemerisUnavailable(f"{self.kernel} missing from {self.directory} and downloads are disabled")
+            self.download_kernel()
+            path = self.kernel_path()
+        self._kernel_obj = timed_import("skyfield.jpllib").SpiceKernel(path)
+        return self._kernel_obj
+
+    def touch(self, start_year: int, end_year: int):
+        """Evaluate both ephemerides weekly over the served years so their pages are resident."""
+        from app.services.astrology.ephemeris_engine import get_ephemeris_engine
+
+        started = time.perf_counter()
+        engine = get_ephemeris_engine()
+        first = datetime(start_year, 1, 1, tzinfo=timezone.utc)
+        weeks = int((datetime(end_year + 1, 1, 1, tzinfo=timezone.utc) - first).days / 7) + 1
+        engine.longitudes(engine.times_utc(first, weeks, 24 * 7), with_speed=False)
+
+        self.configure_swisseph()
+        jd = swe.julday(start_year, 1, 1, 0.0)
+        last = swe.julday(end_year + 1, 1, 1, 0.0)
+        while jd < last:
+            for planet in (swe.SUN, swe.MOON, swe.MERCURY, swe.VENUS, swe.MARS, swe.JUPITER, swe.SATURN):
+                swe.calc_ut(jd, planet, swe.FLG_SWIEPH)
+            jd += 30.0
+        self._touched = {
+            "years": [start_year, end_year],
+            "seconds": round(time.perf_counter() - started, 3),
+            "pid": os.getpid(),
+        }
+        logger.info(f"[EPHEMERIS] touched {start_year}-{end_year} in {self._touched['seconds']}s")
+
+    def kernel_mmapped(self) -> Optional[bool]:
+        if self._kernel_obj is None:
+            return None
+        daf = self._kernel_obj.spk.daf
+        mapped = getattr(daf, "_map", None)
+        return isinstance(getattr(mapped, "obj", mapped), mmap.mmap)
+
+    def stats(self) -> Dict[str, Any]:
+        report = self._report or {}
+        return {
+            "directory": self.directory,
+            "ok": report.get("ok"),
+            "problems": report.get("problems", []),
+            "files": {name: {k: v for k, v in entry.items() if k != "path"} for name, entry in report.get("files", {}).items()},
+            "kernel_mmapped": self.kernel_mmapped(),
+            "touched": self._touched,
+        }
+
+    def write_manifest(self) -> Dict[str, str]:
+        sums = {}
+        for name in list(SWISSEPH_FILES) + [self.kernel]:
+            path = self.path(name)
+            if os.path.isfile(path):
+                sums[name] = _sha256(path)
+        with open(self.path(MANIFEST), "w", encoding="utf-8") as f:
+            for name, digest in sums.items():
+                f.write(f"{digest}  {name}\n")
+        return sums
+
+
+ephemeris_files = EphemerisManager(
+    directory=settings.SWEPH_EPHE_PATH,
+    kernel=settings.SKYFIELD_KERNEL,
+    allow_download=settings.EPHEMERIS_ALLOW_DOWNLOAD,
+    download_timeout=settings.EPHEMERIS_DOWNLOAD_TIMEOUT,
+    verify_checksums=settings.EPHEMERIS_VERIFY_CHECKSUMS,
+)
+
+
+def touch_served_range():
+    """Warmup step: birth years from EPHEMERIS_WARM_START_YEAR through the years we forecast."""
+    year = datetime.now(timezone.utc).year
+    ephemeris_files.touch(settings.EPHEMERIS_WARM_START_YEAR, year + settings.EPHEMERIS_WARM_YEARS_AHEAD)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verify (and optionally fetch) the ephemeris data files")
+    parser.add_argument("--download", action="store_true", help="Download the skyfield kernel if it is missing")
+    parser.add_argument("--write-manifest", action="store_true", help=f"Record the current files' checksums in {MANIFEST}")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.download and not os.path.exists(ephemeris_files.kernel_path()):
+        ephemeris_files.download_kernel()
+    if args.write_manifest:
+        print(json.dumps(ephemeris_files.write_manifest(), indent=2))
+    report = ephemeris_files.verify()
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
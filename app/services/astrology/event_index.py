@@ -0,0 +1,397 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from app.config.settings import settings
+from app.services.astrology.ephemeris_engine import BODIES, EphemerisEngine
+from app.services.observability.tracing import span
+from app.services.runtime.singletons import singletons
+from app.services.runtime.warmup import timed_import
+
+logger = logging.getLogger(__name__)
+
+# Bump when the finder changes (bodies, thresholds, frame) so stored years are recomputed
+EVENT_ENGINE_VERSION = 1
+
+SIGNS = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+
+EVENT_BODIES = {
+    **BODIES,
+    "Uranus": "uranus barycenter",
+    "Neptune": "neptune barycenter",
+    "Pluto": "pluto barycenter",
+}
+STATION_BODIES = [name for name in EVENT_BODIES if name not in ("Sun", "Moon")]
+EVENT_KINDS = ("ingress", "station_retrograde", "station_direct", "new_moon", "full_moon", "solar_eclipse", "lunar_eclipse")
+
+# Moon's ecliptic latitude at syzygy below which an eclipse occurs (approximate ecliptic
+# limits; the lunar one includes penumbral eclipses, umbral ones are below ~1.09°)
+SOLAR_ECLIPSE_LIMIT = 1.58
+LUNAR_ECLIPSE_LIMIT = 1.55
+LUNAR_UMBRAL_LIMIT = 1.09
+
+SAMPLE_STEP_HOURS = 6.0  # the Moon moves ~3.3° per step, so no sign or phase is skipped
+BISECT_ITERATIONS = 17  # 6 h / 2**17 ≈ 0.2 s
+FIRST_YEAR, LAST_YEAR = 1900, 2049  # de421 coverage
+
+
+def _wrap180(x):
+    return (x + 180.0) % 360.0 - 180.0
+
+
+def _bisect_roots(np, f, lo, hi):
+    """Vectorized bisection: f maps a jd array to values whose sign differs at lo and hi."""
+    f_lo = f(lo)
+    for _ in range(BISECT_ITERATIONS):
+        mid = (lo + hi) / 2
+        f_mid = f(mid)
+        same = np.signbit(f_mid) == np.signbit(f_lo)
+        lo, f_lo = np.where(same, mid, lo), np.where(same, f_mid, f_lo)
+        hi = np.where(same, hi, mid)
+    return (lo + hi) / 2
+
+
+@span("ephemeris.events")
+def find_events(engine: EphemerisEngine, year: int) -> List[Dict[str, Any]]:
+    """
+    Ingresses, stations, lunations and eclipses in one calendar year (UTC), each at its
+    exact time: crossings are bracketed on a 6-hourly grid evaluated in one vectorized
+    call, then refined by bisection on the ephemeris, all brackets at once.
+    """
+    np = timed_import("numpy")
+    start = datetime(year, 1, 1, tzinfo=timezone.utc)
+    end = datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    count = int((end - start).total_seconds() / 3600 / SAMPLE_STEP_HOURS) + 3
+    grid = engine.times_utc(start - timedelta(hours=SAMPLE_STEP_HOURS), count, SAMPLE_STEP_HOURS)
+    jd = grid.tt
+    lon, speed = engine.longitudes(grid, with_speed=True)
+    col = {name: j for j, name in enumerate(engine.names)}
+
+    def lon_at(times, columns):
+        values, _ = engine.longitudes(times, with_speed=False)
+        return values[np.arange(len(columns)), columns]
+
+    def speed_at(times, columns):
+        _, values = engine.longitudes(times, with_speed=True)
+        return values[np.arange(len(columns)), columns]
+
+    found = []  # (jd, kind, body, extra)
+
+    # Sign ingresses: the sign index changes between grid points
+    sign = np.floor(lon / 30.0).astype(int) % 12
+    steps, columns = np.nonzero(sign[1:] != sign[:-1])
+    if len(steps):
+        forward = _wrap180(lon[steps + 1, columns] - lon[steps, columns]) > 0
+        boundary = np.where(forward, sign[steps + 1, columns], sign[steps, columns]) * 30.0
+        roots = _bisect_roots(np, lambda t: _wrap180(lon_at(t, columns) - boundary), jd[steps], jd[steps + 1])
+        for t, j, fwd, b in zip(roots.tolist(), columns.tolist(), forward.tolist(), boundary.tolist()):
+            entered = int(b // 30) % 12 if fwd else (int(b // 30) - 1) % 12
+            found.append((t, "ingress", engine.names[j], {"sign": SIGNS[entered], "direction": "direct" if fwd else "retrograde"}))
+
+    # Stations: the longitude speed changes sign
+    station_cols = np.array([col[name] for name in STATION_BODIES if name in col], dtype=int)
+    retro = speed[:, station_cols] < 0
+    steps, k = np.nonzero(retro[1:] != retro[:-1])
+    if len(steps):
+        columns = station_cols[k]
+        roots = _bisect_roots(np, lambda t: speed_at(t, columns), jd[steps], jd[steps + 1])
+        for t, j, turning_retro in zip(roots.tolist(), columns.tolist(), retro[steps + 1, k].tolist()):
+            found.append((t, "station_retrograde" if turning_retro else "station_direct", engine.names[j], {}))
+
+    # Lunations: Moon-Sun elongation crosses 0 (new) or 180 (full)
+    moon, sun = col["Moon"], col["Sun"]
+    elongation = (lon[:, moon] - lon[:, sun]) % 360.0
+    for kind, target in (("new_moon", 0.0), ("full_moon", 180.0)):
+        offset = _wrap180(elongation - target)
+        steps = np.nonzero((offset[:-1] < 0) & (offset[1:] >= 0))[0]
+        if not len(steps):
+            continue
+        pair = np.full(len(steps), moon)
+        sun_cols = np.full(len(steps), sun)
+
+        def phase_offset(t, target=target, pair=pair, sun_cols=sun_cols):
+            values, _ = engine.longitudes(t, with_speed=False)
+            rows = np.arange(len(pair))
+            return _wrap180(values[rows, pair] - values[rows, sun_cols] - target)
+
+        roots = _bisect_roots(np, phase_offset, jd[steps], jd[steps + 1])
+        latitude = engine.latitudes(roots, "Moon")
+        for t, beta in zip(roots.tolist(), latitude.tolist()):
+            found.append((t, kind, "Moon", {}))
+            if kind == "new_moon" and abs(beta) < SOLAR_ECLIPSE_LIMIT:
+                found.append((t, "solar_eclipse", "Sun", {"moon_latitude": round(beta, 3)}))
+            elif kind == "full_moon" and abs(beta) < LUNAR_ECLIPSE_LIMIT:
+                found.append((t, "lunar_eclipse", "Moon", {
+                    "moon_latitude": round(beta, 3),
+                    "type": "umbral" if abs(beta) < LUNAR_UMBRAL_LIMIT else "penumbral",
+                }))
+
+    if not found:
+        return []
+    times = np.array([f[0] for f in found])
+    utc = engine.ts.tt_jd(times).utc_datetime()
+    event_lon, _ = engine.longitudes(times, with_speed=False)
+    lo, hi = start.timestamp(), end.timestamp()
+    events = []
+    for i, (_, kind, body, extra) in enumerate(found):
+        when = utc[i].timestamp()
+        if not lo <= when < hi:
+            continue
+        longitude = float(event_lon[i, col[body]])
+        events.append({
+            "t": round(when, 1),
+            "kind": kind,
+            "body": body,
+            "sign": extra.pop("sign", SIGNS[int(longitude // 30) % 12]),
+            "longitude": round(longitude, 3),
+            **extra,
+        })
+    events.sort(key=lambda e: e["t"])
+    return events
+
+
+def _as_timestamp(value) -> float:
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _iso(t: float) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _public(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {**event, "time": _iso(event["t"])}
+
+
+class EventIndex:
+    """
+    Astronomical events, sorted by time, per computed year.
+
+    Years are computed once (find_events, ~1 s) and stored in a SQLite table on local
+    disk, shared by workers and kept across restarts; each process loads them into sorted
+    arrays. Range queries are two bisects over the event times, and "is X retrograde
+    now" is a bisect over that body's stations (the retrograde intervals run from each
+    station_retrograde to the next station_direct), so lookups are O(log n).
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conns = threading.local()
+        self._years: set = set()
+        self._times: List[float] = []
+        self._events: List[Dict[str, Any]] = []
+        self._stations: Dict[str, tuple] = {}  # body -> (times, turned_retrograde flags)
+        self._stats = {"queries": 0, "computed_years": 0, "disk_years": 0}
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except Exception as e:
+                logger.error(f"[EVENTS] disk index at {self.db_path} unavailable, using memory only: {e}")
+                self.db_path = None
+
+    def _after_fork_in_child(self):
+        self._lock = threading.RLock()
+        self._conns = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._conns, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conns.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS astro_event_years (year INTEGER NOT NULL, version INTEGER NOT NULL, "
+            "events TEXT NOT NULL, computed_at REAL NOT NULL, PRIMARY KEY (year, version))"
+        )
+
+    def _load_year(self, year: int) -> Optional[List[Dict[str, Any]]]:
+        if not self.db_path:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT events FROM astro_event_years WHERE year = ? AND version = ?", (year, EVENT_ENGINE_VERSION)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"[EVENTS] disk lookup failed for {year}: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _store_year(self, year: int, events: List[Dict[str, Any]]):
+        if not self.db_path:
+            return
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO astro_event_years (year, version, events, computed_at) VALUES (?, ?, ?, ?)",
+                (year, EVENT_ENGINE_VERSION, json.dumps(events, separators=(",", ":")), time.time()),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[EVENTS] failed to persist {year}: {e}")
+
+    def _merge(self, events: List[Dict[str, Any]]):
+        merged = sorted(self._events + events, key=lambda e: e["t"])
+        stations: Dict[str, tuple] = {}
+        for event in merged:
+            if event["kind"] in ("station_retrograde", "station_direct"):
+                times, flags = stations.setdefault(event["body"], ([], []))
+                times.append(event["t"])
+                flags.append(event["kind"] == "station_retrograde")
+        self._events = merged
+        self._times = [e["t"] for e in merged]
+        self._stations = stations
+
+    def ensure_years(self, first: int, last: int):
+        """Load (or compute and store) every year from first to last inclusive."""
+        if not FIRST_YEAR <= first <= last <= LAST_YEAR:
+            raise ValueError(f"events are available for {FIRST_YEAR}-{LAST_YEAR}")
+        missing = [year for year in range(first, last + 1) if year not in self._years]
+        if not missing:
+            return
+        with self._lock:
+            for year in missing:
+                if year in self._years:
+                    continue
+                events = self._load_year(year)
+                if events is not None:
+                    self._stats["disk_years"] += 1
+                else:
+                    started = time.perf_counter()
+                    events = find_events(get_event_engine(), year)
+                    self._store_year(year, events)
+                    self._stats["computed_years"] += 1
+                    logger.info(f"[EVENTS] computed {len(events)} events for {year} in {time.perf_counter() - started:.2f}s")
+                self._merge(events)
+                self._years.add(year)
+
+    def _ensure_span(self, start: float, end: float):
+        first = datetime.fromtimestamp(start, tz=timezone.utc).year
+        last = datetime.fromtimestamp(end, tz=timezone.utc).year
+        # The previous year too, so a retrograde period running into the range has its station
+        self.ensure_years(max(FIRST_YEAR, first - 1), last)
+
+    def between(self, start, end, kinds: Optional[Iterable[str]] = None,
+                bodies: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Events with start <= time < end (datetimes or unix seconds), oldest first."""
+        lo, hi = _as_timestamp(start), _as_timestamp(end)
+        self._ensure_span(lo, hi)
+        kinds = set(kinds) if kinds else None
+        bodies = set(bodies) if bodies else None
+        with self._lock:
+            self._stats["queries"] += 1
+            times, events = self._times, self._events
+        selected = events[bisect_left(times, lo):bisect_left(times, hi)]
+        return [
+            _public(e) for e in selected
+            if (kinds is None or e["kind"] in kinds) and (bodies is None or e["body"] in bodies)
+        ]
+
+    def upcoming(self, after=None, days: float = 30, limit: Optional[int] = None,
+                 kinds: Optional[Iterable[str]] = None, bodies: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Events in the next `days` days from `after` (default now)."""
+        lo = _as_timestamp(after)
+        events = self.between(lo, lo + days * 86400, kinds=kinds, bodies=bodies)
+        return events[:limit] if limit else events
+
+    def retrogrades_at(self, when=None) -> List[Dict[str, Any]]:
+        """Bodies retrograde at `when` (default now), with the stations bounding each period."""
+        t = _as_timestamp(when)
+        self._ensure_span(t, t)
+        with self._lock:
+            self._stats["queries"] += 1
+            stations = self._stations
+        active = []
+        for body, (times, flags) in stations.items():
+            i = bisect_right(times, t) - 1
+            if i >= 0 and flags[i]:
+                until = times[i + 1] if i + 1 < len(times) else None
+                active.append({
+                    "body": body,
+                    "since": _iso(times[i]),
+                    "until": _iso(until) if until is not None else None,
+                })
+        return active
+
+    def timing_context(self, when=None, days: int = 30, limit: int = 12,
+                       kinds: Sequence[str] = EVENT_KINDS) -> Dict[str, Any]:
+        """Compact upcoming events for a Worker prompt, so timing advice has real dates."""
+        events = self.upcoming(when, days=days, kinds=kinds)
+        # Moon ingresses (~every 2.5 days) would crowd out everything else
+        events = [e for e in events if not (e["kind"] == "ingress" and e["body"] == "Moon")][:limit]
+        return {
+            "upcoming_events": [
+                {"date": e["time"][:16].replace("T", " ") + " UTC", "event": _describe(e)} for e in events
+            ],
+            "retrogrades": [r["body"] for r in self.retrogrades_at(when)],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "sqlite" if self.db_path else "memory",
+                "engine_version": EVENT_ENGINE_VERSION,
+                "years": sorted(self._years),
+                "events": len(self._events),
+                **self._stats,
+            }
+
+
+def _describe(event: Dict[str, Any]) -> str:
+    kind, body, sign = event["kind"], event["body"], event["sign"]
+    if kind == "ingress":
+        return f"{body} enters {sign}" + (" (retrograde)" if event.get("direction") == "retrograde" else "")
+    if kind == "station_retrograde":
+        return f"{body} stations retrograde in {sign}"
+    if kind == "station_direct":
+        return f"{body} stations direct in {sign}"
+    if kind == "new_moon":
+        return f"New Moon in {sign}"
+    if kind == "full_moon":
+        return f"Full Moon in {sign}"
+    if kind == "solar_eclipse":
+        return f"Solar eclipse in {sign}"
+    return f"{event.get('type', '').capitalize()} lunar eclipse in {sign}".strip()
+
+
+def get_event_engine() -> EphemerisEngine:
+    """Ephemeris on the ecliptic of date (tropical), with the outer planets."""
+    return singletons.get("event_engine", lambda: EphemerisEngine(bodies=EVENT_BODIES, of_date=True))
+
+
+event_index = EventIndex(db_path=settings.EVENT_INDEX_PATH)
+
+
+def safe_timing_context(days: int = 30, limit: int = 12) -> Dict[str, Any]:
+    """timing_context() for webhook payloads: empty lists instead of an exception."""
+    try:
+        return event_index.timing_context(days=days, limit=limit)
+    except Exception as e:
+        logger.error(f"[EVENTS] timing lookup failed: {e}")
+        return {"upcoming_events": [], "retrogrades": []}
+
+
+def prefill_event_index():
+    """Startup warmup: last year through EVENT_INDEX_YEARS_AHEAD years ahead."""
+    year = datetime.now(timezone.utc).year
+    event_index.ensure_years(year - 1, min(LAST_YEAR, year + settings.EVENT_INDEX_YEARS_AHEAD))
@@ -0,0 +1,101 @@
+"""
+Personal daily horoscope: the /generate pipeline as plain functions, shared by the
+endpoint, the webhook's live fallback and the nightly precompute.
+
+    natal chart -> transits -> aspects -> RAG passages -> Worker /personal
+"""
+import json
+import logging
+import random
+from datetime import date
+from typing import Any, Dict
+
+from app.config.settings import settings
+from app.schemas import HoroscopeRequest
+from app.services.astrology.aspects import natal_aspect_labels, transit_aspect_labels
+from app.services.astrology.chart_calculations import get_transits_swisseph
+from app.services.astrology.chart_service import get_generate_natal
+from app.services.chroma_cloud.chromadbClient import safe_get_relevant_passages
+from app.services.http.clients import http_client
+from app.services.observability.tracing import span
+
+logger = logging.getLogger(__name__)
+
+LUCKY_COLORS = ["Saffron", "Emerald", "Gold", "Silver", "Coral", "Pearl"]
+
+
+@span("horoscope.payload")
+def build_horoscope_payload(req: HoroscopeRequest) -> Dict[str, Any]:
+    """The Worker /personal payload for a birth and a date (default today)."""
+    # Natal chart (Swiss Ephemeris, memoized per birth data; Kerykeion when configured or as fallback)
+    logger.info("Calculating natal chart...")
+    natal, retro = get_generate_natal(
+        req.name, req.birth_year, req.birth_month, req.birth_day,
+        req.birth_hour, req.birth_minute, req.lat, req.lng, req.timezone
+    )
+    for planet, d in natal.items():
+        logger.info(f"Natal {planet}: {d['sign']} {d['degree']}°, House {d['house']}")
+    logger.info(f"Retrogrades: {retro if retro else 'None'}")
+
+    # Transits (Swiss Ephemeris, not async)
+    dt = req.date or date.today().isoformat()
+    trans = get_transits_swisseph(req.lat, req.lng, dt)
+    logger.info("Calculating aspects...")
+    aspects = transit_aspect_labels(natal, trans)
+    natal_aspects = natal_aspect_labels(natal)
+    logger.info(f"Aspects: {len(aspects)} transit-natal, {len(natal_aspects)} natal-natal")
+
+    # RAG query with transit availability check
+    unknown_count = sum(1 for p in trans.values() if p["sign"] == "Unknown")
+    trans_str = "Transit data unavailable" if unknown_count > 3 else json.dumps(trans)
+    qc = (f"Vedic horoscope for {req.name}: Natal Sun {natal['Sun']['sign']} {natal['Sun']['degree']}°, "
+          f"Moon {natal['Moon']['sign']} {natal['Moon']['degree']}°, Date {dt}, "
+          f"Transits {trans_str}, Aspects {aspects}, Retrogrades {retro}")
+    passages = safe_get_relevant_passages(qc)
+
+    return {
+        "name": req.name,
+        "natal_chart": natal,
+        "current_transits": trans,
+        "aspects": aspects,
+        "retrogrades": retro,
+        "passages": passages,
+        "date": dt,
+        "language": getattr(req, "language", "en")
+    }
+
+
+@span("horoscope.worker")
+def request_horoscope(payload: Dict[str, Any]) -> Any:
+    """Worker /personal call plus lucky numbers/colours; raises httpx.HTTPError on failure."""
+    headers = {"Authorization": f"Bearer {settings.CF_TOKEN}", "Content-Type": "application/json"}
+    logger.info(f"Worker payload: {json.dumps(payload, indent=2)}")
+    logger.info(f"Sending request to Worker: {settings.WORKER_URL}/personal")
+    res = http_client("worker").post(f"{settings.WORKER_URL}/personal", json=payload, headers=headers)
+    logger.info(f"Worker response: {res.text}")
+    res.raise_for_status()
+    content = res.json()
+
+    add_lucky(content)
+    return content
+
+
+def add_lucky(content: Any, rng=random):
+    """Lucky numbers and colours in practical_guidance (pass a seeded Random for stable picks)."""
+    if isinstance(content, dict):
+        if not isinstance(content.get("practical_guidance"), dict):
+            content["practical_guidance"] = {}
+        content["practical_guidance"]["lucky_numbers"] = rng.sample(range(1, 91), 4)
+        content["practical_guidance"]["lucky_colors"] = rng.sample(LUCKY_COLORS, 2)
+
+
+def generate_horoscope(req: HoroscopeRequest) -> Any:
+    """
+    A user's daily horoscope. HOROSCOPE_GENERATION_MODE "personal" makes one Worker call
+    per request. "archetype" shares one call per (Sun, Moon, rising, date, language) and
+    personalizes it locally.
+    """
+    if settings.HOROSCOPE_GENERATION_MODE.lower() == "archetype":
+        from app.services.astrology.archetype_horoscopes import archetype_horoscopes
+        return archetype_horoscopes.horoscope(req)
+    return request_horoscope(build_horoscope_payload(req))
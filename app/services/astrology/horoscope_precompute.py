@@ -0,0 +1,306 @@
+"""
+Nightly daily-horoscope precompute for active users.
+
+Every HOROSCOPE_PRECOMPUTE_INTERVAL_MINUTES, one process per container (holding a file
+lock) lists users who messaged within HOROSCOPE_ACTIVE_DAYS. It generates the horoscope
+for anyone whose local clock has passed midnight + HOROSCOPE_PRECOMPUTE_AFTER_MINUTES and
+who has none yet for their local date and language. Generation reuses HoroscopeRequest
+and the /generate pipeline, and results go to the D1 daily_horoscopes table keyed by
+(user, local date, language). "today-horoscope" is then one D1 read, with live generation
+only on a miss.
+
+Worker cost is bounded three ways:
+  * at most HOROSCOPE_PRECOMPUTE_CONCURRENCY calls in flight
+  * at most HOROSCOPE_PRECOMPUTE_MAX_PER_RUN per pass
+  * a D1 claim per row, so containers never generate the same horoscope twice and a
+    failing one is retried at most HOROSCOPE_MAX_ATTEMPTS times
+
+    python -m app.services.astrology.horoscope_precompute            # one pass now (e.g. from cron)
+    python -m app.services.astrology.horoscope_precompute --dry-run  # list what is due
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
+
+from app.config.settings import settings
+from app.helpers import parse_date_flexible_safe, parse_time_flexible
+from app.schemas import HoroscopeRequest
+from app.services.astrology.horoscope import generate_horoscope
+from app.services.cloudflare.horoscope_service import (
+    claim_daily_horoscope,
+    fail_daily_horoscope,
+    get_daily_horoscope,
+    list_active_users,
+    purge_archetype_horoscopes,
+    purge_daily_horoscopes,
+    save_daily_horoscope,
+    settled_daily_horoscopes,
+)
+from app.services.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED = registry.counter(
+    "astro_horoscope_precompute_total", "Nightly horoscope precompute results", ["outcome"]
+)
+SERVED = registry.counter(
+    "astro_daily_horoscope_served_total", "today-horoscope replies by source", ["source"]
+)
+
+Due = Tuple[Dict[str, Any], str, str]  # (user row, local date, language)
+
+
+def local_now(tz_name: Optional[str], now: Optional[datetime] = None) -> datetime:
+    try:
+        tz = pytz.timezone(tz_name or settings.DEFAULT_TIMEZONE)
+    except pytz.UnknownTimeZoneError:
+        tz = pytz.timezone(settings.DEFAULT_TIMEZONE)
+    return (now or datetime.now(pytz.utc)).astimezone(tz)
+
+
+def local_date(tz_name: Optional[str], now: Optional[datetime] = None) -> str:
+    """The user's calendar date (YYYY-MM-DD): the key their daily horoscope is stored under."""
+    return local_now(tz_name, now).strftime("%Y-%m-%d")
+
+
+def horoscope_request(user: Dict[str, Any], horoscope_date: str, language: str) -> HoroscopeRequest:
+    birth_date = parse_date_flexible_safe(user["dob"])
+    birth_hour, birth_minute = parse_time_flexible(user["birth_time"])
+    return HoroscopeRequest(
+        name=user["name"],
+        birth_year=birth_date.year,
+        birth_month=birth_date.month,
+        birth_day=birth_date.day,
+        birth_hour=birth_hour,
+        birth_minute=birth_minute,
+        lat=float(user["lat"]),
+        lng=float(user["lng"]),
+        timezone=user["timezone"],
+        date=horoscope_date,
+        language=language,
+    )
+
+
+def stored_horoscope(user_id: str, profile_id: Optional[str], horoscope_date: str, language: str) -> Optional[Any]:
+    """Webhook read path: the precomputed horoscope, or None (miss or D1 error) to generate live."""
+    try:
+        horoscope = get_daily_horoscope(user_id, horoscope_date, language, profile_id)
+    except Exception as e:
+        logger.warning(f"[HOROSCOPE] store read failed for {user_id}: {e}")
+        horoscope = None
+    SERVED.inc(source="store" if horoscope is not None else "live")
+    return horoscope
+
+
+def remember_horoscope(user_id: str, profile_id: Optional[str], horoscope_date: str, language: str, horoscope: Any):
+    """Keep a live-generated horoscope so the user's next request that day is a store hit."""
+    try:
+        save_daily_horoscope(user_id, horoscope_date, language, profile_id, horoscope)
+    except Exception as e:
+        logger.warning(f"[HOROSCOPE] store write failed for {user_id}: {e}")
+
+
+class HoroscopePrecompute:
+    def __init__(self, interval_minutes: float = 15, after_minutes: int = 5, active_days: int = 7,
+                 concurrency: int = 4, max_per_run: int = 500, claim_seconds: float = 300,
+                 max_attempts: int = 3, retention_days: int = 7, lock_path: Optional[str] = None):
+        self.interval = max(60.0, interval_minutes * 60)
+        self.after_minutes = after_minutes
+        self.active_days = active_days
+        self.concurrency = max(1, concurrency)
+        self.max_per_run = max(0, max_per_run)
+        self.claim_seconds = claim_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retention_days = retention_days
+        self.lock_path = lock_path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._purged_on: Optional[str] = None
+        self._last_run: Optional[Dict[str, Any]] = None
+        self._totals = {"runs": 0, "generated": 0, "failed": 0, "claimed_elsewhere": 0}
+        self._stats_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+    def _after_fork_in_child(self):
+        # Preloaded workers each need their own claim identity and scheduler thread
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._stats_lock = threading.Lock()
+
+    def due(self, users: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Due]:
+        """Users whose local time is past midnight + after_minutes, with their local date."""
+        found = []
+        for user in users:
+            local = local_now(user.get("timezone"), now)
+            if local.hour * 60 + local.minute >= self.after_minutes:
+                found.append((user, local.strftime("%Y-%m-%d"), user.get("language") or "en"))
+        return found
+
+    def pending(self, now: Optional[datetime] = None) -> List[Due]:
+        """Due horoscopes not yet ready (nor out of attempts), at most max_per_run."""
+        since = ((now or datetime.now(pytz.utc)).astimezone(pytz.utc) - timedelta(days=self.active_days))
+        since = since.replace(tzinfo=None).isoformat()
+        candidates: List[Due] = []
+        after = ""
+        while True:
+            page = list_active_users(since, after_user_id=after, limit=500)
+            if not page:
+                break
+            candidates += self.due(page, now)
+            after = page[-1]["user_id"]
+            if len(page) < 500:
+                break
+        settled = settled_daily_horoscopes({day for _, day, _ in candidates}, self.max_attempts)
+        todo = [c for c in candidates if (c[0]["user_id"], c[1], c[2], c[0].get("profile_id") or "") not in settled]
+        return todo[:self.max_per_run]
+
+    def _generate_one(self, item: Due) -> str:
+        user, horoscope_date, language = item
+        user_id = user["user_id"]
+        try:
+            if not claim_daily_horoscope(user_id, horoscope_date, language, user.get("profile_id"),
+                                         self.owner, self.claim_seconds, self.max_attempts):
+                return "claimed_elsewhere"
+            horoscope = generate_horoscope(horoscope_request(user, horoscope_date, language))
+            save_daily_horoscope(user_id, horoscope_date, language, user.get("profile_id"), horoscope)
+            return "generated"
+        except Exception as e:
+            logger.error(f"[HOROSCOPE] precompute failed for {user_id} ({horoscope_date}, {language}): {e}")
+            try:
+                fail_daily_horoscope(user_id, horoscope_date, language, self.owner)
+            except Exception:
+                pass  # the claim expires on its own
+            return "failed"
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        todo = self.pending(now)
+        outcomes: Dict[str, int] = {"generated": 0, "failed": 0, "claimed_elsewhere": 0}
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="horoscope") as pool:
+                for outcome in pool.map(self._generate_one, todo):
+                    outcomes[outcome] += 1
+                    PRECOMPUTED.inc(outcome=outcome)
+        self._purge_if_new_day(now)
+        summary = {"due": len(todo), **outcomes, "seconds": round(time.perf_counter() - started, 2),
+                   "finished_at": datetime.utcnow().isoformat()}
+        with self._stats_lock:
+            self._last_run = summary
+            self._totals["runs"] += 1
+            for key, count in outcomes.items():
+                self._totals[key] += count
+        if todo:
+            logger.info(f"[HOROSCOPE] precompute pass: {summary}")
+        return summary
+
+    def _purge_if_new_day(self, now: Optional[datetime]):
+        today = (now or datetime.now(pytz.utc)).strftime("%Y-%m-%d")
+        if self._purged_on == today:
+            return
+        cutoff = ((now or datetime.now(pytz.utc)) - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        try:
+            purge_daily_horoscopes(cutoff)
+            purge_archetype_horoscopes(cutoff)
+            self._purged_on = today
+        except Exception as e:
+            logger.warning(f"[HOROSCOPE] purge failed: {e}")
+
+    def _is_leader(self) -> bool:
+        """One scheduler per container: whoever holds the lock file (released when the process dies)."""
+        if self._lock_file is not None:
+            return True
+        if not self.lock_path:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        f = open(self.lock_path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._is_leader():
+                    self.run_once()
+            except Exception as e:
+                logger.error(f"[HOROSCOPE] precompute pass failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="horoscope-precompute", daemon=True)
+        self._thread.start()
+        logger.info(f"[HOROSCOPE] precompute scheduler started (every {self.interval / 60:.0f} min)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "running": self._thread is not None,
+                "leader": self._lock_file is not None,
+                "concurrency": self.concurrency,
+                "max_per_run": self.max_per_run,
+                "last_run": self._last_run,
+                **self._totals,
+            }
+
+
+horoscope_precompute = HoroscopePrecompute(
+    interval_minutes=settings.HOROSCOPE_PRECOMPUTE_INTERVAL_MINUTES,
+    after_minutes=settings.HOROSCOPE_PRECOMPUTE_AFTER_MINUTES,
+    active_days=settings.HOROSCOPE_ACTIVE_DAYS,
+    concurrency=settings.HOROSCOPE_PRECOMPUTE_CONCURRENCY,
+    max_per_run=settings.HOROSCOPE_PRECOMPUTE_MAX_PER_RUN,
+    claim_seconds=settings.HOROSCOPE_CLAIM_SECONDS,
+    max_attempts=settings.HOROSCOPE_MAX_ATTEMPTS,
+    retention_days=settings.HOROSCOPE_RETENTION_DAYS,
+    lock_path=os.path.join(os.path.dirname(settings.STATE_DB_PATH) or ".", "horoscope_precompute.lock"),
+)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute today's horoscopes for active users")
+    parser.add_argument("--dry-run", action="store_true", help="List due horoscopes without generating them")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.dry_run:
+        for user, horoscope_date, language in horoscope_precompute.pending():
+            print(json.dumps({"user_id": user["user_id"], "date": horoscope_date, "language": language}))
+        return 0
+    print(json.dumps(horoscope_precompute.run_once()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,26 @@ from datetime import datetime
 import json
 import logging
 import re
-import requests
+
+import httpx
 
 from app.config.settings import settings
 from app.config.constants import SKIP_COMMANDS
-from app.helpers import get_city_info, parse_date_flexible, parse_time_flexible
-from app.services.astrology.chart_calculations import calculate_natal_chart_multi_method
+from app.helpers import parse_date_flexible, parse_time_flexible, resolve_birth_city
+from app.services.astrology.chart_service import get_natal_chart
+from app.services.astrology.event_index import safe_timing_context
 from app.services.chroma_cloud.chromadbClient import get_relevant_passages, safe_get_relevant_passages
 from app.services.cloudflare.synastry_service import calculate_synastry_aspects, delete_compatibility_session, save_compatibility_result, save_compatibility_session
 from app.services.cloudflare.users_service import get_user, get_user_language
+from app.services.http.clients import http_client
+from app.services.state.session_store import session_store
 from app.services.whatsapp.send_messageAndEvents import send_whatsapp_interactive
 logger = logging.getLogger(__name__)
 
 
-compatibility_sessions = {}
-users = {}
+# Shared with main.py through the session store
+compatibility_sessions = session_store.namespace("compatibility", ttl=settings.SESSION_TTL_FLOWS)
+users = session_store.namespace("users", ttl=settings.SESSION_TTL_USERS)
 
 
 def handle_compatibility_flow(from_number: str, text: str, user_data: dict) -> str:
@@ -179,15 +184,22 @@ def handle_compatibility_flow(from_number: str, text: str, user_data: dict) -> s
                     "Type 'skip' to exit this flow."
                 )
             
-            session['partner_birth_city'] = city_name
-            
             try:
-                city_info = get_city_info(city_name)
+                city_info, suggestion = resolve_birth_city(city_name, session, key='partner_city_suggestion')
+                if city_info is None:
+                    # A typo-corrected guess is confirmed before it is used
+                    compatibility_sessions[session_id] = session
+                    save_compatibility_session(session_id, session)
+                    if suggestion:
+                        return f"📍 Did you mean *{suggestion}*? Reply *Yes*, or type {session['partner_name']}'s birth city again."
+                    return f"🌆 Please type {session['partner_name']}'s *birth city* again."
+                session['partner_birth_city'] = city_info["name"]
                 session['partner_lat'] = city_info["lat"]
                 session['partner_lng'] = city_info["lng"]
                 session['partner_timezone'] = city_info["tz"]
             except Exception as e:
                 logger.error(f"Error getting city info for {city_name}: {e}")
+                session['partner_birth_city'] = city_name
                 # Use default coordinates (Delhi) as fallback
                 session['partner_lat'] = 28.6139
                 session['partner_lng'] = 77.2090
@@ -198,7 +210,7 @@ def handle_compatibility_flow(from_number: str, text: str, user_data: dict) -> s
             # Calculate partner's natal chart
             try:
                 partner_birth_date = session['partner_birth_date_obj']
-                partner_natal_chart = calculate_natal_chart_multi_method(
+                partner_natal_chart = get_natal_chart(
                     session['partner_name'],
                     partner_birth_date.year,
                     partner_birth_date.month,
@@ -243,13 +255,15 @@ def handle_compatibility_flow(from_number: str, text: str, user_data: dict) -> s
                     "synastry_aspects": aspects,
                     "passages": passages,
                     "names": [session['user_name'], session['partner_name']],
+                    # Real dates for "best days" instead of invented ones
+                    "upcoming_events": safe_timing_context(days=60)["upcoming_events"],
                     "language": get_user_language(get_user(from_number), users, from_number) if 'get_user_language' in globals() else "english",
                 }
                 
                 headers = {"Authorization": f"Bearer {settings.CF_TOKEN}", "Content-Type": "application/json"}
                 
                 try:
-                    res = requests.post(f"{settings.WORKER_URL}/compatibility", json=payload, headers=headers, timeout=60)
+                    res = http_client("worker").post(f"{settings.WORKER_URL}/compatibility", json=payload, headers=headers)
                     res.raise_for_status()
                     compatibility_result = res.json()
                     
@@ -356,7 +370,7 @@ def handle_compatibility_flow(from_number: str, text: str, user_data: dict) -> s
                     
                     return response
                     
-                except requests.RequestException as e:
+                except httpx.HTTPError as e:
                     logger.error(f"Compatibility analysis failed: {e}")
                     compatibility_sessions.pop(session_id, None)
                     delete_compatibility_session(session_id)
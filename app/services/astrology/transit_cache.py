@@ -0,0 +1,168 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from app.config.settings import settings
+from app.services.astrology.ephemeris_engine import get_ephemeris_engine
+from app.services.observability.metrics import registry
+from app.services.observability.tracing import span
+from app.services.runtime.warmup import timed_import
+
+logger = logging.getLogger(__name__)
+
+TRANSIT_BODIES = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn"]
+SIGNS = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+MAX_RANGE_DAYS = 366
+
+TRANSIT_CACHE = registry.counter("astro_transit_cache_total", "Daily transit lookups", ["outcome"])
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+@span("ephemeris.transits")
+def compute_transits(days: List[date]) -> Dict[str, dict]:
+    """
+    Geocentric sign/degree of each body at 12:00 UTC for every day, keyed by YYYY-MM-DD.
+    All days are evaluated in one vectorized engine call.
+    """
+    if not days:
+        return {}
+    np = timed_import("numpy")
+    engine = get_ephemeris_engine()
+    t = engine.ts.utc(
+        np.array([d.year for d in days]),
+        np.array([d.month for d in days]),
+        np.array([d.day for d in days]),
+        12,
+    )
+    longitudes, _ = engine.longitudes(t, with_speed=False)
+    columns = [engine.names.index(name) for name in TRANSIT_BODIES]
+
+    results = {}
+    for i, day in enumerate(days):
+        transits = {}
+        for name, j in zip(TRANSIT_BODIES, columns):
+            lon = float(longitudes[i, j])
+            transits[name] = {"sign": SIGNS[int(lon // 30) % 12], "degree": round(lon % 30, 1)}
+        results[day.isoformat()] = transits
+    return results
+
+
+class TransitCache:
+    """
+    Transit positions per UTC day. Positions don't depend on the user (they are geocentric
+    at noon UTC), so every worker computes each day once and serves it from memory.
+
+    A rolling window of ±window_days around today is filled in one vectorized call. When
+    the UTC date changes the window moves: the new edge day is filled and days outside
+    the window (ones that dropped out, or e.g. a /generate request for a past date) are
+    kept only up to max_extra, least recently used first out.
+    """
+
+    def __init__(self, window_days: int = 30, max_extra: int = 512):
+        self.window_days = max(0, window_days)
+        self.max_extra = max(0, max_extra)
+        self._days: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._today: Optional[date] = None
+        self._prefilled = False
+        self._stats = {"hits": 0, "misses": 0, "computed_days": 0, "rolls": 0}
+
+    def _window(self, today: date) -> List[date]:
+        return [today + timedelta(days=offset) for offset in range(-self.window_days, self.window_days + 1)]
+
+    def _store(self, computed: Dict[str, dict]):
+        with self._lock:
+            for key, transits in computed.items():
+                self._days[key] = transits
+                self._days.move_to_end(key)
+            self._stats["computed_days"] += len(computed)
+            self._trim()
+
+    def _trim(self):
+        if self._today is None:
+            return
+        window = {d.isoformat() for d in self._window(self._today)}
+        extra = [key for key in self._days if key not in window]
+        for key in extra[:max(0, len(extra) - self.max_extra)]:
+            del self._days[key]
+
+    def _roll_if_needed(self) -> bool:
+        """Called on every lookup; returns True when the UTC date changed since the last fill."""
+        today = _utc_today()
+        if today == self._today:
+            return False
+        with self._lock:
+            if today == self._today:
+                return False
+            self._today = today
+            self._stats["rolls"] += 1
+            # Days that left the window now count as extras; the oldest beyond max_extra go
+            self._trim()
+        return True
+
+    def prefill(self):
+        """Fill the whole window around today (startup warmup, and again after each UTC midnight)."""
+        self._prefilled = True
+        self._roll_if_needed()
+        missing = [d for d in self._window(self._today) if d.isoformat() not in self._days]
+        if missing:
+            self._store(compute_transits(missing))
+            logger.info(f"[TRANSITS] cached {len(missing)} days around {self._today.isoformat()}")
+
+    def get(self, day: str) -> dict:
+        """Transits for a YYYY-MM-DD day (a copy, safe to mutate)."""
+        key = datetime.strptime(day, "%Y-%m-%d").date()
+        return self.get_many([key])[key.isoformat()]
+
+    def get_range(self, start: str, end: str) -> Dict[str, dict]:
+        """Transits for every day from start to end inclusive, computing missing days in one call."""
+        first = datetime.strptime(start, "%Y-%m-%d").date()
+        last = datetime.strptime(end, "%Y-%m-%d").date()
+        if last < first:
+            raise ValueError("end must not be before start")
+        if (last - first).days + 1 > MAX_RANGE_DAYS:
+            raise ValueError(f"range is limited to {MAX_RANGE_DAYS} days")
+        return self.get_many([first + timedelta(days=i) for i in range((last - first).days + 1)])
+
+    def get_many(self, days: Iterable[date]) -> Dict[str, dict]:
+        if self._roll_if_needed() and self._prefilled:
+            self.prefill()
+        keys = [d.isoformat() for d in days]
+        found: Dict[str, dict] = {}
+        with self._lock:
+            for key in keys:
+                transits = self._days.get(key)
+                if transits is not None:
+                    self._days.move_to_end(key)
+                    found[key] = transits
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            self._stats["hits"] += len(keys) - len(missing)
+            self._stats["misses"] += len(missing)
+        if found:
+            TRANSIT_CACHE.inc(len(keys) - len(missing), outcome="hit")
+        if missing:
+            TRANSIT_CACHE.inc(len(missing), outcome="miss")
+            computed = compute_transits([date.fromisoformat(key) for key in missing])
+            self._store(computed)
+            found.update(computed)
+        return {key: {name: dict(data) for name, data in found[key].items()} for key in keys}
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "today": self._today.isoformat() if self._today else None,
+                "window_days": self.window_days,
+                "cached_days": len(self._days),
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                **self._stats,
+            }
+
+
+transit_cache = TransitCache(window_days=settings.TRANSIT_PREFILL_DAYS)
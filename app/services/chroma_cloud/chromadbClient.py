@@ -1,9 +1,9 @@
-import chromadb
 import logging
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 
 from app.config import settings
+from app.services.runtime.singletons import singletons
+from app.services.runtime.warmup import timed_import
+from app.services.observability.tracing import record_error, span
 
 
 logger = logging.getLogger(__name__)
@@ -17,8 +17,22 @@ except (ImportError, AttributeError) as e:
     model_name = 'all-MiniLM-L6-v2'  # Fallback
 
 
+def create_embeddings():
+    # langchain_huggingface pulls in torch and sentence-transformers; import on first use only
+    HuggingFaceEmbeddings = timed_import("langchain_huggingface").HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def get_embeddings():
+    """The MiniLM embedding model, loaded once per host when preloaded in the gunicorn master."""
+    return singletons.get("embeddings", create_embeddings)
+
+
 def create_chroma_client():
-    embeddings = HuggingFaceEmbeddings(model_name=model_name)
+    chromadb = timed_import("chromadb")
+    Chroma = timed_import("langchain_chroma").Chroma
+
+    embeddings = get_embeddings()
     
     if settings.USE_CHROMA_CLOUD and all([
         settings.CHROMA_API_KEY, 
@@ -72,11 +86,19 @@ def test_chroma_connection(vector_store):
         logger.error(f"❌ ChromaDB test failed: {e}")
         return False
 
-chroma_client, vector_store = create_chroma_client()
+def get_chroma():
+    """(chroma_client, vector_store), created on first use in each worker (it holds HTTP connections)."""
+    return singletons.get("chroma", create_chroma_client, fork_safe=False)
+
+
+def get_vector_store():
+    return get_chroma()[1]
+
 
+@span("vector.passages")
 def get_relevant_passages(query: str, k: int = 8) -> str:
     try:
-        docs = vector_store.similarity_search(query, k=k)
+        docs = get_vector_store().similarity_search(query, k=k)
         if not docs:
             return "Classical Vedic astrological wisdom applies."
         
@@ -86,6 +108,7 @@ def get_relevant_passages(query: str, k: int = 8) -> str:
         return joined[:2000] + ("..." if len(joined) > 2000 else "")
     except Exception as e:
         logger.error(f"Error retrieving from cloud knowledge base: {e}")
+        record_error("vector.passages", type(e).__name__)
         return "Error retrieving from knowledge base. Using classical principles."
     
 def safe_get_relevant_passages(query, k=6):
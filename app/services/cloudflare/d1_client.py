@@ -1,6 +1,6 @@
 import logging
 
-import requests
+from app.services.http.clients import http_client
 
 logger = logging.getLogger(__name__)
 from app.config.settings import settings
@@ -16,7 +16,7 @@ def execute_d1_query(sql, params=None):
         "params": params or []
     }
     try:
-        response = requests.post(url, json=data, headers=headers, timeout=30)
+        response = http_client("d1").post(url, json=data, headers=headers)
         response.raise_for_status()
         result = response.json()
         
@@ -35,3 +35,29 @@ def execute_d1_query(sql, params=None):
         logger.error(f"D1 query error: {e}")
         raise
 
+
+def execute_d1_batch(statements):
+    """
+    Run several statements in one D1 request (one HTTP round trip) and return the rows of
+    each statement, in order. Statements are sent as a single multi-statement query, so
+    they can't take bound params: only use this for DDL and trusted literals.
+    """
+    sql = ";\n".join(s.strip().rstrip(";") for s in statements if s and s.strip()) + ";"
+    url = f"https://api.cloudflare.com/client/v4/accounts/{settings.CF_ACCOUNT_ID}/d1/database/{settings.CF_D1_DATABASE_ID}/query"
+    headers = {
+        "Authorization": f"Bearer {settings.CF_API_TOKEN}",
+        "Content-Type": "application/json"
+    }
+    try:
+        response = http_client("d1").post(url, json={"sql": sql}, headers=headers)
+        response.raise_for_status()
+        result = response.json()
+
+        if not result["success"]:
+            raise Exception(f"Batch failed: {result['errors']}")
+
+        return [r.get("results", []) for r in result.get("result") or []]
+
+    except Exception as e:
+        logger.error(f"D1 batch error: {e}")
+        raise
@@ -3,16 +3,17 @@ from typing import Dict, Optional
 import unicodedata
 import uuid
 
+from app.config.settings import settings
 from app.services.cloudflare.d1_client import execute_d1_query
+from app.services.state.session_store import session_store
 import logging
 from app.services.whatsapp.send_messageAndEvents import send_feedback_flow_template, send_whatsapp, send_whatsapp_interactive_v2
 logger = logging.getLogger(__name__)
 
 
-feedback_sessions: Dict[str, dict] = {}  # key: user_id (E.164), value: {"stage": str, "rating": str|None, "started_at": str, "last_msg_id": str|None}
+feedback_sessions = session_store.namespace("feedback", ttl=settings.SESSION_TTL_FLOWS)  # key: user_id (E.164), value: {"stage": str, "rating": str|None, "started_at": str, "last_msg_id": str|None}
 
-def create_feedback_tables():
-    sql = """
+USER_FEEDBACK_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS user_feedback (
         feedback_id TEXT PRIMARY KEY,
         user_id TEXT NOT NULL,
@@ -22,7 +23,9 @@ def create_feedback_tables():
         created_at TEXT NOT NULL
     );
     """
-    execute_d1_query(sql)
+
+def create_feedback_tables():
+    execute_d1_query(USER_FEEDBACK_TABLE_SQL)
     logger.info("Feedback table ready.")
 
 def save_user_feedback(user_id, message_id, rating, comments=None):
@@ -0,0 +1,191 @@
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.services.cloudflare.d1_client import execute_d1_query
+
+logger = logging.getLogger(__name__)
+
+# One row per (user, local date, language), for the profile in profile_id (NULL for the
+# main profile; a row made for another profile is a miss and gets replaced). status:
+# 'pending' while a precompute worker holds the claim, 'ready' with the Worker's JSON in
+# horoscope, 'failed' after an error (reclaimable once the claim expires, until attempts
+# runs out).
+DAILY_HOROSCOPES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS daily_horoscopes (
+        user_id TEXT NOT NULL,
+        horoscope_date TEXT NOT NULL,
+        language TEXT NOT NULL,
+        profile_id TEXT,
+        status TEXT NOT NULL,
+        horoscope TEXT,
+        claimed_by TEXT,
+        claimed_at REAL NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (user_id, horoscope_date, language)
+    );
+    """
+
+DAILY_HOROSCOPES_DATE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_daily_horoscopes_date
+    ON daily_horoscopes(horoscope_date);
+    """
+
+
+def get_daily_horoscope(user_id: str, horoscope_date: str, language: str,
+                        profile_id: Optional[str] = None) -> Optional[Any]:
+    """
+    The stored horoscope, or None if it isn't ready or was made for another profile. The
+    main profile is profile_id None, so switching between it and a secondary profile
+    never serves one person's reading to the other.
+    """
+    rows = execute_d1_query(
+        "SELECT profile_id, horoscope FROM daily_horoscopes "
+        "WHERE user_id = ? AND horoscope_date = ? AND language = ? AND status = 'ready'",
+        [user_id, horoscope_date, language],
+    )
+    if not rows or (rows[0]["profile_id"] or None) != (profile_id or None):
+        return None
+    return json.loads(rows[0]["horoscope"])
+
+
+def save_daily_horoscope(user_id: str, horoscope_date: str, language: str, profile_id: Optional[str], horoscope: Any):
+    now = datetime.utcnow().isoformat()
+    execute_d1_query(
+        """
+        INSERT INTO daily_horoscopes
+        (user_id, horoscope_date, language, profile_id, status, horoscope, created_at, updated_at)
+        VALUES (?, ?, ?, ?, 'ready', ?, ?, ?)
+        ON CONFLICT(user_id, horoscope_date, language) DO UPDATE SET
+            profile_id = excluded.profile_id, status = 'ready', horoscope = excluded.horoscope,
+            updated_at = excluded.updated_at
+        """,
+        [user_id, horoscope_date, language, profile_id, json.dumps(horoscope), now, now],
+    )
+
+
+def claim_daily_horoscope(user_id: str, horoscope_date: str, language: str, profile_id: Optional[str],
+                          owner: str, claim_seconds: float, max_attempts: int) -> bool:
+    """
+    Take the right to generate this horoscope: true for exactly one caller until the claim
+    expires. Never true once it is ready or has failed max_attempts times, unless that row
+    was for another profile, which starts over.
+    """
+    now = time.time()
+    stamp = datetime.utcnow().isoformat()
+    execute_d1_query(
+        """
+        INSERT INTO daily_horoscopes
+        (user_id, horoscope_date, language, profile_id, status, claimed_by, claimed_at, attempts, created_at, updated_at)
+        VALUES (?, ?, ?, ?, 'pending', ?, ?, 1, ?, ?)
+        ON CONFLICT(user_id, horoscope_date, language) DO UPDATE SET
+            profile_id = excluded.profile_id, status = 'pending', claimed_by = excluded.claimed_by,
+            claimed_at = excluded.claimed_at, updated_at = excluded.updated_at,
+            attempts = CASE WHEN COALESCE(daily_horoscopes.profile_id, '') = COALESCE(excluded.profile_id, '')
+                            THEN daily_horoscopes.attempts + 1 ELSE 1 END
+        WHERE daily_horoscopes.claimed_at < ? AND (
+            COALESCE(daily_horoscopes.profile_id, '') != COALESCE(excluded.profile_id, '')
+            OR (daily_horoscopes.status != 'ready' AND daily_horoscopes.attempts < ?))
+        """,
+        [user_id, horoscope_date, language, profile_id, owner, now, stamp, stamp, now - claim_seconds, max_attempts],
+    )
+    rows = execute_d1_query(
+        "SELECT claimed_by, status FROM daily_horoscopes WHERE user_id = ? AND horoscope_date = ? AND language = ?",
+        [user_id, horoscope_date, language],
+    )
+    return bool(rows) and rows[0]["claimed_by"] == owner and rows[0]["status"] == "pending"
+
+
+def fail_daily_horoscope(user_id: str, horoscope_date: str, language: str, owner: str):
+    execute_d1_query(
+        "UPDATE daily_horoscopes SET status = 'failed', updated_at = ? "
+        "WHERE user_id = ? AND horoscope_date = ? AND language = ? AND claimed_by = ? AND status = 'pending'",
+        [datetime.utcnow().isoformat(), user_id, horoscope_date, language, owner],
+    )
+
+
+def settled_daily_horoscopes(dates: Iterable[str], max_attempts: int) -> Set[Tuple[str, str, str, str]]:
+    """
+    (user_id, date, language, profile_id) already ready, or out of attempts, for the given
+    dates; profile_id is '' for the main profile.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return set()
+    rows = execute_d1_query(
+        f"SELECT user_id, horoscope_date, language, COALESCE(profile_id, '') AS profile_id FROM daily_horoscopes "
+        f"WHERE horoscope_date IN ({', '.join('?' for _ in dates)}) AND (status = 'ready' OR attempts >= ?)",
+        dates + [max_attempts],
+    )
+    return {(r["user_id"], r["horoscope_date"], r["language"], r["profile_id"]) for r in rows or []}
+
+
+def list_active_users(since: str, after_user_id: str = "", limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Active profile and language of users who sent a message since `since` (UTC ISO
+    timestamp), one row per user ordered by user_id; page with after_user_id. That is the
+    active secondary profile if there is one, else the main profile from users (profile_id
+    None), as get_active_profile picks it.
+    """
+    return execute_d1_query(
+        """
+        SELECT p.owner_user_id AS user_id, p.profile_id, p.name, p.dob, p.birth_time, p.lat, p.lng,
+               p.timezone, COALESCE(u.language, 'en') AS language
+        FROM user_profiles p LEFT JOIN users u ON u.user_id = p.owner_user_id
+        WHERE p.is_active = 1 AND p.owner_user_id > ?
+          AND p.owner_user_id IN (SELECT user_id FROM chat_contexts WHERE role = 'user' AND timestamp >= ?)
+        UNION ALL
+        SELECT u.user_id, NULL AS profile_id, u.name, u.dob, u.birth_time, u.lat, u.lng,
+               u.timezone, COALESCE(u.language, 'en') AS language
+        FROM users u
+        WHERE u.user_id > ? AND u.dob IS NOT NULL AND u.lat IS NOT NULL
+          AND u.user_id IN (SELECT user_id FROM chat_contexts WHERE role = 'user' AND timestamp >= ?)
+          AND NOT EXISTS (SELECT 1 FROM user_profiles p WHERE p.owner_user_id = u.user_id AND p.is_active = 1)
+        ORDER BY user_id
+        LIMIT ?
+        """,
+        [after_user_id, since, after_user_id, since, limit],
+    ) or []
+
+
+def purge_daily_horoscopes(before_date: str):
+    execute_d1_query("DELETE FROM daily_horoscopes WHERE horoscope_date < ?", [before_date])
+
+
+# Shared readings for a (sun, moon, ascendant, date, language) archetype, personalized per
+# user in app; at most 12^3 rows per language and day.
+ARCHETYPE_HOROSCOPES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS archetype_horoscopes (
+        archetype_key TEXT PRIMARY KEY,
+        horoscope_date TEXT NOT NULL,
+        language TEXT NOT NULL,
+        horoscope TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    );
+    """
+
+ARCHETYPE_HOROSCOPES_DATE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS idx_archetype_horoscopes_date
+    ON archetype_horoscopes(horoscope_date);
+    """
+
+
+def get_archetype_horoscope(archetype_key: str) -> Optional[Any]:
+    rows = execute_d1_query("SELECT horoscope FROM archetype_horoscopes WHERE archetype_key = ?", [archetype_key])
+    return json.loads(rows[0]["horoscope"]) if rows else None
+
+
+def save_archetype_horoscope(archetype_key: str, horoscope_date: str, language: str, horoscope: Any):
+    execute_d1_query(
+        "INSERT OR IGNORE INTO archetype_horoscopes (archetype_key, horoscope_date, language, horoscope, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [archetype_key, horoscope_date, language, json.dumps(horoscope), datetime.utcnow().isoformat()],
+    )
+
+
+def purge_archetype_horoscopes(before_date: str):
+    execute_d1_query("DELETE FROM archetype_horoscopes WHERE horoscope_date < ?", [before_date])
@@ -0,0 +1,228 @@
+"""
+Versioned D1 schema migrations.
+
+    python -m app.services.cloudflare.migrations            # apply pending migrations
+    python -m app.services.cloudflare.migrations --status   # show current / latest version
+
+Every worker calls run_migrations() at startup. On a warm boot (schema already at the
+latest version) that is one D1 request. Otherwise one process migrates: workers in the
+same container serialize on a file lock, and containers serialize on a lease row in D1.
+Pending SQL migrations are sent as one batched request together with their
+schema_migrations rows.
+"""
+import argparse
+import fcntl
+import logging
+import os
+import socket
+import sys
+import time
+import uuid
+from typing import Callable, List, Optional, Tuple, Union
+
+from app.chatcontextmanager import CHAT_CONTEXTS_SESSION_INDEX_SQL, CHAT_CONTEXTS_TABLE_SQL, CHAT_CONTEXTS_USER_INDEX_SQL
+from app.config.settings import settings
+from app.services.cloudflare.d1_client import execute_d1_batch, execute_d1_query
+from app.services.cloudflare.feedback_service import USER_FEEDBACK_TABLE_SQL
+from app.services.cloudflare.horoscope_service import (
+    ARCHETYPE_HOROSCOPES_DATE_INDEX_SQL,
+    ARCHETYPE_HOROSCOPES_TABLE_SQL,
+    DAILY_HOROSCOPES_DATE_INDEX_SQL,
+    DAILY_HOROSCOPES_TABLE_SQL,
+)
+from app.services.cloudflare.payments_service import WA_PAYMENTS_CREATED_AT_INDEX_SQL, WA_PAYMENTS_TABLE_SQL
+from app.services.cloudflare.synastry_service import COMPATIBILITY_RESULTS_TABLE_SQL, COMPATIBILITY_SESSIONS_TABLE_SQL
+from app.services.cloudflare.users_service import MESSAGE_COUNTERS_TABLE_SQL, USER_PROFILES_TABLE_SQL, USERS_TABLE_SQL
+from app.services.lago.subscription import (
+    PAYMENT_ACTIVITY_LOG_TABLE_SQL,
+    WA_SUBSCRIPTIONS_TABLE_SQL,
+    WA_USAGE_PERIODS_TABLE_SQL,
+    ensure_lago_plans,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    );
+    """
+
+MIGRATION_LOCK_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migration_lock (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """
+
+# (version, name, statements | callable). Append only: never edit or renumber a migration
+# that has been deployed; add a new one instead (e.g. another ensure_lago_plans step when
+# PAYMENT_PLANS gains a plan).
+MIGRATIONS: List[Tuple[int, str, Union[List[str], Callable[[], None]]]] = [
+    (1, "baseline", [
+        USERS_TABLE_SQL,
+        COMPATIBILITY_SESSIONS_TABLE_SQL,
+        COMPATIBILITY_RESULTS_TABLE_SQL,
+        CHAT_CONTEXTS_TABLE_SQL,
+        CHAT_CONTEXTS_USER_INDEX_SQL,
+        CHAT_CONTEXTS_SESSION_INDEX_SQL,
+        USER_FEEDBACK_TABLE_SQL,
+        MESSAGE_COUNTERS_TABLE_SQL,
+        USER_PROFILES_TABLE_SQL,
+        WA_SUBSCRIPTIONS_TABLE_SQL,
+        WA_USAGE_PERIODS_TABLE_SQL,
+        WA_PAYMENTS_TABLE_SQL,
+        WA_PAYMENTS_CREATED_AT_INDEX_SQL,
+        PAYMENT_ACTIVITY_LOG_TABLE_SQL,
+    ]),
+    (2, "lago_plans", ensure_lago_plans),
+    (3, "daily_horoscopes", [DAILY_HOROSCOPES_TABLE_SQL, DAILY_HOROSCOPES_DATE_INDEX_SQL]),
+    (4, "archetype_horoscopes", [ARCHETYPE_HOROSCOPES_TABLE_SQL, ARCHETYPE_HOROSCOPES_DATE_INDEX_SQL]),
+]
+
+LATEST_VERSION = max(version for version, _, _ in MIGRATIONS)
+
+
+def current_version() -> int:
+    """Schema version recorded in D1 (0 for a fresh database). One round trip."""
+    results = execute_d1_batch([
+        SCHEMA_MIGRATIONS_TABLE_SQL,
+        "SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations",
+    ])
+    rows = results[-1] if results else []
+    return int(rows[0]["version"]) if rows else 0
+
+
+def _record_sql(version: int, name: str) -> str:
+    # version/name come from MIGRATIONS above, never from user input
+    return (
+        "INSERT OR IGNORE INTO schema_migrations(version, name, applied_at) "
+        f"VALUES ({int(version)}, '{name}', datetime('now'))"
+    )
+
+
+def _acquire_lease(owner: str) -> bool:
+    """Take the cross-container migration lease unless another live owner holds it."""
+    now = time.time()
+    execute_d1_query(MIGRATION_LOCK_TABLE_SQL)
+    execute_d1_query(
+        """
+        INSERT INTO schema_migration_lock(id, owner, expires_at) VALUES (1, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+        WHERE schema_migration_lock.expires_at < ?
+        """,
+        [owner, now + settings.D1_MIGRATION_LEASE_SECONDS, now],
+    )
+    rows = execute_d1_query("SELECT owner FROM schema_migration_lock WHERE id = 1")
+    return bool(rows) and rows[0]["owner"] == owner
+
+
+def _release_lease(owner: str):
+    try:
+        execute_d1_query("DELETE FROM schema_migration_lock WHERE id = 1 AND owner = ?", [owner])
+    except Exception as e:
+        # The lease expires on its own after D1_MIGRATION_LEASE_SECONDS
+        logger.warning(f"[MIGRATIONS] failed to release lease: {e}")
+
+
+def _apply_pending(version: int) -> int:
+    """Apply every migration after `version`; consecutive SQL migrations go in one request."""
+    pending = [m for m in MIGRATIONS if m[0] > version]
+    batch: List[str] = []
+    batched: List[str] = []
+
+    def flush():
+        if batch:
+            execute_d1_batch(batch)
+            logger.info(f"[MIGRATIONS] applied {', '.join(batched)} in one request ({len(batch)} statements)")
+            batch.clear()
+            batched.clear()
+
+    for number, name, step in pending:
+        if callable(step):
+            flush()
+            step()
+            execute_d1_query(_record_sql(number, name))
+            logger.info(f"[MIGRATIONS] applied {number:04d}_{name}")
+        else:
+            batch.extend(step)
+            batch.append(_record_sql(number, name))
+            batched.append(f"{number:04d}_{name}")
+        version = number
+    flush()
+    return version
+
+
+def _lock_path() -> str:
+    directory = os.path.dirname(settings.STATE_DB_PATH) or "."
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "d1_migrations.lock")
+
+
+def run_migrations(wait_timeout: Optional[float] = None) -> int:
+    """
+    Bring the D1 schema up to LATEST_VERSION and return the resulting version.
+
+    Only the process holding both the local file lock and the D1 lease migrates; the rest
+    wait for it and re-check the version. Raises if the schema is still behind after
+    wait_timeout seconds.
+    """
+    version = current_version()
+    if version >= LATEST_VERSION:
+        logger.info(f"[MIGRATIONS] D1 schema at version {version}, nothing to apply")
+        return version
+
+    wait_timeout = settings.D1_MIGRATION_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+    deadline = time.monotonic() + wait_timeout
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    with open(_lock_path(), "a+") as lock_file:
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for another worker to run D1 migrations")
+                time.sleep(0.25)
+        try:
+            # Another worker may have migrated while we waited for the lock
+            version = current_version()
+            while version < LATEST_VERSION:
+                if _acquire_lease(owner):
+                    try:
+                        logger.info(f"[MIGRATIONS] migrating D1 schema {version} -> {LATEST_VERSION}")
+                        version = _apply_pending(version)
+                    finally:
+                        _release_lease(owner)
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Timed out waiting for another instance to run D1 migrations")
+                time.sleep(1.0)
+                version = current_version()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    logger.info(f"[MIGRATIONS] D1 schema at version {version}")
+    return version
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply pending D1 schema migrations")
+    parser.add_argument("--status", action="store_true", help="Only print the current and latest versions")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    version = current_version()
+    print(f"D1 schema version {version}, latest {LATEST_VERSION}")
+    if args.status:
+        return 0 if version >= LATEST_VERSION else 1
+    version = run_migrations()
+    return 0 if version >= LATEST_VERSION else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
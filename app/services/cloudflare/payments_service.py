@@ -5,8 +5,7 @@ from app.services.cloudflare.d1_client import execute_d1_query
 
 logger = logging.getLogger(__name__)
 
-def ensure_payments_table():
-    execute_d1_query("""
+WA_PAYMENTS_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS wa_payments (
         reference_id TEXT PRIMARY KEY,
         user_id TEXT NOT NULL,
@@ -17,8 +16,12 @@ def ensure_payments_table():
         updated_at TEXT NOT NULL,
         raw_event TEXT
     );
-    """)
-    execute_d1_query("CREATE INDEX IF NOT EXISTS idx_wa_payments_created_at ON wa_payments(created_at)")
+    """
+WA_PAYMENTS_CREATED_AT_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_wa_payments_created_at ON wa_payments(created_at)"
+
+def ensure_payments_table():
+    execute_d1_query(WA_PAYMENTS_TABLE_SQL)
+    execute_d1_query(WA_PAYMENTS_CREATED_AT_INDEX_SQL)
 
 def upsert_payment(reference_id: str, user_id: str, amount_paise: int, currency: str, status: str, raw_event: str | None):
     execute_d1_query("""
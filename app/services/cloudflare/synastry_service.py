@@ -1,16 +1,14 @@
 
 from datetime import datetime, timedelta
 import json
-from app.config.constants import SIGNS
 from app.schemas import DateTimeEncoder
+from app.services.astrology.aspects import synastry_aspects
 from app.services.cloudflare.d1_client import execute_d1_query
 import logging
 logger = logging.getLogger(__name__)
 
 
-def create_compatibility_tables():
-    """Create compatibility-related tables in D1 if they don't exist."""
-    create_compatibility_table_sql = """
+COMPATIBILITY_SESSIONS_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS compatibility_sessions (
         session_id TEXT PRIMARY KEY,
         user_id TEXT,
@@ -20,8 +18,8 @@ def create_compatibility_tables():
         expires_at TEXT
     );
     """
-    
-    create_compatibility_results_sql = """
+
+COMPATIBILITY_RESULTS_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS compatibility_results (
         result_id TEXT PRIMARY KEY,
         user_id TEXT,
@@ -31,10 +29,13 @@ def create_compatibility_tables():
         created_at TEXT
     );
     """
-    
+
+
+def create_compatibility_tables():
+    """Create compatibility-related tables in D1 if they don't exist (startup uses d1_migrations)."""
     try:
-        execute_d1_query(create_compatibility_table_sql)
-        execute_d1_query(create_compatibility_results_sql)
+        execute_d1_query(COMPATIBILITY_SESSIONS_TABLE_SQL)
+        execute_d1_query(COMPATIBILITY_RESULTS_TABLE_SQL)
         logger.info("Compatibility tables created or already exist in Cloudflare D1.")
     except Exception as e:
         logger.error(f"Failed to create compatibility tables: {e}")
@@ -135,65 +136,10 @@ def calculate_synastry_aspects(user_chart: dict, partner_chart: dict) -> list:
     Calculate synastry aspects between two natal charts
     """
     try:
-        aspects = []
-        aspect_types = {
-            0: {"name": "conjunction", "orb": 8, "nature": "neutral", "strength": "strong"},
-            60: {"name": "sextile", "orb": 6, "nature": "harmonious", "strength": "moderate"},
-            90: {"name": "square", "orb": 8, "nature": "challenging", "strength": "strong"},
-            120: {"name": "trine", "orb": 8, "nature": "harmonious", "strength": "strong"},
-            180: {"name": "opposition", "orb": 8, "nature": "challenging", "strength": "strong"}
-        }
-        
-        # Planets to analyze
-        planets = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn"]
-        
-        for user_planet in planets:
-            if user_planet not in user_chart:
-                continue
-                
-            for partner_planet in planets:
-                if partner_planet not in partner_chart:
-                    continue
-                
-                user_data = user_chart[user_planet]
-                partner_data = partner_chart[partner_planet]
-                
-                if user_data.get('sign') == 'Unknown' or partner_data.get('sign') == 'Unknown':
-                    continue
-                
-                # Calculate absolute degrees
-                user_sign_idx = SIGNS.index(user_data['sign'])
-                partner_sign_idx = SIGNS.index(partner_data['sign'])
-                
-                user_abs_deg = user_sign_idx * 30 + user_data.get('degree', 0)
-                partner_abs_deg = partner_sign_idx * 30 + partner_data.get('degree', 0)
-                
-                # Calculate the angular difference
-                diff = abs(user_abs_deg - partner_abs_deg)
-                if diff > 180:
-                    diff = 360 - diff
-                
-                # Check for aspects
-                for angle, aspect_info in aspect_types.items():
-                    if abs(diff - angle) <= aspect_info["orb"]:
-                        aspects.append({
-                            "user_planet": user_planet,
-                            "partner_planet": partner_planet,
-                            "aspect": aspect_info["name"],
-                            "angle": angle,
-                            "orb": abs(diff - angle),
-                            "nature": aspect_info["nature"],
-                            "strength": aspect_info["strength"],
-                            "description": f"{user_planet} {aspect_info['name']} {partner_planet}"
-                        })
-                        break
-        
-        # Sort by strength and nature
-        aspects.sort(key=lambda x: (x["strength"] == "strong", x["orb"]))
-        
+        aspects = synastry_aspects(user_chart, partner_chart)
         logger.info(f"Calculated {len(aspects)} synastry aspects")
         return aspects
         
     except Exception as e:
         logger.error(f"Error calculating synastry aspects: {e}")
-        return []
\ No newline at end of file
+        return []
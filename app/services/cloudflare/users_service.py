@@ -2,14 +2,28 @@ from datetime import datetime
 import json
 import uuid
 from app.helpers import parse_date_flexible
-from app.services.astrology.chart_calculations import calculate_natal_chart_multi_method
+from app.services.astrology.chart_service import get_natal_chart
 from app.services.cloudflare.d1_client import execute_d1_query
 import logging
 
 logger = logging.getLogger(__name__)
 
-def create_profiles_table():
-    sql = """
+USERS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        name TEXT,
+        dob TEXT,
+        birth_time TEXT,
+        birth_city TEXT,
+        lat REAL,
+        lng REAL,
+        timezone TEXT,
+        natal_chart TEXT,
+        language TEXT DEFAULT 'en'
+    );
+    """
+
+USER_PROFILES_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS user_profiles (
         profile_id TEXT PRIMARY KEY,
         owner_user_id TEXT NOT NULL,
@@ -25,17 +39,20 @@ def create_profiles_table():
         created_at TEXT NOT NULL
     );
     """
-    execute_d1_query(sql)
 
-def create_message_counter_table():
-    sql = """
+MESSAGE_COUNTERS_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS user_message_counters (
         user_id TEXT PRIMARY KEY,
         count INTEGER DEFAULT 0,
         last_reset TEXT
     );
     """
-    execute_d1_query(sql)
+
+def create_profiles_table():
+    execute_d1_query(USER_PROFILES_TABLE_SQL)
+
+def create_message_counter_table():
+    execute_d1_query(MESSAGE_COUNTERS_TABLE_SQL)
     logger.info("Message counter table ready.")
 def get_user(user_id):
     """Retrieve a user’s data from D1 by WhatsApp number."""
@@ -69,7 +86,7 @@ def update_user_dob(user_id, new_dob):
         return False
     try:
         birth_date = parse_date_flexible(new_dob)
-        natal_chart = calculate_natal_chart_multi_method(
+        natal_chart = get_natal_chart(
             user["name"],
             birth_date.year,
             birth_date.month,
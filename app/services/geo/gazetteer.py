@@ -0,0 +1,451 @@
+"""
+Offline gazetteer: fuzzy city name -> ranked candidates with coordinates and timezone.
+
+The index is one binary file, memory-mapped read-only (so preloaded workers share its
+pages). It holds fixed-size city records, the normalized names (the city name, its ASCII
+form and GeoNames alternate names) sorted byte-wise, and a trigram -> name postings
+table. Lookups combine:
+
+  * exact and prefix matches: binary search over the sorted names (the flat equivalent
+    of a prefix trie, with no per-node objects to build or page in)
+  * typo tolerance: names sharing the most trigrams with the query, re-ranked by edit
+    distance
+
+Candidates are ranked by score, then population, and say whether they are exact (the
+name or an alias as typed, possibly as one part of the query) or a guess; conversation
+flows ask the user before using a guess (helpers.resolve_birth_city). The index is built from CITY_COORDINATES
+and, when GAZETTEER_GEONAMES_PATH points at a GeoNames dump (e.g. cities15000.txt), from
+every city in it. It is rebuilt automatically when those sources change.
+
+    python -m app.services.geo.gazetteer build [--geonames cities15000.txt]
+    python -m app.services.geo.gazetteer search "bangalor" "new dehli"
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config.constants import CITY_COORDINATES
+from app.config.settings import settings
+from app.services.observability.tracing import span
+from app.services.runtime.singletons import singletons
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GAZ1"
+FORMAT_VERSION = 1
+RECORD = struct.Struct("<ddIH2sII")  # lat, lng, population, tz index, country, name offset, name length
+KEY = struct.Struct("<III")  # key offset, key length, record id
+
+MAX_TRIGRAM_CANDIDATES = 32
+COMMON_TRIGRAM_POSTINGS = 4000  # postings this long are skipped when rarer trigrams exist
+PARTIAL_QUERY_WEIGHT = 0.95  # a match on one word / comma part of the query
+
+
+def normalize(name: str) -> str:
+    """Lowercase ASCII letters/digits and single spaces: 'São Paulo, BR' -> 'sao paulo br'."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+
+
+def trigrams(key: str) -> List[int]:
+    padded = f"  {key} ".encode("ascii")
+    return sorted({(padded[i] << 16) | (padded[i + 1] << 8) | padded[i + 2] for i in range(len(padded) - 2)})
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance counting an adjacent swap as one edit ("dehli" -> "delhi"), computed only
+    within `limit` of the diagonal; returns limit + 1 as soon as it must exceed limit.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [over] * (len(b) + 1)
+        current[0] = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if before is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            current[j] = cost
+        if min(current) > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[-1], over)
+
+
+# ---------------------------------------------------------------------------
+# Sources and build
+# ---------------------------------------------------------------------------
+
+def rows_from_constants() -> Iterator[Dict[str, Any]]:
+    for key, info in CITY_COORDINATES.items():
+        yield {"name": key.title(), "lat": info["lat"], "lng": info["lng"], "tz": info["tz"],
+               "country": "", "population": 0, "alt_names": []}
+
+
+def rows_from_geonames(path: str) -> Iterator[Dict[str, Any]]:
+    """GeoNames cities*.txt / allCountries.txt rows (tab-separated, no header)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 18 or not cols[17]:
+                continue
+            yield {
+                "name": cols[1],
+                "lat": float(cols[4]),
+                "lng": float(cols[5]),
+                "tz": cols[17],
+                "country": cols[8][:2],
+                "population": int(cols[14] or 0),
+                "alt_names": [cols[2]] + [n for n in cols[3].split(",") if n],
+            }
+
+
+def source_fingerprint(geonames_path: Optional[str]) -> str:
+    digest = hashlib.sha1(json.dumps(CITY_COORDINATES, sort_keys=True).encode())
+    if geonames_path and os.path.exists(geonames_path):
+        st = os.stat(geonames_path)
+        digest.update(f"{os.path.abspath(geonames_path)}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _align(buffer: bytearray, to: int = 8) -> int:
+    buffer.extend(b"\0" * (-len(buffer) % to))
+    return len(buffer)
+
+
+def build_gazetteer(path: str, rows: Iterable[Dict[str, Any]], fingerprint: str = "") -> Dict[str, int]:
+    """Write the index for `rows` to `path` (atomically); returns counts."""
+    records = bytearray()
+    strings = bytearray()
+    tz_index: Dict[str, int] = {}
+    keys: Dict[bytes, int] = {}  # normalized name -> record id (the most populous city wins)
+    populations: List[int] = []
+
+    for record_id, row in enumerate(rows):
+        name = row["name"].encode("utf-8")
+        tz = tz_index.setdefault(row["tz"], len(tz_index))
+        records += RECORD.pack(float(row["lat"]), float(row["lng"]), min(int(row["population"]), 2**32 - 1), tz,
+                               row.get("country", "").encode("ascii", "ignore")[:2].ljust(2), len(strings), len(name))
+        strings += name
+        populations.append(int(row["population"]))
+        for alias in [row["name"]] + list(row.get("alt_names", [])):
+            key = normalize(alias).encode("ascii")
+            if not key:
+                continue
+            owner = keys.get(key)
+            if owner is None or populations[owner] < populations[record_id]:
+                keys[key] = record_id
+
+    sorted_keys = sorted(keys)
+    key_table = bytearray()
+    postings_by_gram: Dict[int, List[int]] = {}
+    for key_id, key in enumerate(sorted_keys):
+        key_table += KEY.pack(len(strings), len(key), keys[key])
+        strings += key
+        for gram in trigrams(key.decode("ascii")):
+            postings_by_gram.setdefault(gram, []).append(key_id)
+
+    grams = array("I", sorted(postings_by_gram))
+    starts = array("I")
+    postings = array("I")
+    for gram in grams:
+        starts.append(len(postings))
+        postings.extend(postings_by_gram[gram])
+    starts.append(len(postings))
+
+    body = bytearray()
+    offsets = {}
+    for name, chunk in (("records", records), ("keys", key_table), ("grams", grams.tobytes()),
+                        ("starts", starts.tobytes()), ("postings", postings.tobytes()), ("strings", strings)):
+        offsets[name] = _align(body)
+        body += chunk
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "fingerprint": fingerprint,
+        "records": len(records) // RECORD.size,
+        "keys": len(sorted_keys),
+        "grams": len(grams),
+        "timezones": sorted(tz_index, key=tz_index.get),
+        "offsets": offsets,
+    }).encode()
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\0" * (-len(prefix) % 8)
+    # Offsets in the header are relative to the body, which starts at len(prefix)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        f.write(body)
+    os.replace(tmp, path)
+    counts = {"records": len(records) // RECORD.size, "keys": len(sorted_keys), "trigrams": len(grams),
+              "bytes": len(prefix) + len(body)}
+    logger.info(f"[GAZETTEER] built {path}: {counts}")
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+class Gazetteer:
+    """Read-only, memory-mapped view of a built index."""
+
+    def __init__(self, path: str, cache_size: int = 4096):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC:
+            raise ValueError(f"{path} is not a gazetteer index")
+        header_len = struct.unpack_from("<I", self._mm, 4)[0]
+        self.header = json.loads(self._mm[8:8 + header_len])
+        if self.header["version"] != FORMAT_VERSION or self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was built for another format/byte order; rebuild it")
+        base = 8 + header_len + (-(8 + header_len) % 8)
+        off = {name: base + value for name, value in self.header["offsets"].items()}
+        view = memoryview(self._mm)
+        n_grams = self.header["grams"]
+        self._records_off = off["records"]
+        self._keys_off = off["keys"]
+        self._strings_off = off["strings"]
+        self._grams = view[off["grams"]:off["grams"] + 4 * n_grams].cast("I")
+        self._starts = view[off["starts"]:off["starts"] + 4 * (n_grams + 1)].cast("I")
+        self._postings = view[off["postings"]:off["postings"] + 4 * self._starts[n_grams]].cast("I") if n_grams else view[0:0].cast("I")
+        self.timezones = self.header["timezones"]
+        self._sorted_keys = _KeyView(self)
+        self._cache: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "cache_hits": 0}
+
+    @property
+    def fingerprint(self) -> str:
+        return self.header.get("fingerprint", "")
+
+    def _key(self, key_id: int) -> Tuple[bytes, int]:
+        key_off, key_len, record_id = KEY.unpack_from(self._mm, self._keys_off + key_id * KEY.size)
+        start = self._strings_off + key_off
+        return self._mm[start:start + key_len], record_id
+
+    def record(self, record_id: int) -> Dict[str, Any]:
+        lat, lng, population, tz, country, name_off, name_len = RECORD.unpack_from(
+            self._mm, self._records_off + record_id * RECORD.size
+        )
+        start = self._strings_off + name_off
+        return {
+            "name": self._mm[start:start + name_len].decode("utf-8"),
+            "country": country.decode("ascii").strip(),
+            "lat": lat,
+            "lng": lng,
+            "tz": self.timezones[tz],
+            "population": population,
+        }
+
+    def _prefix_ids(self, q: bytes, limit: int) -> List[int]:
+        first = bisect_left(self._sorted_keys, q)
+        ids = []
+        for key_id in range(first, min(first + limit, self.header["keys"])):
+            if not self._key(key_id)[0].startswith(q):
+                break
+            ids.append(key_id)
+        return ids
+
+    def _trigram_ids(self, q: str) -> Tuple[List[Tuple[int, int]], int]:
+        """(key id, shared trigrams) for the names sharing the most trigrams with q, and how many were looked up."""
+        postings = []
+        for gram in trigrams(q):
+            i = bisect_left(self._grams, gram)
+            if i < len(self._grams) and self._grams[i] == gram:
+                postings.append(self._postings[self._starts[i]:self._starts[i + 1]])
+        if not postings:
+            return [], 0
+        postings.sort(key=len)
+        rare = [p for p in postings if len(p) <= COMMON_TRIGRAM_POSTINGS] or postings[:1]
+        counts = Counter()
+        for plist in rare:
+            counts.update(plist)  # counted in C straight off the mmapped postings
+        needed = max(1, len(rare) // 3)
+        return [(key_id, count) for key_id, count in counts.most_common(MAX_TRIGRAM_CANDIDATES) if count >= needed], len(rare)
+
+    def _score(self, q: str, limit: int) -> List[Dict[str, Any]]:
+        qb = q.encode("ascii")
+        best: Dict[int, Tuple[float, str]] = {}
+
+        def offer(record_id: int, score: float, key: str):
+            if score > best.get(record_id, (-1.0, ""))[0]:
+                best[record_id] = (score, key)
+
+        for key_id in self._prefix_ids(qb, 50):
+            key, record_id = self._key(key_id)
+            # Exact 1.0; a prefix scores by how much of the name was typed
+            offer(record_id, 1.0 if len(key) == len(qb) else 0.6 + 0.3 * len(qb) / len(key), key.decode("ascii"))
+        candidates, looked_up = self._trigram_ids(q)
+        for key_id, shared in candidates:
+            key, record_id = self._key(key_id)
+            key = key.decode("ascii")
+            longest = max(len(key), len(q))
+            limit_edits = max(1, longest // 3)
+            # Each edit destroys at most 3 of q's trigrams: too few shared means too far
+            if shared < looked_up - 3 * limit_edits:
+                continue
+            distance = edit_distance(q, key, limit_edits)
+            if distance <= limit_edits:
+                offer(record_id, round(1.0 - distance / longest, 4), key)
+
+        ranked = []
+        for record_id, (score, key) in best.items():
+            candidate = self.record(record_id)
+            # exact: the name (or an alias) as typed, not a typo correction or a completion
+            candidate.update(score=score, matched=key, exact=key == q)
+            ranked.append(candidate)
+        ranked.sort(key=lambda c: (-c["score"], -c["population"]))
+        return ranked[:limit]
+
+    @span("geo.gazetteer")
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Ranked candidates for a typed place name; [] when nothing is close."""
+        q = normalize(query)
+        if not q:
+            return []
+        cache_key = (q, limit)
+        with self._lock:
+            self._stats["queries"] += 1
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                self._stats["cache_hits"] += 1
+        if cached is not None:
+            return [dict(c) for c in cached]
+
+        results = self._score(q, limit)
+        if not results or results[0]["score"] < 1.0:
+            # "Pune, Maharashtra" / "new dehli": also try the part before the comma, else each
+            # word, scored a little below a whole-query match
+            parts = [normalize(str(query).split(",")[0])] if "," in str(query) else q.split(" ")
+            merged = {(c["name"], c["lat"], c["lng"]): c for c in results}
+            for part in parts:
+                if len(part) < 3 or part == q:
+                    continue
+                for c in self._score(part, limit):
+                    c["score"] = round(c["score"] * PARTIAL_QUERY_WEIGHT, 4)
+                    key = (c["name"], c["lat"], c["lng"])
+                    if key not in merged or merged[key]["score"] < c["score"]:
+                        merged[key] = c
+            results = sorted(merged.values(), key=lambda c: (-c["score"], -c["population"]))[:limit]
+
+        with self._lock:
+            self._cache[cache_key] = results
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return [dict(c) for c in results]
+
+    def search_many(self, queries: Iterable[str], limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """Bulk lookups (profile imports); repeated names are answered from the query cache."""
+        return [self.search(query, limit) for query in queries]
+
+    def best(self, query: str, min_score: float = 0.0) -> Optional[Dict[str, Any]]:
+        results = self.search(query, limit=1)
+        return results[0] if results and results[0]["score"] >= min_score else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "records": self.header["records"],
+                "names": self.header["keys"],
+                "trigrams": self.header["grams"],
+                "bytes": len(self._mm),
+                "cached_queries": len(self._cache),
+                **self._stats,
+            }
+
+
+class _KeyView:
+    """Sorted names as a sequence of bytes, for bisect over the mmapped key table."""
+
+    def __init__(self, gazetteer: Gazetteer):
+        self._g = gazetteer
+
+    def __len__(self):
+        return self._g.header["keys"]
+
+    def __getitem__(self, key_id: int) -> bytes:
+        return self._g._key(key_id)[0]
+
+
+def _open_or_build() -> Gazetteer:
+    path = settings.GAZETTEER_PATH
+    geonames = settings.GAZETTEER_GEONAMES_PATH
+    fingerprint = source_fingerprint(geonames)
+    if os.path.exists(path):
+        try:
+            gazetteer = Gazetteer(path)
+            if gazetteer.fingerprint == fingerprint:
+                return gazetteer
+            logger.info(f"[GAZETTEER] sources changed, rebuilding {path}")
+        except ValueError as e:
+            logger.warning(f"[GAZETTEER] {e}, rebuilding")
+    rows = list(rows_from_constants())
+    if geonames and os.path.exists(geonames):
+        rows += rows_from_geonames(geonames)
+    build_gazetteer(path, rows, fingerprint)
+    return Gazetteer(path)
+
+
+def get_gazetteer() -> Gazetteer:
+    """Process-wide reader; the mmap is read-only, so preloaded workers share it."""
+    return singletons.get("gazetteer", _open_or_build)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline gazetteer index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="(Re)build the index")
+    build.add_argument("--geonames", default=settings.GAZETTEER_GEONAMES_PATH, help="GeoNames cities dump")
+    build.add_argument("--output", default=settings.GAZETTEER_PATH)
+    search = sub.add_parser("search", help="Ranked candidates for each name (- reads names from stdin)")
+    search.add_argument("names", nargs="+")
+    search.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "build":
+        rows = list(rows_from_constants())
+        if args.geonames:
+            rows += rows_from_geonames(args.geonames)
+        print(json.dumps(build_gazetteer(args.output, rows, source_fingerprint(args.geonames))))
+        return 0
+
+    names = [line.strip() for line in sys.stdin if line.strip()] if args.names == ["-"] else args.names
+    for name, candidates in zip(names, get_gazetteer().search_many(names, args.limit)):
+        print(json.dumps({"query": name, "candidates": candidates}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.services.observability.metrics import registry
+from app.services.observability.tracing import span
+from app.services.runtime.singletons import singletons
+from app.services.runtime.warmup import timed_import
+
+logger = logging.getLogger(__name__)
+
+TIMEZONE_LOOKUPS = registry.counter("astro_timezone_lookups_total", "Timezone resolutions", ["outcome"])
+
+Cell = Tuple[int, int]
+
+
+class TimezoneResolver:
+    """
+    IANA timezone for a coordinate, through a grid-quantized LRU in front of timezonefinder.
+
+    Coordinates are snapped to a `grid`-degree cell (0.01° ≈ 1.1 km) and the polygon search
+    runs once per cell, at the cell centre, so every point in a cell resolves the same way
+    whichever one was asked first. Points within half a cell of a zone border may get the
+    neighbouring zone, which is well inside the accuracy of a shared WhatsApp location.
+
+    The finder is built with in_memory=True: its polygon data is read once (in the gunicorn
+    master when preloading, then shared copy-on-write) instead of being re-read from the
+    package files on every lookup.
+    """
+
+    def __init__(self, grid: float = 0.01, max_entries: int = 100_000, in_memory: bool = True,
+                 default: Optional[str] = None):
+        self.grid = grid
+        self.max_entries = max(1, max_entries)
+        self.in_memory = in_memory
+        self.default = default
+        self._lru: "OrderedDict[Cell, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalid": 0, "errors": 0}
+
+    def finder(self):
+        return singletons.get(
+            "timezonefinder",
+            lambda: timed_import("timezonefinder").TimezoneFinder(in_memory=self.in_memory),
+        )
+
+    def cell(self, lat: float, lng: float) -> Cell:
+        return round(lat / self.grid), round(lng / self.grid)
+
+    def _search(self, cell: Cell) -> Optional[str]:
+        lat = max(-90.0, min(90.0, round(cell[0] * self.grid, 6)))
+        lng = round((cell[1] * self.grid + 180.0) % 360.0 - 180.0, 6)
+        return self.finder().timezone_at(lat=lat, lng=lng)
+
+    def _remember(self, cell: Cell, tz: Optional[str]):
+        self._lru[cell] = tz
+        self._lru.move_to_end(cell)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    def _valid(lat, lng) -> bool:
+        try:
+            return -90.0 <= float(lat) <= 90.0 and -180.0 <= float(lng) <= 180.0
+        except (TypeError, ValueError):
+            return False
+
+    def resolve(self, lat: float, lng: float, default: Optional[str] = None) -> Optional[str]:
+        """Timezone name at (lat, lng), or `default` (then the resolver's default) when unknown."""
+        return self.resolve_many([(lat, lng)], default=default)[0]
+
+    @span("geo.timezone")
+    def resolve_many(self, points: Iterable[Tuple[float, float]], default: Optional[str] = None) -> List[Optional[str]]:
+        """
+        Timezones for many points (backfills, imports): each distinct cell is searched at
+        most once per call, and only if it isn't cached already.
+        """
+        fallback = default if default is not None else self.default
+        cells: List[Optional[Cell]] = []
+        for lat, lng in points:
+            cells.append(self.cell(float(lat), float(lng)) if self._valid(lat, lng) else None)
+
+        found: Dict[Cell, Optional[str]] = {}
+        hits = invalid = 0
+        with self._lock:
+            for cell in cells:
+                if cell is None:
+                    invalid += 1
+                elif cell in found:
+                    hits += 1
+                elif cell in self._lru:
+                    self._lru.move_to_end(cell)
+                    found[cell] = self._lru[cell]
+                    hits += 1
+        missing = [cell for cell in dict.fromkeys(cells) if cell is not None and cell not in found]
+        failed = set()
+        for cell in missing:
+            try:
+                found[cell] = self._search(cell)
+            except Exception as e:
+                logger.error(f"[TIMEZONE] lookup failed for cell {cell}: {e}")
+                found[cell] = None
+                failed.add(cell)
+        missing_set = set(missing)
+        # A cell repeated within the call is one search; the repeats count as hits
+        hits += sum(1 for cell in cells if cell in missing_set) - len(missing)
+        misses = len(missing) - len(failed)
+        with self._lock:
+            for cell in missing:
+                if cell not in failed:
+                    self._remember(cell, found[cell])
+            self._stats["hits"] += hits
+            self._stats["misses"] += misses
+            self._stats["invalid"] += invalid
+            self._stats["errors"] += len(failed)
+        for outcome, count in (("hit", hits), ("miss", misses), ("invalid", invalid), ("error", len(failed))):
+            if count:
+                TIMEZONE_LOOKUPS.inc(count, outcome=outcome)
+        return [(found.get(cell) if cell is not None else None) or fallback for cell in cells]
+
+    def warm(self):
+        """Warmup step: build the finder, which loads the polygon data."""
+        self.finder()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "grid_degrees": self.grid,
+                "in_memory": self.in_memory,
+                "cached_cells": len(self._lru),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                **self._stats,
+            }
+
+
+timezone_resolver = TimezoneResolver(
+    grid=settings.TIMEZONE_GRID_DEGREES,
+    max_entries=settings.TIMEZONE_CACHE_SIZE,
+    in_memory=settings.TIMEZONE_IN_MEMORY,
+    default=settings.DEFAULT_TIMEZONE,
+)
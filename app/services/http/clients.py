@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Dict
+
+import httpx
+
+from app.config.settings import settings
+from app.services.observability.tracing import record_error, span
+
+logger = logging.getLogger(__name__)
+
+# One pooled client per upstream host. Timeouts come from the host's HTTP_TIMEOUT_*
+# setting; call sites don't pass their own, so the setting is the one place to tune them.
+HOSTS = {
+    "d1": {"timeout": settings.HTTP_TIMEOUT_D1},             # api.cloudflare.com
+    "graph": {"timeout": settings.HTTP_TIMEOUT_GRAPH},       # graph.facebook.com
+    "graph_upload": {"timeout": settings.HTTP_TIMEOUT_GRAPH_UPLOAD},  # graph.facebook.com /media
+    "worker": {"timeout": settings.HTTP_TIMEOUT_WORKER},     # Cloudflare AI Worker
+    "lago": {"timeout": settings.HTTP_TIMEOUT_LAGO},         # Lago billing
+}
+
+_clients: Dict[str, httpx.Client] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if not settings.HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401  (httpx needs the h2 package for HTTP/2)
+        return True
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1")
+        return False
+
+
+class _TracedTransport(httpx.BaseTransport):
+    """Times every request to a host as an http.<name> span (time to response headers)."""
+
+    def __init__(self, name: str, inner: httpx.BaseTransport):
+        self.name = f"http.{name}"
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with span(self.name):
+            response = self.inner.handle_request(request)
+        if response.status_code >= 400:
+            record_error(self.name, f"status_{response.status_code}")
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class _AsyncTracedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, name: str, inner: httpx.AsyncBaseTransport):
+        self.name = f"http.{name}"
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with span(self.name):
+            response = await self.inner.handle_async_request(request)
+        if response.status_code >= 400:
+            record_error(self.name, f"status_{response.status_code}")
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def _transport_kwargs() -> dict:
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def _client_kwargs(name: str) -> dict:
+    if name not in HOSTS:
+        raise KeyError(f"Unknown HTTP host profile: {name}")
+    return {
+        "timeout": httpx.Timeout(HOSTS[name]["timeout"], connect=settings.HTTP_CONNECT_TIMEOUT),
+        "follow_redirects": True,
+    }
+
+
+def http_client(name: str) -> httpx.Client:
+    """Process-wide keep-alive client for a host profile (thread-safe, shared by all jobs)."""
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = httpx.Client(
+                    transport=_TracedTransport(name, httpx.HTTPTransport(**_transport_kwargs())),
+                    **_client_kwargs(name),
+                )
+                _clients[name] = client
+                logger.info(f"HTTP client pool created for '{name}'")
+    return client
+
+
+def async_http_client(name: str) -> httpx.AsyncClient:
+    """
+    Async counterpart of http_client, pooled per event loop since connections are loop-bound.
+    Meant for long-lived loops (the uvicorn loop); short asyncio.run() loops in queue workers
+    should keep using http_client().
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(name)
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=_AsyncTracedTransport(name, httpx.AsyncHTTPTransport(**_transport_kwargs())),
+                **_client_kwargs(name),
+            )
+            per_loop[name] = client
+    return client
+
+
+def close_http_clients():
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                logger.error(f"Failed to close HTTP client: {e}")
+        _clients.clear()
+        # Async clients are closed by their owning loop; just drop references here
+        _async_clients.clear()
+
+
+def _after_fork_in_child():
+    # Pooled connections belong to the parent; drop them (without closing the shared sockets)
+    global _lock
+    _lock = threading.Lock()
+    _clients.clear()
+    _async_clients.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -5,15 +5,12 @@ import time
 from typing import Tuple
 import uuid
 from fastapi import HTTPException
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-import requests
-
 from app.config.constants import PAYMENT_PLANS, PLAN_QUOTAS
 from app.config.settings import settings
 from app.services.cloudflare.d1_client import execute_d1_query
 from app.services.cloudflare.payments_service import update_payment_status
 from app.services.cloudflare.users_service import reset_user_message_count
+from app.services.http.clients import http_client
 from app.services.whatsapp.send_messageAndEvents import send_whatsapp, send_whatsapp_interactive
 
 
@@ -31,8 +28,7 @@ if not settings.LAGO_API_KEY:
     raise RuntimeError("Missing LAGO_API_KEY in environment")
 
 
-def create_billing_tables():
-    execute_d1_query("""
+WA_SUBSCRIPTIONS_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS wa_subscriptions (
       user_id TEXT PRIMARY KEY,
       plan_code TEXT NOT NULL,
@@ -42,8 +38,9 @@ def create_billing_tables():
       created_at TEXT NOT NULL,
       updated_at TEXT NOT NULL
     );
-    """)
-    execute_d1_query("""
+    """
+
+WA_USAGE_PERIODS_TABLE_SQL = """
     CREATE TABLE IF NOT EXISTS wa_usage_periods (
       user_id TEXT NOT NULL,
       period_start TEXT NOT NULL,
@@ -52,16 +49,37 @@ def create_billing_tables():
       plan_code TEXT NOT NULL,
       PRIMARY KEY(user_id, period_start, period_end)
     );
-    """)
+    """
+
+PAYMENT_ACTIVITY_LOG_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS payment_activity_log (
+        log_id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        action TEXT NOT NULL,
+        details TEXT,
+        created_at TEXT NOT NULL
+    );
+    """
+
+
+def create_billing_tables():
+    execute_d1_query(WA_SUBSCRIPTIONS_TABLE_SQL)
+    execute_d1_query(WA_USAGE_PERIODS_TABLE_SQL)
 
 def ensure_lago_plans():
+    """
+    Create any PAYMENT_PLANS plan missing in Lago. Runs as a D1 migration, so it raises on
+    any unexpected Lago response: the version is then not recorded and the next boot retries.
+    """
     for plan_id, plan in PAYMENT_PLANS.items():
         plan_code = plan["plan_code"]
         interval = plan.get("interval", "monthly")
         url = f"{settings.LAGO_API_URL}/api/v1/plans/{plan_code}"
-        r = requests.get(url, headers=lago_headers(), timeout=15)
-        
-        if r.status_code == 404:
+        r = http_client("lago").get(url, headers=lago_headers())
+
+        if r.status_code == 200:
+            logger.info(f"Lago plan {plan_code} already exists.")
+        elif r.status_code == 404:
             payload = {
                 "plan": {
                     "name": f"Astro Plan {plan_id}",
@@ -72,16 +90,14 @@ def ensure_lago_plans():
                     "pay_in_advance": True               
                 }
             }
-            r = requests.post(f"{settings.LAGO_API_URL}/api/v1/plans",
-                              headers=lago_headers(),
-                              json=payload,
-                              timeout=20)
-            if r.status_code not in (200, 201):
-                logger.error(f"Failed to auto-create Lago plan {plan_code}: {r.status_code} {r.text}")
-            else:
-                logger.info(f"Auto-created Lago plan: {plan_code}")
+            r = http_client("lago").post(f"{settings.LAGO_API_URL}/api/v1/plans",
+                                         headers=lago_headers(),
+                                         json=payload)
+            if not 200 <= r.status_code < 300:
+                raise RuntimeError(f"Failed to auto-create Lago plan {plan_code}: {r.status_code} {r.text[:500]}")
+            logger.info(f"Auto-created Lago plan: {plan_code}")
         else:
-            logger.info(f"Lago plan {plan_code} already exists.")
+            raise RuntimeError(f"Failed to look up Lago plan {plan_code}: {r.status_code} {r.text[:500]}")
 
 def lago_upsert_customer(phone_e164: str, email: str | None = None, currency="INR", timezone="Asia/Kolkata") -> dict:
     """Idempotent upsert: create or fetch Lago customer by external_id."""
@@ -92,7 +108,7 @@ def lago_upsert_customer(phone_e164: str, email: str | None = None, currency="IN
     try:
         url = f"{settings.LAGO_API_URL}/api/v1/customers/{phone_e164}"
         logger.info(f"Making GET request to: {url}")
-        r = requests.get(url, headers=lago_headers(), timeout=15)
+        r = http_client("lago").get(url, headers=lago_headers())
         logger.info(f"GET response: {r.status_code} {r.text}")
         
         if r.status_code == 200:
@@ -115,7 +131,7 @@ def lago_upsert_customer(phone_e164: str, email: str | None = None, currency="IN
     try:
         url = f"{settings.LAGO_API_URL}/api/v1/customers"
         logger.info(f"Making POST request to: {url} with payload: {payload}")
-        r = requests.post(url, headers=lago_headers(), json=payload, timeout=20)
+        r = http_client("lago").post(url, headers=lago_headers(), json=payload)
         logger.info(f"POST response: {r.status_code} {r.text}")
         
         if r.status_code not in (200, 201):
@@ -129,10 +145,9 @@ def lago_upsert_customer(phone_e164: str, email: str | None = None, currency="IN
 
 
 def lago_get_active_subscription(phone_e164: str) -> dict | None:
-    r = requests.get(
+    r = http_client("lago").get(
         f"{settings.LAGO_API_URL}/customers/{phone_e164}/subscriptions",
         headers=lago_headers(),
-        timeout=15,
         params={"status": "active"}
     )
     if r.status_code != 200:
@@ -160,7 +175,7 @@ def lago_create_subscription(phone_e164: str, plan_code: str, start_at_utc: date
             "billing_time": "anniversary"
         }
     }
-    r = requests.post(f"{settings.LAGO_API_URL}/api/v1/subscriptions", headers=lago_headers(), json=sub_payload, timeout=20)
+    r = http_client("lago").post(f"{settings.LAGO_API_URL}/api/v1/subscriptions", headers=lago_headers(), json=sub_payload)
     if r.status_code not in (200, 201):
         logger.error(f"Lago create subscription failed: {r.status_code} {r.text}")
         raise HTTPException(502, "Billing service unavailable (subscription)")
@@ -213,10 +228,9 @@ def upsert_active_subscription(phone_e164: str, plan_code: str, period_start: da
     )
 
 def lago_get_active_subscription(phone_e164: str) -> dict | None:
-    r = requests.get(
+    r = http_client("lago").get(
         f"{settings.LAGO_API_URL}/api/v1/customers/{phone_e164}/subscriptions",
         headers=lago_headers(),
-        timeout=15,
         params={"status": "active"}
     )
     if r.status_code != 200:
@@ -260,8 +274,9 @@ def terminate_subscription(phone_e164: str, reason: str = "limit_reached"):
                 "external_id": sub["sub_external_id"]
             }
         }
-        r = requests.delete(f"{settings.LAGO_API_URL}/api/v1/subscriptions/{sub['sub_external_id']}", 
-                            headers=lago_headers(), json=payload, timeout=20)
+        # httpx.Client.delete() takes no body, so send the DELETE via request()
+        r = http_client("lago").request("DELETE", f"{settings.LAGO_API_URL}/api/v1/subscriptions/{sub['sub_external_id']}",
+                                        headers=lago_headers(), json=payload)
         if r.status_code in (200, 204):
             logger.info(f"Lago subscription terminated: {sub['sub_external_id']}")
         else:
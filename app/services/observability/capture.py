@@ -0,0 +1,75 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_ROUTES = ("/whatsapp", "/webhook/payment")
+CAPTURE_HEADERS = ("content-type", "x-hub-signature-256", "user-agent")
+
+
+class WebhookCaptureMiddleware:
+    """
+    ASGI middleware that appends every incoming webhook body to a JSONL capture file.
+
+    Each line is {"ts", "path", "headers", "body"}: the arrival time, the route, the
+    headers needed to replay it (including the Meta signature) and the raw body.
+    Lines are written with a single O_APPEND write under flock, so several uvicorn
+    workers can share one capture file. Replay it with replay_webhooks.py.
+    """
+
+    def __init__(self, app, path: str, routes=CAPTURE_ROUTES):
+        self.app = app
+        self.path = path
+        self.routes = set(routes)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        logger.info(f"[CAPTURE] recording {sorted(self.routes)} to {path}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST" or scope.get("path") not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        chunks = []
+
+        async def capturing_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self._write(scope, arrived, b"".join(chunks))
+            return message
+
+        await self.app(scope, capturing_receive, send)
+
+    def _write(self, scope, arrived: float, body: bytes):
+        headers = {}
+        for key, value in scope.get("headers") or []:
+            name = key.decode("latin-1").lower()
+            if name in CAPTURE_HEADERS:
+                headers[name] = value.decode("latin-1")
+        record = {
+            "ts": round(arrived, 6),
+            "path": scope.get("path"),
+            "headers": headers,
+            "body": body.decode("utf-8", errors="replace"),
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            with self._lock:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    os.write(self._fd, line)
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except OSError as e:
+            # Capturing is best-effort; never fail the webhook because of it
+            logger.error(f"[CAPTURE] failed to record {scope.get('path')}: {e}")
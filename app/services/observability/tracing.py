@@ -0,0 +1,119 @@
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from app.services.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_LATENCY = registry.histogram(
+    "astro_dependency_latency_seconds", "Latency of calls to a dependency or pipeline stage", ["dependency"]
+)
+DEPENDENCY_ERRORS = registry.counter(
+    "astro_dependency_errors_total", "Failed calls to a dependency or pipeline stage", ["dependency", "error"]
+)
+DEPENDENCY_IN_FLIGHT = registry.gauge(
+    "astro_dependency_in_flight", "Calls currently running against a dependency or pipeline stage", ["dependency"]
+)
+REQUEST_LATENCY = registry.histogram(
+    "astro_request_latency_seconds", "End-to-end latency of a traced unit of work", ["operation", "outcome"]
+)
+
+# Spans finished inside the current trace(): [(name, seconds, ok), ...]
+_stages: "contextvars.ContextVar[Optional[List[Tuple[str, float, bool]]]]" = contextvars.ContextVar(
+    "trace_stages", default=None
+)
+
+
+class span:
+    """
+    Time a call to a dependency (D1, Worker, Graph API, ephemeris, vector search...).
+
+    Usable as a context manager or decorator (sync or async). Records the latency
+    histogram, error counter and in-flight gauge, and adds the stage to the
+    breakdown of the enclosing trace() if there is one.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        DEPENDENCY_IN_FLIGHT.inc(dependency=self.name)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        DEPENDENCY_IN_FLIGHT.dec(dependency=self.name)
+        DEPENDENCY_LATENCY.observe(elapsed, dependency=self.name)
+        if exc_type is not None:
+            DEPENDENCY_ERRORS.inc(dependency=self.name, error=exc_type.__name__)
+        stages = _stages.get()
+        if stages is not None:
+            stages.append((self.name, elapsed, exc_type is None))
+        return False
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(self.name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def record_error(name: str, error: str):
+    """Count a failure that was handled without raising (e.g. a non-2xx response)."""
+    DEPENDENCY_ERRORS.inc(dependency=name, error=error)
+
+
+def _summarize(stages: List[Tuple[str, float, bool]]) -> str:
+    totals = {}
+    for name, elapsed, ok in stages:
+        count, total, errors = totals.get(name, (0, 0.0, 0))
+        totals[name] = (count + 1, total + elapsed, errors + (0 if ok else 1))
+    parts = []
+    for name, (count, total, errors) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+        part = f"{name}={total * 1000:.0f}ms"
+        if count > 1:
+            part += f"x{count}"
+        if errors:
+            part += f"!{errors}"
+        parts.append(part)
+    return " ".join(parts)
+
+
+@contextmanager
+def trace(operation: str, **context):
+    """
+    Trace one unit of work (e.g. a webhook message). Spans opened inside are collected
+    and logged as a per-stage breakdown when the unit finishes.
+    """
+    if _stages.get() is not None:
+        yield  # nested: the outer trace owns the breakdown
+        return
+    stages: List[Tuple[str, float, bool]] = []
+    token = _stages.set(stages)
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _stages.reset(token)
+        REQUEST_LATENCY.observe(elapsed, operation=operation, outcome=outcome)
+        ctx = " ".join(f"{k}={v}" for k, v in context.items() if v is not None)
+        logger.info(f"[TRACE] {operation} {ctx} total={elapsed * 1000:.0f}ms {outcome} | {_summarize(stages) or 'no spans'}")
@@ -0,0 +1,186 @@
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class JobQueue:
+    """
+    Bounded background job queue served by a fixed pool of worker threads.
+
+    Handlers in this app still do blocking I/O (D1, Worker, Graph API), so jobs run
+    on dedicated threads instead of the uvicorn event loop. Coroutine functions are
+    executed with their own event loop inside the worker thread.
+
+    Jobs submitted with a key (submit_keyed) run strictly in submission order per key
+    and never concurrently with another job of the same key; different keys run in
+    parallel. A key only occupies a slot in the ready queue while it has pending work,
+    so one busy key can't starve the others.
+    """
+
+    def __init__(self, name: str, workers: int = 8, maxsize: int = 500, drain_timeout: float = 25.0):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.maxsize = max(1, int(maxsize))
+        self.drain_timeout = drain_timeout
+
+        # Ready queue holds (None, job) for unkeyed jobs and (key, None) lane tokens;
+        # capacity is enforced on self._pending since one token may stand for many jobs.
+        self._ready: "queue.Queue" = queue.Queue()
+        self._lanes: Dict[Hashable, deque] = {}
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._accepting = False
+
+        self._pending = 0
+        self._max_lanes = 0
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._in_flight = 0
+        self._max_depth = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._accepting = True
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"{self.name}-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        logger.info(f"[QUEUE:{self.name}] started with {self.workers} workers (maxsize={self.maxsize})")
+
+    def submit(self, fn: Callable, *args, **kwargs) -> bool:
+        """Enqueue an unordered job. Returns False when the queue is full or shutting down."""
+        return self.submit_keyed(None, fn, *args, **kwargs)
+
+    def submit_keyed(self, key: Optional[Hashable], fn: Callable, *args, **kwargs) -> bool:
+        """
+        Enqueue a job on the lane for `key`. Jobs sharing a key run one at a time in
+        submission order; key=None behaves like submit().
+        """
+        if not self._accepting:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"[QUEUE:{self.name}] rejected job, queue is not accepting work")
+            return False
+        job = (time.perf_counter(), fn, args, kwargs)
+        with self._lock:
+            if self._pending >= self.maxsize:
+                self._rejected += 1
+                logger.warning(f"[QUEUE:{self.name}] rejected job, queue full ({self.maxsize})")
+                return False
+            self._pending += 1
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._pending)
+            if key is None:
+                self._ready.put_nowait((None, job))
+            else:
+                lane = self._lanes.get(key)
+                if lane is None:
+                    # New lane: schedule it. An existing lane is either queued or running
+                    # and will reschedule itself after its current job.
+                    self._lanes[key] = deque([job])
+                    self._max_lanes = max(self._max_lanes, len(self._lanes))
+                    self._ready.put_nowait((key, None))
+                else:
+                    lane.append(job)
+        return True
+
+    def _run(self, fn: Callable, args, kwargs):
+        if inspect.iscoroutinefunction(fn):
+            return asyncio.run(fn(*args, **kwargs))
+        return fn(*args, **kwargs)
+
+    def _worker_loop(self):
+        while True:
+            key, job = self._ready.get()
+            if key is _STOP:
+                return
+            with self._lock:
+                if job is None:
+                    job = self._lanes[key].popleft()
+                self._pending -= 1
+                self._in_flight += 1
+            enqueued_at, fn, args, kwargs = job
+            started = time.perf_counter()
+            ok = True
+            try:
+                self._run(fn, args, kwargs)
+            except Exception as e:
+                ok = False
+                logger.error(f"[QUEUE:{self.name}] job {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self._in_flight -= 1
+                    self._total_wait += started - enqueued_at
+                    self._total_run += elapsed
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                    if key is not None:
+                        if self._lanes[key]:
+                            # Requeue at the back so other keys get a turn between jobs
+                            self._ready.put_nowait((key, None))
+                        else:
+                            del self._lanes[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "maxsize": self.maxsize,
+                "accepting": self._accepting,
+                "depth": self._pending,
+                "max_depth": self._max_depth,
+                "active_lanes": len(self._lanes),
+                "max_active_lanes": self._max_lanes,
+                "in_flight": self._in_flight,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_seconds": round(self._total_wait / finished, 4) if finished else 0.0,
+                "avg_run_seconds": round(self._total_run / finished, 4) if finished else 0.0,
+            }
+
+    def shutdown(self, drain: bool = True, timeout: float | None = None):
+        """Stop accepting work, optionally wait for queued jobs to finish, then stop workers."""
+        self._accepting = False
+        timeout = self.drain_timeout if timeout is None else timeout
+        if drain:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                with self._lock:
+                    idle = self._pending == 0 and self._in_flight == 0
+                if idle:
+                    break
+                time.sleep(0.05)
+            else:
+                logger.warning(
+                    f"[QUEUE:{self.name}] drain timed out after {timeout}s with "
+                    f"{self._pending} queued / {self._in_flight} running jobs"
+                )
+        for _ in self._threads:
+            self._ready.put_nowait((_STOP, None))
+        for t in self._threads:
+            t.join(timeout=1)
+        self._threads = []
+        logger.info(f"[QUEUE:{self.name}] stopped: {self.stats()}")
@@ -0,0 +1,76 @@
+"""
+Import-time budget report.
+
+    python -m app.services.runtime.import_budget                # profile `import main`
+    python -m app.services.runtime.import_budget --module app.services.astrology.chart_calculations
+    python -m app.services.runtime.import_budget --budget 1.5   # exit 1 if import takes longer
+
+Runs the import in a fresh interpreter with `-X importtime` and prints the most
+expensive modules (self and cumulative time) and the cost per top-level package,
+so heavy dependencies that sneak back into the boot path are easy to spot.
+"""
+import argparse
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_import(module: str) -> List[Tuple[str, int, int, int]]:
+    """Return [(module, self_us, cumulative_us, depth)] for `import <module>` in a fresh process."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    if proc.returncode != 0:
+        tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))[-2000:]
+        print(f"warning: `import {module}` exited with {proc.returncode}:\n{tail}", file=sys.stderr)
+    return rows
+
+
+def summarize(rows: List[Tuple[str, int, int, int]]) -> Dict[str, int]:
+    """Self time per top-level package (sums to the total import time)."""
+    per_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        per_package[name.split(".")[0]] += self_us
+    return dict(sorted(per_package.items(), key=lambda kv: -kv[1]))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-module import time report")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=20, help="Rows to show per table")
+    parser.add_argument("--budget", type=float, help="Fail (exit 1) if the total import time exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    rows = profile_import(args.module)
+    if not rows:
+        print("No import timings captured", file=sys.stderr)
+        return 1
+    total_us = sum(r[1] for r in rows)
+
+    print(f"\nimport {args.module}: {total_us / 1e6:.2f}s across {len(rows)} modules\n")
+    print(f"{'package':<40}{'self s':>10}{'share':>8}")
+    for name, us in list(summarize(rows).items())[:args.top]:
+        print(f"{name:<40}{us / 1e6:>10.3f}{100.0 * us / total_us:>7.1f}%")
+
+    print(f"\n{'module (cumulative)':<60}{'cum s':>10}{'self s':>10}")
+    for name, self_us, cum_us, _ in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{name:<60}{cum_us / 1e6:>10.3f}{self_us / 1e6:>10.3f}")
+
+    if args.budget is not None and total_us / 1e6 > args.budget:
+        print(f"\nOver budget: {total_us / 1e6:.2f}s > {args.budget:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
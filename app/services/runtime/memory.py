@@ -0,0 +1,118 @@
+"""
+Per-worker memory report.
+
+    python -m app.services.runtime.memory            # this process's master and its workers
+    python -m app.services.runtime.memory --pid 1    # a given master (e.g. inside the container)
+
+RSS counts every page a process has mapped, including pages shared copy-on-write with
+the gunicorn master; PSS splits shared pages between the processes sharing them. Summed
+over workers, RSS - PSS is the memory that preloading in the master saved.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+SMAPS_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+}
+
+
+def process_memory(pid: int) -> Optional[Dict[str, Any]]:
+    """Memory counters (kB) from /proc/<pid>/smaps_rollup, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    info: Dict[str, Any] = {"pid": pid}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            info[SMAPS_FIELDS[parts[0].rstrip(":")]] = int(parts[1])
+    info["shared_kb"] = info.get("shared_clean_kb", 0) + info.get("shared_dirty_kb", 0)
+    info["private_kb"] = info.get("private_clean_kb", 0) + info.get("private_dirty_kb", 0)
+    return info
+
+
+def child_pids(pid: int) -> List[int]:
+    children: List[int] = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                children.extend(int(c) for c in f.read().split())
+    except OSError:
+        pass
+    return sorted(set(children))
+
+
+def _is_gunicorn_master(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"gunicorn" in f.read()
+    except OSError:
+        return False
+
+
+def memory_report(master_pid: Optional[int] = None) -> Dict[str, Any]:
+    """
+    RSS/PSS for the master and each of its workers. Without master_pid, the parent of this
+    process is used when it is a gunicorn master, otherwise just this process is reported.
+    """
+    if master_pid is None:
+        parent = os.getppid()
+        master_pid = parent if _is_gunicorn_master(parent) else None
+    workers = child_pids(master_pid) if master_pid else [os.getpid()]
+
+    rows = [m for m in (process_memory(pid) for pid in workers) if m]
+    total_rss = sum(r.get("rss_kb", 0) for r in rows)
+    total_pss = sum(r.get("pss_kb", 0) for r in rows)
+    return {
+        "pid": os.getpid(),
+        "master": process_memory(master_pid) if master_pid else None,
+        "workers": rows,
+        "totals": {
+            "workers": len(rows),
+            "rss_kb": total_rss,
+            "pss_kb": total_pss,
+            # Pages counted once per worker in RSS but actually shared with the master / siblings
+            "shared_saving_kb": total_rss - total_pss,
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="RSS/PSS per gunicorn worker")
+    parser.add_argument("--pid", type=int, help="gunicorn master pid (default: this process's parent if it is one)")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+    args = parser.parse_args(argv)
+
+    report = memory_report(args.pid)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'shared MB':>11}{'private MB':>12}")
+    rows = ([report["master"]] if report["master"] else []) + report["workers"]
+    for r in rows:
+        label = " (master)" if report["master"] and r is report["master"] else ""
+        print(
+            f"{r['pid']:>8}{r.get('rss_kb', 0) / 1024:>10.1f}{r.get('pss_kb', 0) / 1024:>10.1f}"
+            f"{r['shared_kb'] / 1024:>11.1f}{r['private_kb'] / 1024:>12.1f}{label}"
+        )
+    totals = report["totals"]
+    print(
+        f"\n{totals['workers']} workers: RSS {totals['rss_kb'] / 1024:.1f} MB, PSS {totals['pss_kb'] / 1024:.1f} MB, "
+        f"shared copy-on-write {totals['shared_saving_kb'] / 1024:.1f} MB"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingletonRegistry:
+    """
+    One instance per name per process for expensive objects (embedding model, ephemeris,
+    timezone polygons).
+
+    Fork-safe entries (read-only data: model weights, numpy tables, mmapped kernels) that
+    are built in the gunicorn master before forking are inherited by every worker and
+    shared copy-on-write. Entries that own sockets or threads (fork_safe=False) are
+    dropped in the child after a fork and rebuilt on first use there.
+    """
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._fork_safe: Dict[str, bool] = {}
+        self._lock = threading.RLock()
+
+    def get(self, name: str, factory: Callable[[], Any], fork_safe: bool = True) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                instance = factory()
+                self._instances[name] = instance
+                self._fork_safe[name] = fork_safe
+                self._meta[name] = {
+                    "pid": os.getpid(),
+                    "seconds": round(time.perf_counter() - started, 3),
+                }
+                logger.info(f"[SINGLETON] {name} created in pid {os.getpid()} ({self._meta[name]['seconds']}s)")
+            return self._instances[name]
+
+    def _after_fork_in_child(self):
+        self._lock = threading.RLock()
+        for name in [n for n, safe in self._fork_safe.items() if not safe]:
+            self._instances.pop(name, None)
+            self._meta.pop(name, None)
+            self._fork_safe.pop(name, None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        pid = os.getpid()
+        return {
+            name: {**meta, "inherited": meta["pid"] != pid, "fork_safe": self._fork_safe.get(name, True)}
+            for name, meta in self._meta.items()
+        }
+
+
+singletons = SingletonRegistry()
+os.register_at_fork(after_in_child=singletons._after_fork_in_child)
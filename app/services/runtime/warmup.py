@@ -0,0 +1,100 @@
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# name -> seconds spent on deferred imports (first use or warmup), for the import budget report
+_import_costs: Dict[str, float] = {}
+_import_lock = threading.Lock()
+
+
+def timed_import(module_name: str):
+    """importlib.import_module that records how long the first import took."""
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - started
+    with _import_lock:
+        if module_name not in _import_costs:
+            _import_costs[module_name] = elapsed
+            if elapsed > 0.05:
+                logger.info(f"[STARTUP] deferred import {module_name} took {elapsed:.2f}s")
+    return module
+
+
+class Warmup:
+    """
+    Ordered set of warmup steps (loading models, ephemeris files, lookup tables) run once
+    per process, either inline at startup or on a background thread when FAST_STARTUP is
+    on. Readiness probes poll ready(); requests that arrive earlier just pay the lazy-load
+    cost themselves.
+
+    Under gunicorn with preload_app, the master runs the fork-safe steps before forking
+    (run(fork_safe_only=True)); workers inherit those results and only run the rest.
+    """
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], Any], bool]] = []
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started_at: float | None = None
+        self._finished_at: float | None = None
+        self._thread: threading.Thread | None = None
+
+    def register(self, name: str, fn: Callable[[], Any], fork_safe: bool = True):
+        """fork_safe=False for steps that open sockets or start threads (never run pre-fork)."""
+        self._steps.append((name, fn, fork_safe))
+
+    def run(self, fork_safe_only: bool = False):
+        """Run every step not run yet; failures are recorded but don't stop the remaining steps."""
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.perf_counter()
+            for name, fn, fork_safe in self._steps:
+                if name in self._results or (fork_safe_only and not fork_safe):
+                    continue
+                started = time.perf_counter()
+                try:
+                    fn()
+                    ok, error = True, None
+                except Exception as e:
+                    ok, error = False, str(e)
+                    logger.error(f"[STARTUP] warmup step {name} failed: {e}")
+                elapsed = time.perf_counter() - started
+                self._results[name] = {"ok": ok, "seconds": round(elapsed, 3), "error": error, "pid": os.getpid()}
+                logger.info(f"[STARTUP] warmup {name}: {elapsed:.2f}s{'' if ok else ' (failed)'}")
+            if len(self._results) == len(self._steps) and not self._done.is_set():
+                self._finished_at = time.perf_counter()
+                self._done.set()
+                logger.info(f"[STARTUP] warmup finished in {self._finished_at - self._started_at:.2f}s")
+
+    def start_background(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def report(self) -> Dict[str, Any]:
+        with _import_lock:
+            imports = dict(sorted(_import_costs.items(), key=lambda kv: -kv[1]))
+        total = None
+        if self._started_at is not None and self._finished_at is not None:
+            total = round(self._finished_at - self._started_at, 3)
+        return {
+            "ready": self.ready(),
+            "warmup_seconds": total,
+            "steps": dict(self._results),
+            "deferred_imports_seconds": {k: round(v, 3) for k, v in imports.items()},
+        }
+
+
+warmup = Warmup()
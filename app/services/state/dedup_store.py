@@ -0,0 +1,150 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 60  # seconds between sweeps of expired rows in the shared table
+
+
+class DedupStore:
+    """
+    Time-ordered "seen message" store with a TTL.
+
+    An in-process OrderedDict (insertion == time order) answers repeats cheaply and is
+    evicted from the oldest end in O(1). The authoritative record lives in a SQLite
+    table in WAL mode on local disk, so every uvicorn worker in the container agrees on
+    what has been seen: the first worker to insert a message id wins, the rest see a
+    duplicate. If the database can't be opened the store degrades to process-local.
+    """
+
+    def __init__(self, ttl: int, max_local: int = 1000, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_local = max(1, max_local)
+        self.db_path = db_path
+
+        self._local: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conns = threading.local()
+        self._last_purge = 0.0
+
+        self._checked = 0
+        self._duplicates = 0
+        self._local_hits = 0
+        self._shared_hits = 0
+        self._shared_errors = 0
+
+        # A SQLite connection must not be carried across fork (gunicorn preload_app)
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except Exception as e:
+                logger.error(f"[DEDUP] shared store at {self.db_path} unavailable, using process-local only: {e}")
+                self.db_path = None
+
+    def _after_fork_in_child(self):
+        self._lock = threading.Lock()
+        self._conns = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._conns, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conns.conn = conn
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_messages (message_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_messages_seen_at ON seen_messages(seen_at)")
+
+    def _remember_local(self, message_id: str, now: float):
+        self._local[message_id] = now
+        self._local.move_to_end(message_id)
+        cutoff = now - self.ttl
+        while self._local:
+            seen_at = next(iter(self._local.values()))
+            if seen_at >= cutoff and len(self._local) <= self.max_local:
+                break
+            self._local.popitem(last=False)
+
+    def _claim_shared(self, message_id: str, now: float) -> bool:
+        """Record the id in the shared table. Returns True if this process is the first to see it."""
+        conn = self._connect()
+        cur = conn.execute(
+            """
+            INSERT INTO seen_messages (message_id, seen_at) VALUES (?, ?)
+            ON CONFLICT(message_id) DO UPDATE SET seen_at = excluded.seen_at
+            WHERE seen_messages.seen_at < ?
+            """,
+            (message_id, now, now - self.ttl),
+        )
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute("DELETE FROM seen_messages WHERE seen_at < ?", (now - self.ttl,))
+        return cur.rowcount > 0
+
+    def is_duplicate(self, message_id: Optional[str]) -> bool:
+        """Mark message_id as seen and report whether it was already seen within the TTL."""
+        if not message_id:
+            return False
+        now = time.time()
+        with self._lock:
+            self._checked += 1
+            seen_at = self._local.get(message_id)
+            if seen_at is not None and now - seen_at < self.ttl:
+                self._duplicates += 1
+                self._local_hits += 1
+                return True
+            self._remember_local(message_id, now)
+
+        if not self.db_path:
+            return False
+        try:
+            first = self._claim_shared(message_id, now)
+        except sqlite3.Error as e:
+            # Fail open: a rare double-process beats dropping a user's message
+            with self._lock:
+                self._shared_errors += 1
+            logger.error(f"[DEDUP] shared lookup failed for {message_id}: {e}")
+            return False
+        if not first:
+            with self._lock:
+                self._duplicates += 1
+                self._shared_hits += 1
+        return not first
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "sqlite" if self.db_path else "memory",
+                "ttl_seconds": self.ttl,
+                "local_size": len(self._local),
+                "checked": self._checked,
+                "duplicates": self._duplicates,
+                "local_hits": self._local_hits,
+                "shared_hits": self._shared_hits,
+                "shared_errors": self._shared_errors,
+            }
+
+
+dedup_store = DedupStore(
+    ttl=settings.MESSAGE_TTL,
+    max_local=settings.MAX_PROCESSED_MESSAGES,
+    db_path=settings.STATE_DB_PATH if settings.DEDUP_BACKEND == "sqlite" else None,
+)
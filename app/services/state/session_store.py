@@ -0,0 +1,493 @@
+import contextvars
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL = 60  # seconds between sweeps of expired rows
+
+_MISSING = object()
+
+
+# --- Serialization ---
+# Session values are plain JSON; datetimes/dates/times, tuples and sets are tagged so flows
+# that stash them (e.g. partner_birth_date_obj) get the same types back. Anything else that
+# JSON can't represent exactly (non-str keys, arbitrary objects) raises TypeError.
+
+def _encode(o):
+    if isinstance(o, dict):
+        for k in o:
+            if not isinstance(k, str):
+                raise TypeError(f"session dict keys must be str, got {type(k).__name__} {k!r}")
+        return {k: _encode(v) for k, v in o.items()}
+    if isinstance(o, list):
+        return [_encode(v) for v in o]
+    if isinstance(o, tuple):
+        return {"__tuple__": [_encode(v) for v in o]}
+    if isinstance(o, (set, frozenset)):
+        return {"__set__": [_encode(v) for v in sorted(o, key=repr)]}
+    if isinstance(o, datetime):
+        return {"__datetime__": o.isoformat()}
+    if isinstance(o, date):
+        return {"__date__": o.isoformat()}
+    if isinstance(o, dtime):
+        return {"__time__": o.isoformat()}
+    if o is None or isinstance(o, (str, bool, int, float)):
+        return o
+    raise TypeError(f"session values must be JSON-serializable, got {type(o).__name__}")
+
+
+def _decode(d: dict):
+    if len(d) == 1:
+        if "__datetime__" in d:
+            return datetime.fromisoformat(d["__datetime__"])
+        if "__date__" in d:
+            return date.fromisoformat(d["__date__"])
+        if "__time__" in d:
+            return dtime.fromisoformat(d["__time__"])
+        if "__tuple__" in d:
+            return tuple(d["__tuple__"])
+        if "__set__" in d:
+            return set(d["__set__"])
+    return d
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(_encode(value), sort_keys=True)
+
+
+def loads(raw: str) -> Any:
+    return json.loads(raw, object_hook=_decode)
+
+
+def _merge(base: Any, ours: Any, theirs: Any) -> Any:
+    """
+    Three-way merge of a value edited in place (ours) against what another worker wrote
+    meanwhile (theirs), both starting from base. Dicts merge key by key, recursively; a key
+    both sides changed to different values keeps ours, as the later writer.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if not (isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict)):
+        return ours
+    merged = dict(theirs)
+    for key in set(base) | set(ours):
+        mine = ours.get(key, _MISSING)
+        original = base.get(key, _MISSING)
+        if mine is not _MISSING and original is not _MISSING and mine == original:
+            continue
+        if mine is _MISSING:
+            if original is not _MISSING:
+                merged.pop(key, None)
+        elif original is _MISSING or key not in theirs:
+            merged[key] = mine
+        else:
+            merged[key] = _merge(original, mine, theirs[key])
+    return merged
+
+
+# --- Read-only values ---
+# Outside a session_scope() nothing writes in-place edits back, so values read there are
+# handed out frozen: an edit raises instead of being silently lost. Copies are mutable.
+
+def _read_only(*args, **kwargs):
+    raise TypeError("session values read outside session_scope() are read-only; "
+                    "assign the key (ns[key] = value) or edit inside session_scope()")
+
+
+class ReadOnlyDict(dict):
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {k: copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class ReadOnlyList(list):
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(v, memo) for v in self]
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return ReadOnlyDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return ReadOnlyList(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+# --- Backends ---
+# Backends store serialized strings so every backend hands out independent copies.
+
+class MemorySessionBackend:
+    """Process-local LRU with per-key expiry. For single-worker/dev setups."""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _live(self, ns: str, key: str, now: float) -> Optional[str]:
+        item = self._data.get((ns, key))
+        if item is None:
+            return None
+        expires_at, raw = item
+        if expires_at < now:
+            del self._data[(ns, key)]
+            return None
+        self._data.move_to_end((ns, key))
+        return raw
+
+    def get(self, ns: str, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live(ns, key, time.time())
+
+    def set(self, ns: str, key: str, raw: str, ttl: int):
+        with self._lock:
+            self._data[(ns, key)] = (time.time() + ttl, raw)
+            self._data.move_to_end((ns, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, ns: str, key: str):
+        with self._lock:
+            self._data.pop((ns, key), None)
+
+    def keys(self, ns: str) -> List[str]:
+        now = time.time()
+        with self._lock:
+            return [k for (n, k), (exp, _) in list(self._data.items()) if n == ns and exp >= now]
+
+    def update(self, ns: str, key: str, fn: Callable[[Optional[str]], Optional[str]], ttl: int) -> Optional[str]:
+        with self._lock:
+            new_raw = fn(self._live(ns, key, time.time()))
+            if new_raw is None:
+                self.delete(ns, key)
+            else:
+                self.set(ns, key, new_raw, ttl)
+            return new_raw
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._data), "max_entries": self.max_entries}
+
+
+class SQLiteSessionBackend:
+    """
+    Session rows in a local SQLite file (WAL), shared by every worker process that
+    mounts the same path. Read-modify-write runs under BEGIN IMMEDIATE so it is atomic
+    across processes.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 50000):
+        self.db_path = db_path
+        self.max_entries = max(1, max_entries)
+        self._conns = threading.local()
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+        # A SQLite connection must not be carried across fork (gunicorn preload_app)
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_state (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (ns, key)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_state_expires ON session_state(expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_session_state_updated ON session_state(updated_at)")
+
+    def _after_fork_in_child(self):
+        self._conns = threading.local()
+        self._purge_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._conns, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conns.conn = conn
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float):
+        if now - self._last_purge < PURGE_INTERVAL or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_purge = now
+            conn.execute("DELETE FROM session_state WHERE expires_at < ?", (now,))
+            # Memory cap: drop least recently written rows beyond max_entries
+            conn.execute(
+                """
+                DELETE FROM session_state WHERE rowid IN (
+                    SELECT rowid FROM session_state ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"[SESSION] purge failed: {e}")
+        finally:
+            self._purge_lock.release()
+
+    def get(self, ns: str, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM session_state WHERE ns = ? AND key = ? AND expires_at >= ?",
+            (ns, key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, ns: str, key: str, raw: str, ttl: int):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT INTO session_state (ns, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value,
+                expires_at = excluded.expires_at, updated_at = excluded.updated_at
+            """,
+            (ns, key, raw, now + ttl, now),
+        )
+        self._maybe_purge(conn, now)
+
+    def delete(self, ns: str, key: str):
+        self._connect().execute("DELETE FROM session_state WHERE ns = ? AND key = ?", (ns, key))
+
+    def keys(self, ns: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT key FROM session_state WHERE ns = ? AND expires_at >= ?", (ns, time.time())
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def update(self, ns: str, key: str, fn: Callable[[Optional[str]], Optional[str]], ttl: int) -> Optional[str]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM session_state WHERE ns = ? AND key = ? AND expires_at >= ?", (ns, key, now)
+            ).fetchone()
+            new_raw = fn(row[0] if row else None)
+            if new_raw is None:
+                conn.execute("DELETE FROM session_state WHERE ns = ? AND key = ?", (ns, key))
+            else:
+                conn.execute(
+                    """
+                    INSERT INTO session_state (ns, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(ns, key) DO UPDATE SET value = excluded.value,
+                        expires_at = excluded.expires_at, updated_at = excluded.updated_at
+                    """,
+                    (ns, key, new_raw, now + ttl, now),
+                )
+            conn.execute("COMMIT")
+            return new_raw
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._connect().execute("SELECT COUNT(*) FROM session_state").fetchone()
+        return {"backend": "sqlite", "path": self.db_path, "entries": row[0], "max_entries": self.max_entries}
+
+
+# --- Namespaces ---
+
+# (ns, key) -> [value, serialized snapshot, namespace] for values handed out in the
+# current session_scope(); written back on exit if they were mutated in place.
+_checkouts: "contextvars.ContextVar[Optional[dict]]" = contextvars.ContextVar("session_checkouts", default=None)
+
+
+class SessionNamespace(MutableMapping):
+    """
+    Dict-like view over one namespace of the session store.
+
+    Flows mutate nested values in place (users[n]["stage"] = ...), so inside a
+    session_scope() every value read is checked out once and written back on scope
+    exit if it changed, merged field by field with anything another worker wrote to
+    it meanwhile. Assignments and deletes are written through immediately.
+    Outside a scope nothing would write edits back, so reads return read-only values
+    (ReadOnlyDict/ReadOnlyList) and editing one raises TypeError.
+    """
+
+    def __init__(self, store: "SessionStore", name: str, ttl: int):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+
+    def __getitem__(self, key: str) -> Any:
+        checkout = _checkouts.get()
+        slot = (self.name, key)
+        if checkout is not None and slot in checkout:
+            value = checkout[slot][0]
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        raw = self.store.backend.get(self.name, key)
+        if raw is None:
+            if checkout is not None:
+                checkout[slot] = [_MISSING, None, self]
+            raise KeyError(key)
+        value = loads(raw)
+        if checkout is None:
+            return _freeze(value)
+        checkout[slot] = [value, raw, self]
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        raw = dumps(value)
+        self.store.backend.set(self.name, key, raw, self.ttl)
+        checkout = _checkouts.get()
+        if checkout is not None:
+            checkout[(self.name, key)] = [value, raw, self]
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self.store.backend.delete(self.name, key)
+        checkout = _checkouts.get()
+        if checkout is not None:
+            checkout[(self.name, key)] = [_MISSING, None, self]
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.backend.keys(self.name))
+
+    def __len__(self) -> int:
+        return len(self.store.backend.keys(self.name))
+
+    def atomic_update(self, key: str, fn: Callable[[Any], Any]) -> Any:
+        """
+        Read-modify-write `key` atomically across threads and workers. `fn` receives the
+        current value (None if absent) and returns the new one (None deletes the key).
+        """
+        def apply(raw: Optional[str]) -> Optional[str]:
+            new_value = fn(loads(raw) if raw is not None else None)
+            return None if new_value is None else dumps(new_value)
+
+        new_raw = self.store.backend.update(self.name, key, apply, self.ttl)
+        new_value = loads(new_raw) if new_raw is not None else None
+        checkout = _checkouts.get()
+        if checkout is not None:
+            checkout[(self.name, key)] = [_MISSING if new_raw is None else new_value, new_raw, self]
+        return new_value
+
+
+class SessionStore:
+    def __init__(self, backend):
+        self.backend = backend
+        self._namespaces: Dict[str, SessionNamespace] = {}
+
+    def namespace(self, name: str, ttl: int) -> SessionNamespace:
+        ns = self._namespaces.get(name)
+        if ns is None:
+            ns = SessionNamespace(self, name, ttl)
+            self._namespaces[name] = ns
+        return ns
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            return self.backend.stats()
+        except Exception as e:
+            return {"error": str(e)}
+
+
+@contextmanager
+def session_scope():
+    """Track session values read during one unit of work and persist in-place edits on exit."""
+    if _checkouts.get() is not None:
+        yield  # already inside a scope; the outer one commits
+        return
+    checkout: dict = {}
+    token = _checkouts.set(checkout)
+    try:
+        yield
+    finally:
+        _checkouts.reset(token)
+        for (ns_name, key), (value, snapshot, namespace) in checkout.items():
+            if value is _MISSING:
+                continue
+            try:
+                raw = dumps(value)
+                if raw != snapshot:
+                    namespace.store.backend.update(ns_name, key, _write_back(ns_name, key, value, raw, snapshot),
+                                                   namespace.ttl)
+            except Exception as e:
+                logger.error(f"[SESSION] failed to persist {ns_name}/{key}: {e}")
+
+
+def _write_back(ns_name: str, key: str, value: Any, raw: str, snapshot: Optional[str]) -> Callable[[Optional[str]], Optional[str]]:
+    """
+    Compare-and-set for a checked-out value: if the stored value is still the one we read,
+    write ours; if another worker changed it in the meantime, merge our edits into theirs
+    so neither side's fields (e.g. stage) are lost. If another worker deleted it (a flow
+    completed or skipped), it stays deleted rather than being recreated from our copy.
+    """
+    def apply(current: Optional[str]) -> Optional[str]:
+        if current is None and snapshot is not None:
+            logger.info(f"[SESSION] {ns_name}/{key} deleted concurrently; dropping in-place edits")
+            return None
+        if current == snapshot or current is None:
+            return raw
+        logger.info(f"[SESSION] {ns_name}/{key} changed concurrently; merging edits")
+        return dumps(_merge(loads(snapshot), value, loads(current)))
+
+    return apply
+
+
+def _create_backend():
+    if settings.SESSION_BACKEND == "sqlite":
+        try:
+            return SQLiteSessionBackend(settings.STATE_DB_PATH, max_entries=settings.SESSION_MAX_ENTRIES)
+        except Exception as e:
+            logger.error(f"[SESSION] SQLite store at {settings.STATE_DB_PATH} unavailable, using memory: {e}")
+    return MemorySessionBackend(max_entries=settings.SESSION_MAX_ENTRIES)
+
+
+session_store = SessionStore(_create_backend())
@@ -0,0 +1,416 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+from app.config.settings import settings
+from app.services.http.clients import async_http_client
+from app.services.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_MESSAGES = registry.counter(
+    "astro_outbound_messages_total", "Outbound WhatsApp sends by final outcome", ["kind", "outcome"]
+)
+OUTBOUND_RETRIES = registry.counter(
+    "astro_outbound_retries_total", "Outbound WhatsApp send retries", ["kind", "reason"]
+)
+OUTBOUND_DELIVERY = registry.histogram(
+    "astro_outbound_delivery_seconds", "Time from enqueue to Graph API acceptance", ["kind"]
+)
+
+MAX_BACKOFF = 30.0
+MAX_RECIPIENT_BUCKETS = 10000
+FLUSH_TIMEOUT = 30.0  # longest a synchronous send waits for the recipient's queued messages
+
+
+class TokenBucket:
+    """Async token bucket; acquire() waits on the dispatcher loop instead of blocking a thread."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket kept as a row in the shared SQLite state DB, so every worker process in
+    the container draws from one budget (the Meta limit is per phone number, not per
+    worker). Each take is one short BEGIN IMMEDIATE transaction, run on a thread so a
+    locked database never stalls the dispatcher loop. If the database fails, falls back
+    to a process-local bucket at rate / workers.
+    """
+
+    def __init__(self, db_path: str, name: str, rate: float, burst: float, workers: int = 1):
+        self.db_path = db_path
+        self.name = name
+        self.rate = max(rate, 0.001)
+        self.capacity = max(burst, 1.0)
+        self.fallback = TokenBucket(rate / max(1, workers), burst / max(1, workers))
+        self._conns = threading.local()
+        self._failed = False
+        os.register_at_fork(after_in_child=self._after_fork_in_child)
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _after_fork_in_child(self):
+        self._conns = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._conns, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conns.conn = conn
+        return conn
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise the seconds until one will be."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE name = ?", (self.name,)).fetchone()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            if wait == 0.0:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (self.name, tokens, now),
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def acquire(self):
+        while not self._failed:
+            try:
+                wait = await asyncio.to_thread(self._take)
+            except sqlite3.Error as e:
+                logger.error(f"[OUTBOUND] shared rate bucket unavailable, pacing per worker: {e}")
+                self._failed = True
+                break
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+        await self.fallback.acquire()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _global_bucket(rate: float, workers: int, db_path: Optional[str]):
+    if db_path:
+        try:
+            return SharedTokenBucket(db_path, "whatsapp_global", rate, rate, workers=workers)
+        except Exception as e:
+            logger.error(f"[OUTBOUND] shared rate bucket at {db_path} unavailable, pacing per worker: {e}")
+    # Without a shared budget each worker takes its share of the per-number limit
+    return TokenBucket(rate / max(1, workers), rate / max(1, workers))
+
+
+class OutboundDispatcher:
+    """
+    Paced, ordered sender for WhatsApp Graph API messages.
+
+    Runs its own event loop on a background thread so webhook jobs (on queue worker
+    threads) and the uvicorn loop can hand off sends without blocking. Messages to the
+    same recipient go out one at a time in submission order through a per-recipient
+    token bucket; all sends share a global bucket sized to the Meta throughput tier,
+    held in the shared state DB so the limit covers every worker in the container.
+    Sends that must stay synchronous (they need the response) call flush() first so
+    they can't overtake messages already queued for the same user; async code runs those
+    sends with asyncio.to_thread (or awaits flush_async) so the wait never blocks a loop.
+    429/5xx responses and transport errors are retried with exponential backoff and
+    jitter (honouring Retry-After); other 4xx errors are logged and dropped.
+    """
+
+    def __init__(self, global_rate: float, per_recipient_rate: float, per_recipient_burst: int,
+                 max_attempts: int = 4, max_pending: int = 5000, backoff_base: float = 0.5,
+                 workers: int = 1, shared_db_path: Optional[str] = None):
+        self.global_rate = global_rate
+        self.workers = max(1, workers)
+        self.shared_db_path = shared_db_path
+        self.per_recipient_rate = per_recipient_rate
+        self.per_recipient_burst = per_recipient_burst
+        self.max_attempts = max(1, max_attempts)
+        self.max_pending = max(1, max_pending)
+        self.backoff_base = backoff_base
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self._pending = 0
+        self._recipient_pending: Dict[str, int] = {}
+
+        # Owned by the dispatcher loop
+        self._global_bucket = None
+        self._lanes: Dict[str, Deque[dict]] = {}
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+        self._stats = {"submitted": 0, "delivered": 0, "failed": 0, "retried": 0, "rejected": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self):
+        if self._thread:
+            return
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            self._global_bucket = _global_bucket(self.global_rate, self.workers, self.shared_db_path)
+            loop.call_soon(started.set)
+            loop.run_forever()
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="whatsapp-outbound", daemon=True)
+        self._thread.start()
+        started.wait(timeout=5)
+        logger.info(
+            f"[OUTBOUND] dispatcher started (global {self.global_rate}/s, "
+            f"per recipient {self.per_recipient_rate}/s burst {self.per_recipient_burst})"
+        )
+
+    def submit(self, recipient: Optional[str], kind: str, url: str, payload: dict, headers: dict) -> bool:
+        """
+        Queue a send. Returns False if the dispatcher isn't running or is full, in which
+        case the caller should send synchronously; a full dispatcher first waits for the
+        recipient's queued messages so the synchronous send stays in order.
+        recipient=None skips per-recipient ordering/pacing (read receipts, typing indicators).
+        """
+        if not self.running:
+            return False
+        key = recipient.replace("whatsapp:", "") if recipient else None
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                rejected = True
+            else:
+                rejected = False
+                self._pending += 1
+                self._stats["submitted"] += 1
+                if key is not None:
+                    self._recipient_pending[key] = self._recipient_pending.get(key, 0) + 1
+        if rejected:
+            self.flush(recipient)
+            return False
+        item = {
+            "recipient": key,
+            "kind": kind,
+            "url": url,
+            "payload": payload,
+            "headers": headers,
+            "enqueued": time.monotonic(),
+        }
+        self._loop.call_soon_threadsafe(self._enqueue, item)
+        return True
+
+    def flush(self, recipient: Optional[str], timeout: float = FLUSH_TIMEOUT) -> bool:
+        """
+        Block until every message queued for `recipient` has been sent (or given up on).
+        Call before a synchronous Graph API send to the same user; returns False on timeout.
+        On a thread running an event loop (the uvicorn loop, the dispatcher's own) it does
+        not wait and returns False at once: blocking there would stall every request on
+        that loop. Async callers use flush_async, or run the whole send in a thread.
+        """
+        if not recipient:
+            return True
+        key = recipient.replace("whatsapp:", "")
+        if _on_event_loop():
+            with self._lock:
+                queued = self._recipient_pending.get(key, 0)
+            if queued:
+                logger.warning(f"[OUTBOUND] flush({key}) called on an event loop; not waiting for {queued} queued messages")
+            return not queued
+        with self._drained:
+            drained = self._drained.wait_for(lambda: not self._recipient_pending.get(key), timeout=timeout)
+        if not drained:
+            logger.warning(f"[OUTBOUND] {key} still has queued messages after {timeout}s; sending anyway")
+        return drained
+
+    async def flush_async(self, recipient: Optional[str], timeout: float = FLUSH_TIMEOUT) -> bool:
+        """flush() for async code: waits on a worker thread, not on the caller's loop."""
+        return await asyncio.to_thread(self.flush, recipient, timeout)
+
+    # --- dispatcher loop side ---
+
+    def _enqueue(self, item: dict):
+        key = item["recipient"]
+        if key is None:
+            self._loop.create_task(self._deliver_and_release(item, None))
+            return
+        lane = self._lanes.get(key)
+        if lane is None:
+            self._lanes[key] = deque([item])
+            self._loop.create_task(self._drain_lane(key))
+        else:
+            lane.append(item)
+
+    def _recipient_bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.per_recipient_rate, self.per_recipient_burst)
+            self._buckets[key] = bucket
+            while len(self._buckets) > MAX_RECIPIENT_BUCKETS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    async def _drain_lane(self, key: str):
+        lane = self._lanes[key]
+        try:
+            while lane:
+                await self._deliver_and_release(lane.popleft(), self._recipient_bucket(key))
+        finally:
+            del self._lanes[key]
+
+    async def _deliver_and_release(self, item: dict, bucket: Optional[TokenBucket]):
+        try:
+            await self._deliver(item, bucket)
+        except Exception as e:
+            logger.error(f"[OUTBOUND] unexpected error sending {item['kind']}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                key = item["recipient"]
+                if key is not None:
+                    left = self._recipient_pending.get(key, 1) - 1
+                    if left > 0:
+                        self._recipient_pending[key] = left
+                    else:
+                        self._recipient_pending.pop(key, None)
+                        self._drained.notify_all()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(MAX_BACKOFF, float(retry_after))
+            except ValueError:
+                pass
+        delay = self.backoff_base * (2 ** attempt)
+        return min(MAX_BACKOFF, delay + random.uniform(0, delay))
+
+    async def _deliver(self, item: dict, bucket: Optional[TokenBucket]):
+        kind, recipient = item["kind"], item["recipient"]
+        client = async_http_client("graph")
+        for attempt in range(self.max_attempts):
+            if bucket is not None:
+                await bucket.acquire()
+            await self._global_bucket.acquire()
+            retry_after = None
+            try:
+                resp = await client.post(item["url"], json=item["payload"], headers=item["headers"])
+                if resp.status_code < 400:
+                    OUTBOUND_MESSAGES.inc(kind=kind, outcome="delivered")
+                    OUTBOUND_DELIVERY.observe(time.monotonic() - item["enqueued"], kind=kind)
+                    with self._lock:
+                        self._stats["delivered"] += 1
+                    logger.info(f"[OUTBOUND] {kind} sent to {recipient or '-'}")
+                    return
+                if resp.status_code != 429 and resp.status_code < 500:
+                    OUTBOUND_MESSAGES.inc(kind=kind, outcome="rejected")
+                    with self._lock:
+                        self._stats["failed"] += 1
+                    logger.error(f"[OUTBOUND] {kind} to {recipient or '-'} rejected: {resp.status_code} {resp.text[:500]}")
+                    return
+                reason = "throttled" if resp.status_code == 429 else "server_error"
+                retry_after = resp.headers.get("retry-after")
+                error = f"{resp.status_code} {resp.text[:200]}"
+            except httpx.TransportError as e:
+                reason, error = "transport", str(e) or type(e).__name__
+
+            if attempt + 1 >= self.max_attempts:
+                break
+            delay = self._backoff(attempt, retry_after)
+            OUTBOUND_RETRIES.inc(kind=kind, reason=reason)
+            with self._lock:
+                self._stats["retried"] += 1
+            logger.warning(f"[OUTBOUND] {kind} to {recipient or '-'} failed ({error}); retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        OUTBOUND_MESSAGES.inc(kind=kind, outcome="failed")
+        with self._lock:
+            self._stats["failed"] += 1
+        logger.error(f"[OUTBOUND] giving up on {kind} to {recipient or '-'} after {self.max_attempts} attempts: {error}")
+
+    # --- lifecycle / stats ---
+
+    def stop(self, timeout: float = 10.0):
+        """Wait (up to timeout) for queued sends to go out, then stop the loop."""
+        if not self._thread:
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._pending == 0:
+                    break
+            time.sleep(0.05)
+        else:
+            logger.warning(f"[OUTBOUND] stopping with {self._pending} sends still queued")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2)
+        self._thread = None
+        self._loop = None
+        logger.info(f"[OUTBOUND] stopped: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "pending": self._pending,
+                "active_recipients": len(self._lanes),
+                **self._stats,
+            }
+
+
+outbound_dispatcher = OutboundDispatcher(
+    global_rate=settings.OUTBOUND_GLOBAL_RATE,
+    per_recipient_rate=settings.OUTBOUND_PER_RECIPIENT_RATE,
+    per_recipient_burst=settings.OUTBOUND_PER_RECIPIENT_BURST,
+    max_attempts=settings.OUTBOUND_MAX_ATTEMPTS,
+    max_pending=settings.OUTBOUND_MAX_PENDING,
+    workers=settings.WORKERS,
+    shared_db_path=settings.STATE_DB_PATH if settings.OUTBOUND_RATE_BACKEND == "sqlite" else None,
+)
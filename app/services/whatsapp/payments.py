@@ -1,11 +1,16 @@
 # app/services/whatsapp/payments.py
 from datetime import datetime
-import hmac, hashlib, json, logging, requests, time
+import hmac, hashlib, json, logging, time
 import uuid
 from typing import Optional
+
+import httpx
+
 from app.config.settings import settings
 from app.services.cloudflare.d1_client import execute_d1_query
 from app.services.cloudflare.payments_service import update_payment_status, upsert_payment
+from app.services.http.clients import http_client
+from app.services.whatsapp.outbound import outbound_dispatcher
 logger = logging.getLogger(__name__)
 
 GRAPH_API = "https://graph.facebook.com/v20.0"
@@ -98,12 +103,14 @@ def send_upi_intent_payment_message(
     )
 
     url = f"{GRAPH_API}/{settings.WA_PHONE_NUMBER_ID}/messages"
-    r = requests.post(url, headers=_wa_headers(), json=payload, timeout=30)
+    # Sent synchronously (the caller needs the result); keep it behind replies already queued
+    outbound_dispatcher.flush(to_e164)
+    r = http_client("graph").post(url, headers=_wa_headers(), json=payload)
     try:
         r.raise_for_status()
         logger.info(f"UPI intent message sent to {to_e164}, ref={reference_id}")
         return r.json()
-    except requests.HTTPError:
+    except httpx.HTTPStatusError:
         logger.error(f"Failed sending payment message: {r.status_code} {r.text}")
         update_payment_status(reference_id, "failed", {"send_error": r.text[:1000]})
         raise
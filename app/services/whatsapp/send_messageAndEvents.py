@@ -1,9 +1,12 @@
 import logging
 from typing import List
-import requests
+
+import httpx
 
 from app.config.constants import LANG_BUTTONS, PAYMENT_PLANS
 from app.config.settings import settings
+from app.services.http.clients import http_client
+from app.services.whatsapp.outbound import outbound_dispatcher
 logger = logging.getLogger(__name__)
 def send_whatsapp_interactive(to: str, body: str, buttons: list, footer: str = None):
     url = f"https://graph.facebook.com/v22.0/{settings.WA_PHONE_NUMBER_ID}/messages"
@@ -44,11 +47,13 @@ def send_whatsapp_interactive(to: str, body: str, buttons: list, footer: str = N
         "interactive": interactive_obj
     }
 
+    if outbound_dispatcher.submit(to, "interactive", url, data, headers):
+        return
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Interactive message sent to {to}")
-    except requests.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(f"WhatsApp API interactive send error: {e} | response={getattr(e.response, 'text', '')}")
     except Exception as e:
         logger.error(f"WhatsApp API interactive send error: {e}")
@@ -89,11 +94,13 @@ def send_whatsapp_interactive_v2(to: str, body: str, buttons: list, footer: str
         "interactive": interactive_obj
     }
 
+    if outbound_dispatcher.submit(to, "interactive", url, data, headers):
+        return
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Interactive message sent to {to}")
-    except requests.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(f"WhatsApp API interactive send error: {e} | response={getattr(e.response, 'text', '')}")
     except Exception as e:
         logger.error(f"WhatsApp API interactive send error: {e}")
@@ -116,8 +123,10 @@ def send_whatsapp_reaction(to: str, message_id: str, emoji: str):
             "emoji": emoji
         }
     }
+    if outbound_dispatcher.submit(to, "reaction", url, data, headers):
+        return
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Reaction sent to {to} for message {message_id}: {emoji}")
     except Exception as e:
@@ -146,8 +155,10 @@ def send_whatsapp_location_request(to: str, body: str):
         }
     }
     
+    if outbound_dispatcher.submit(to, "location_request", url, data, headers):
+        return True
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Location request sent to {to}")
         return True
@@ -168,8 +179,10 @@ def send_whatsapp(to: str, body: str):
             "body": body
         },
     }
+    if outbound_dispatcher.submit(to, "text", url, data, headers):
+        return
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Message sent to {to}: {body}")
     except Exception as e:
@@ -191,8 +204,10 @@ def send_whatsapp_image(to: str, image_url: str, caption: str = ""):
             "caption": caption
         }
     }
+    if outbound_dispatcher.submit(to, "image", url, data, headers):
+        return
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=20)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Image message sent to {to} with URL: {image_url}")
     except Exception as e:
@@ -218,11 +233,13 @@ def mark_message_as_read(phone_number_id: str, message_id: str, access_token: st
         "status": "read",
         "message_id": message_id,
     }
+    if outbound_dispatcher.submit(None, "read_receipt", url, payload, headers):
+        return
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = http_client("graph").post(url, json=payload, headers=headers)
         response.raise_for_status()
         logger.info(f"Marked message {message_id} as read (blue tick).")
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Failed to mark message as read: {e}")
 
 def send_typing_indicator(phone_number_id: str, message_id: str, access_token: str):
@@ -239,8 +256,10 @@ def send_typing_indicator(phone_number_id: str, message_id: str, access_token: s
             "type": "text"
         }
     }
+    if outbound_dispatcher.submit(None, "typing", url, payload, headers):
+        return
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = http_client("graph").post(url, json=payload, headers=headers)
         response.raise_for_status()
         logger.info(f"Sent typing indicator for message {message_id}")
     except Exception as e:
@@ -289,8 +308,10 @@ def send_profile_list_whatsapp(to: str, profiles: List[dict], active_profile_id:
     url = f"https://graph.facebook.com/v22.0/{settings.WA_PHONE_NUMBER_ID}/messages"
     headers = {"Authorization": f"Bearer {settings.WA_ACCESS_TOKEN}"}
     
+    if outbound_dispatcher.submit(to, "profile_list", url, payload, headers):
+        return
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = http_client("graph").post(url, json=payload, headers=headers)
         response.raise_for_status()
         logger.info(f"Profile list sent to {to}")
     except Exception as e:
@@ -327,8 +348,10 @@ def send_feedback_request_prompt(user_id: str, custom_text: str = None):
             "action": {"buttons": button_objects}
         }
     }
+    if outbound_dispatcher.submit(user_id, "interactive", url, data, headers):
+        return
     try:
-        resp = requests.post(url, json=data, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=data, headers=headers)
         resp.raise_for_status()
         logger.info(f"Feedback interactive prompt sent to {user_id}")
     except Exception as e:
@@ -394,7 +417,9 @@ def send_payment_invoice(to: str, order_details: dict) -> bool:
             "Content-Type": "application/json",
         }
 
-        resp = requests.post(url, json=payload, headers=headers, timeout=15)
+        # Needs the result synchronously; let earlier queued replies to this user go first
+        outbound_dispatcher.flush(to_clean)
+        resp = http_client("graph").post(url, json=payload, headers=headers)
         resp.raise_for_status()
         logger.info(f"Payment prompt sent to {to_clean} for {plan_id} ({reference_id})")
         return True
@@ -436,7 +461,8 @@ def send_whatsapp_payment_request(to: str, amount: str, currency: str = "INR", r
         }
     }
 
-    resp = requests.post(url, json=payload, headers=headers, timeout=15)
+    outbound_dispatcher.flush(to)
+    resp = http_client("graph").post(url, json=payload, headers=headers)
     resp.raise_for_status()
     return resp.json()
 def send_language_selector(to: str, prompt_text: str = None):
@@ -472,11 +498,13 @@ def send_feedback_flow_template(to_number: str, template_name: str, language="en
             ]
         }
     }
+    if outbound_dispatcher.submit(to_number, "template", url, payload, headers):
+        return
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=15)
+        resp = http_client("graph").post(url, json=payload, headers=headers)
         resp.raise_for_status()
         logger.info(f"Feedback flow template sent to {to_number}")
-    except requests.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         # Log response body to see exact template error code/message
         logger.error(f"Failed to send feedback flow template to {to_number}: {e} | response={getattr(e.response, 'text', '')}")
     except Exception as e:
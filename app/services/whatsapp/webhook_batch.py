@@ -0,0 +1,131 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds for the "messages + statuses per delivery" histogram
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50)
+
+
+def _clean(wa_id: Optional[str]) -> Optional[str]:
+    return wa_id.replace("whatsapp:", "") if wa_id else None
+
+
+def _unit(payload: dict, entry: dict, change: dict, value: dict) -> dict:
+    """Rebuild a single-entry/single-change payload so the existing handler can read entry[0].changes[0]."""
+    return {
+        "object": payload.get("object"),
+        "entry": [{
+            "id": entry.get("id"),
+            "changes": [{"field": change.get("field"), "value": value}],
+        }],
+    }
+
+
+def split_webhook_payload(payload: dict) -> List[Tuple[Optional[str], List[dict]]]:
+    """
+    Split one Meta delivery into per-user groups of single-event payloads.
+
+    Every status and every message in every entry/change becomes its own payload
+    (statuses for one recipient stay together, messages carry their matching contact).
+    Payloads are grouped by user in delivery order so a user's statuses and messages
+    are handled together, in order, by one job. Returns [(user_key, [payload, ...])].
+    """
+    groups: "OrderedDict[Optional[str], List[dict]]" = OrderedDict()
+    extra = {k: v for k, v in payload.items() if k not in ("object", "entry")}
+
+    for entry in payload.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            base = {k: v for k, v in value.items() if k not in ("messages", "statuses", "contacts")}
+            statuses = value.get("statuses") or []
+            messages = value.get("messages") or []
+            contacts = {_clean(c.get("wa_id")): c for c in value.get("contacts") or [] if isinstance(c, dict)}
+
+            by_recipient: "OrderedDict[Optional[str], List[dict]]" = OrderedDict()
+            for status in statuses:
+                by_recipient.setdefault(_clean(status.get("recipient_id")), []).append(status)
+            for recipient, group in by_recipient.items():
+                groups.setdefault(recipient, []).append(_unit(payload, entry, change, {**base, "statuses": group}))
+
+            for msg in messages:
+                sender = _clean(msg.get("from"))
+                sub_value = {**base, "messages": [msg]}
+                if sender in contacts:
+                    sub_value["contacts"] = [contacts[sender]]
+                groups.setdefault(sender, []).append(_unit(payload, entry, change, sub_value))
+
+            if not statuses and not messages:
+                # Root-level payment or other change types: pass through untouched
+                payer = ((base.get("payment") or {}).get("payer") or {}).get("wa_id")
+                groups.setdefault(_clean(payer), []).append(_unit(payload, entry, change, value))
+
+    if extra and groups:
+        # Non-standard top-level fields (e.g. flow replies) ride along with the first payload only
+        first = next(iter(groups.values()))[0]
+        first.update(extra)
+    return list(groups.items())
+
+
+class BatchStats:
+    """Counters for how Meta batches deliveries (events per delivery, users per delivery)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.deliveries = 0
+        self.events = 0
+        self.messages = 0
+        self.statuses = 0
+        self.multi_event_deliveries = 0
+        self.max_events = 0
+        self.max_users = 0
+        self.buckets = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self.overflow = 0
+
+    def record(self, groups: List[Tuple[Optional[str], List[dict]]]):
+        messages = statuses = 0
+        for _, units in groups:
+            for unit in units:
+                value = unit["entry"][0]["changes"][0]["value"]
+                messages += len(value.get("messages") or [])
+                statuses += len(value.get("statuses") or [])
+        events = messages + statuses
+        with self._lock:
+            self.deliveries += 1
+            self.events += events
+            self.messages += messages
+            self.statuses += statuses
+            self.max_events = max(self.max_events, events)
+            self.max_users = max(self.max_users, len(groups))
+            if events > 1:
+                self.multi_event_deliveries += 1
+            for bound in BATCH_SIZE_BUCKETS:
+                if events <= bound:
+                    self.buckets[bound] += 1
+                    break
+            else:
+                self.overflow += 1
+        if events > 1:
+            logger.info(f"[BATCH] delivery with {messages} messages / {statuses} statuses for {len(groups)} users")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "deliveries": self.deliveries,
+                "events": self.events,
+                "messages": self.messages,
+                "statuses": self.statuses,
+                "multi_event_deliveries": self.multi_event_deliveries,
+                "avg_events_per_delivery": round(self.events / self.deliveries, 3) if self.deliveries else 0.0,
+                "max_events_per_delivery": self.max_events,
+                "max_users_per_delivery": self.max_users,
+                "events_per_delivery": {
+                    **{f"le_{b}": n for b, n in self.buckets.items()},
+                    f"gt_{BATCH_SIZE_BUCKETS[-1]}": self.overflow,
+                },
+            }
+
+
+batch_stats = BatchStats()
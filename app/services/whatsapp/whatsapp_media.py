@@ -1,4 +1,5 @@
-import requests
+from app.services.http.clients import http_client
+from app.services.whatsapp.outbound import outbound_dispatcher
 
 def upload_media_pdf_to_whatsapp(phone_number_id: str, access_token: str, pdf_bytes: bytes, filename: str = "vedic_chart.pdf") -> str:
     url = f"https://graph.facebook.com/v22.0/{phone_number_id}/media"
@@ -12,7 +13,7 @@ def upload_media_pdf_to_whatsapp(phone_number_id: str, access_token: str, pdf_by
     headers = {
         "Authorization": f"Bearer {access_token}"
     }
-    resp = requests.post(url, headers=headers, files=files, data=data, timeout=30)
+    resp = http_client("graph_upload").post(url, headers=headers, files=files, data=data)
     resp.raise_for_status()
     media_id = resp.json().get("id")
     if not media_id:
@@ -35,5 +36,7 @@ def send_whatsapp_document_by_media_id(to_e164: str, phone_number_id: str, acces
             "filename": filename
         }
     }
-    r = requests.post(url, json=payload, headers=headers, timeout=30)
+    # Keep the document behind text replies already queued for this user
+    outbound_dispatcher.flush(to_e164)
+    r = http_client("graph").post(url, json=payload, headers=headers)
     r.raise_for_status()
@@ -2,7 +2,6 @@
 
 from typing import List
 import logging
-from app.util.CTA_buttons_NLP.nlp_helpers import build_default_intent_classifier, extract_keywords_rake
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +11,8 @@ def get_intent_classifier():
     global _INTENT_CLF
     if _INTENT_CLF is None:
         try:
+            # sklearn/nltk are only needed once buttons are first computed (or at warmup)
+            from app.util.CTA_buttons_NLP.nlp_helpers import build_default_intent_classifier
             _INTENT_CLF = build_default_intent_classifier()
             logger.info("Intent classifier initialized successfully")
         except Exception as e:
@@ -19,6 +20,11 @@ def get_intent_classifier():
             _INTENT_CLF = None
     return _INTENT_CLF
 
+
+def extract_keywords_rake(texts: List[str], max_phrases: int = 6) -> List[str]:
+    from app.util.CTA_buttons_NLP.nlp_helpers import extract_keywords_rake as _extract_keywords_rake
+    return _extract_keywords_rake(texts, max_phrases=max_phrases)
+
 INTENT_TO_BUTTONS = {
     "health": ["Diet Tips", "Ask Question", "View Chart"],
     "love": ["Love Advice", "Compatibility", "Ask Question"],
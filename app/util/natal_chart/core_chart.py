@@ -1,9 +1,9 @@
 # core_chart.py
 
-import pytz
-import swisseph as swe
 from datetime import datetime
 
+import swisseph as swe
+
 SIGNS = ["Aries","Taurus","Gemini","Cancer","Leo","Virgo","Libra","Scorpio","Sagittarius","Capricorn","Aquarius","Pisces"]
 
 PLANET_IDS = {
@@ -22,61 +22,30 @@ def calc_natal_chart_swe(
     hour: int, minute: int,
     lat: float, lng: float, tz_str: str
 ) -> dict:
-    local_tz = pytz.timezone(tz_str)
-    dt_local = local_tz.localize(datetime(year, month, day, hour, minute))
-    dt_utc = dt_local.astimezone(pytz.UTC)
-
-    jd = swe.julday(
-        dt_utc.year,
-        dt_utc.month,
-        dt_utc.day,
-        dt_utc.hour + dt_utc.minute/60.0 + dt_utc.second/3600.0,
-        swe.GREG_CAL,
-    )
-
+    """
+    Render subset (classical planets, nodes, Ascendant) of the canonical cached natal chart.
+    The Kerykeion and simplified fallbacks have no Rahu/Ketu, so the nodes come from Swiss
+    Ephemeris whichever method produced the chart.
+    """
+    # Imported here: the chart service pulls in the astrology stack, this module is also used standalone
+    from app.services.astrology.chart_calculations import calculate_lunar_nodes
+    from app.services.astrology.chart_service import get_natal_chart
+
+    full = get_natal_chart(name, year, month, day, hour, minute, lat, lng, tz_str) or {}
+    if any(not isinstance(full.get(node), dict) or full[node].get("sign", "Unknown") == "Unknown"
+           for node in ("Rahu", "Ketu")):
+        full = {**full, **calculate_lunar_nodes(datetime(year, month, day, hour, minute), lat, lng, tz_str)}
     chart = {}
-
-    # Classical planets
-    for pname, pid in PLANET_IDS.items():
-        res, _flag = swe.calc_ut(jd, pid, swe.FLG_SWIEPH | swe.FLG_SPEED)
-        # res: [lon, lat, dist, speed_lon, ...]
-        lon = float(res[0]) % 360.0
-        spd = float(res[3])
-        sign_idx = int(lon // 30)
-        sign = SIGNS[sign_idx] if 0 <= sign_idx < 12 else "Unknown"
-        chart[pname] = {
-            "sign": sign,
-            "degree": round(lon % 30.0, 2),
-            "longitude": round(lon, 2),
-            "retrograde": spd < 0.0,
-        }
-
-    # Rahu/Ketu (mean node)
-    node_res, _nflag = swe.calc_ut(jd, swe.MEAN_NODE, swe.FLG_SWIEPH)
-    # node_res is a sequence; index its longitude with 
-    rahu_lon = float(node_res[0]) % 360.0
-    ketu_lon = (rahu_lon + 180.0) % 360.0
-    for node_name, lon_val in [("Rahu", rahu_lon), ("Ketu", ketu_lon)]:
-        sidx = int(lon_val // 30)
-        sign = SIGNS[sidx] if 0 <= sidx < 12 else "Unknown"
-        chart[node_name] = {
-            "sign": sign,
-            "degree": round(lon_val % 30.0, 2),
-            "longitude": round(lon_val, 2),
-            "retrograde": True,
+    for body in list(PLANET_IDS) + ["Rahu", "Ketu", "Ascendant"]:
+        data = full.get(body)
+        if not isinstance(data, dict):
+            continue
+        chart[body] = {
+            "sign": data.get("sign", "Unknown"),
+            "degree": data.get("degree", 0.0),
+            "longitude": data.get("longitude", 0.0),
+            "retrograde": bool(data.get("retrograde", body in ("Rahu", "Ketu"))),
         }
-
-    # Ascendant via swe.houses: ascmc is a sequence;  is Asc
-    house_cusps, ascmc = swe.houses(jd, lat, lng, b'P')
-    asc_lon = float(ascmc[0]) % 360.0
-    sidx = int(asc_lon // 30)
-    chart["Ascendant"] = {
-        "sign": SIGNS[sidx] if 0 <= sidx < 12 else "Unknown",
-        "degree": round(asc_lon % 30.0, 2),
-        "longitude": round(asc_lon, 2),
-        "retrograde": False,
-    }
-
     return chart
 
 
@@ -87,6 +56,9 @@ def validate_chart_for_render(chart: dict) -> tuple[bool, str]:
         return False, f"Missing placements: {missing}"
 
     unknowns = [p for p,v in chart.items() if isinstance(v, dict) and v.get("sign") == "Unknown"]
+    unplaced_nodes = [p for p in ("Rahu", "Ketu") if p in unknowns]
+    if unplaced_nodes:
+        return False, f"Lunar nodes not calculated: {unplaced_nodes}"
     if len(unknowns) > 4:
         return False, f"Too many Unknown signs: {unknowns}"
 
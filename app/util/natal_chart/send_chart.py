@@ -1,6 +1,4 @@
-from app.util.natal_chart.chart_svg import render_svg_north_chart
 from app.util.natal_chart.core_chart import calc_natal_chart_swe, validate_chart_for_render
-from app.util.natal_chart.svg_to_pdf import svg_bytes_to_pdf_bytes
 from app.services.whatsapp.whatsapp_media import send_whatsapp_document_by_media_id, upload_media_pdf_to_whatsapp
 
 
@@ -13,6 +11,10 @@ def send_user_chart_pdf(
     wa_access_token: str,
     caption: str | None = None
 ) -> None:
+    # jyotichart / cairosvg are only needed when a chart is actually rendered
+    from app.util.natal_chart.chart_svg import render_svg_north_chart
+    from app.util.natal_chart.svg_to_pdf import svg_bytes_to_pdf_bytes
+
     # compute chart, validate 
     chart = calc_natal_chart_swe(name, int(year), int(month), int(day), int(hour), int(minute), float(lat), float(lng), tz_str)
     ok, msg = validate_chart_for_render(chart)
@@ -0,0 +1,70 @@
+"""
+Onboarding date/time parsing: microseconds per call for the single-pass regex parsers in
+app/helpers.py against the strptime loops they replaced.
+
+    python benchmarks/date_time_parsing.py                 # 20000 inputs
+    python benchmarks/date_time_parsing.py --inputs 100000
+
+Inputs are what users type: numeric dates with every separator, padded or not, 2- or
+4-digit years, day- or month-first, some without a year or invalid; textual months; times
+in 24-hour and AM/PM forms. Timings are per call: the old parsers, the new ones with an
+empty memo ("cold") and with every input seen before ("warm"). The old parsers and the
+input generators live in tests/legacy_parsers.py; tests/test_date_time_parsing.py checks
+that the two agree apart from the deliberate fixes. Run from the repo root with the app's
+.env present.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import helpers  # noqa: E402
+from tests.legacy_parsers import legacy_parse_date_flexible, legacy_parse_time_flexible, random_date, random_time  # noqa: E402
+
+
+def outcome(fn, value):
+    try:
+        return fn(value)
+    except ValueError:
+        return None
+
+
+def per_call_us(fn, inputs) -> float:
+    started = time.perf_counter()
+    for value in inputs:
+        outcome(fn, value)
+    return (time.perf_counter() - started) / len(inputs) * 1e6
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Date/time parser benchmark")
+    parser.add_argument("--inputs", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    inputs = {
+        "dates": [random_date(rng) for _ in range(args.inputs)],
+        "times": [random_time(rng) for _ in range(args.inputs)],
+    }
+    pairs = [
+        ("dates", legacy_parse_date_flexible, helpers.parse_date_flexible),
+        ("times", legacy_parse_time_flexible, helpers.parse_time_flexible),
+    ]
+    caches = {"dates": helpers._parse_date_normalized, "times": helpers._parse_time_normalized}
+
+    print(f"{'parser':<8}{'inputs':>8}{'old us':>10}{'new cold us':>13}{'new warm us':>13}")
+    for label, old_fn, new_fn in pairs:
+        caches[label].cache_clear()
+        old_us = per_call_us(old_fn, inputs[label])
+        cold_us = per_call_us(new_fn, inputs[label])
+        warm_us = per_call_us(new_fn, inputs[label])
+        print(f"{label:<8}{len(inputs[label]):>8}{old_us:>10.2f}{cold_us:>13.2f}{warm_us:>13.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
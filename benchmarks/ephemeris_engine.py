@@ -0,0 +1,77 @@
+"""
+Throughput of the vectorized ephemeris engine vs. the per-date skyfield loop.
+
+    python benchmarks/ephemeris_engine.py                 # 1 year hourly (8760 instants)
+    python benchmarks/ephemeris_engine.py --days 30 --step-hours 0.25 --loop-sample 200
+
+The loop baseline is the old get_transits_swisseph pattern (one ts.utc + earth.at +
+observe per body per instant); it is timed on --loop-sample instants and extrapolated.
+Run from the repo root with the app's .env present; needs the de421.bsp kernel
+(downloaded by skyfield on first use).
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.astrology.ephemeris_engine import EphemerisEngine  # noqa: E402
+
+
+def loop_baseline(engine: EphemerisEngine, t, sample: int):
+    """Per-instant, per-body observe calls, as the scalar code path does them."""
+    earth = engine.planets["earth"]
+    started = time.perf_counter()
+    for i in range(sample):
+        observer = earth.at(t[i])
+        for target in engine._targets:
+            observer.observe(target).ecliptic_latlon()
+    return time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vectorized ephemeris engine benchmark")
+    parser.add_argument("--days", type=float, default=365, help="Span to evaluate (days)")
+    parser.add_argument("--step-hours", type=float, default=1.0, help="Resolution in hours")
+    parser.add_argument("--loop-sample", type=int, default=500, help="Instants timed for the scalar-loop baseline")
+    parser.add_argument("--repeat", type=int, default=3, help="Vectorized runs (best is reported)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    engine = EphemerisEngine()
+    print(f"Engine ready in {time.perf_counter() - started:.2f}s (skyfield timescale + de421)")
+
+    count = int(args.days * 24 / args.step_hours)
+    t = engine.times_utc(datetime(2025, 1, 1, tzinfo=timezone.utc), count, args.step_hours)
+    bodies = len(engine.names)
+
+    best = {}
+    for with_speed in (False, True):
+        runs = []
+        for _ in range(max(1, args.repeat)):
+            started = time.perf_counter()
+            lon, speed = engine.longitudes(t, with_speed=with_speed)
+            runs.append(time.perf_counter() - started)
+        best[with_speed] = min(runs)
+    assert lon.shape == (count, bodies) and speed.shape == (count, bodies)
+
+    sample = min(args.loop_sample, count)
+    loop_seconds = loop_baseline(engine, t, sample)
+    loop_total = loop_seconds / sample * count
+
+    print(f"\n{count} instants x {bodies} bodies = {count * bodies} positions")
+    print(f"{'method':<34}{'seconds':>10}{'positions/s':>14}{'speedup':>10}")
+    print(f"{'scalar loop (extrapolated)':<34}{loop_total:>10.2f}{count * bodies / loop_total:>14,.0f}{1.0:>10.1f}x")
+    for with_speed, label in ((False, "vectorized longitudes"), (True, "vectorized longitudes + speeds")):
+        seconds = best[with_speed]
+        print(f"{label:<34}{seconds:>10.3f}{count * bodies / seconds:>14,.0f}{loop_total / seconds:>10.1f}x")
+
+    retro = (speed < 0).mean(axis=0)
+    print("\nShare of instants retrograde: " + ", ".join(f"{n} {r:.0%}" for n, r in zip(engine.names, retro)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
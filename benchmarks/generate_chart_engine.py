@@ -0,0 +1,109 @@
+"""
+Per-request CPU time of the /generate natal chart engines.
+
+    python benchmarks/generate_chart_engine.py                  # 200 births per engine
+    python benchmarks/generate_chart_engine.py --births 50 --kerykeion-sample 20
+
+Engines timed:
+  kerykeion        a full AstrologicalSubject per request (the old /generate path)
+  swisseph         calculate_generate_natal, uncached (a first-time user)
+  swisseph cached  get_generate_natal against a warm in-memory chart cache (a known user)
+
+CPU time is time.process_time(), so it excludes I/O waits and other processes. Births
+are random dates 1950-2009 at a few fixed places; the same births are used for every
+engine, and sign/house agreement with Kerykeion is reported alongside. Run from the repo
+root with the app's .env present.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.astrology.chart_service import (  # noqa: E402
+    ChartCache,
+    calculate_generate_natal,
+    calculate_generate_natal_kerykeion,
+)
+import app.services.astrology.chart_service as chart_service  # noqa: E402
+
+PLACES = [
+    (19.0760, 72.8777, "Asia/Kolkata"),
+    (28.7041, 77.1025, "Asia/Kolkata"),
+    (51.5074, -0.1278, "Europe/London"),
+    (40.7128, -74.0060, "America/New_York"),
+    (-33.8688, 151.2093, "Australia/Sydney"),
+]
+
+
+def random_births(count: int, seed: int):
+    rng = random.Random(seed)
+    births = []
+    for i in range(count):
+        lat, lng, tz = rng.choice(PLACES)
+        births.append((f"user{i}", rng.randint(1950, 2009), rng.randint(1, 12), rng.randint(1, 28),
+                       rng.randint(0, 23), rng.randint(0, 59), lat, lng, tz))
+    return births
+
+
+def cpu_per_call(fn, births):
+    """Mean and p95 CPU milliseconds per call, plus the results."""
+    samples, results = [], []
+    for birth in births:
+        started = time.process_time()
+        results.append(fn(*birth))
+        samples.append((time.process_time() - started) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(0.95 * (len(samples) - 1))], results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="/generate chart engine CPU benchmark")
+    parser.add_argument("--births", type=int, default=200, help="Births timed per swisseph engine")
+    parser.add_argument("--kerykeion-sample", type=int, default=100, help="Births timed for Kerykeion (slower)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    births = random_births(args.births, args.seed)
+    ker_births = births[:max(1, min(args.kerykeion_sample, len(births)))]
+
+    # Warm imports and ephemeris files so first-call costs don't skew the means
+    calculate_generate_natal_kerykeion(*ker_births[0])
+    calculate_generate_natal(*births[0][1:])
+
+    ker_mean, ker_p95, ker_charts = cpu_per_call(calculate_generate_natal_kerykeion, ker_births)
+    swe_mean, swe_p95, swe_charts = cpu_per_call(lambda name, *rest: calculate_generate_natal(*rest), births)
+
+    # Known users: memory-only cache, filled once, then timed on hits
+    chart_service.chart_cache = ChartCache(max_entries=len(births) + 1, db_path=None)
+    for birth in births:
+        chart_service.get_generate_natal(*birth, engine="swisseph")
+    hit_mean, hit_p95, _ = cpu_per_call(lambda *b: chart_service.get_generate_natal(*b, engine="swisseph"), births)
+
+    print(f"{'engine':<20}{'births':>8}{'mean ms':>10}{'p95 ms':>10}{'speedup':>10}")
+    for label, count, mean, p95 in (
+        ("kerykeion", len(ker_births), ker_mean, ker_p95),
+        ("swisseph", len(births), swe_mean, swe_p95),
+        ("swisseph cached", len(births), hit_mean, hit_p95),
+    ):
+        speedup = ker_mean / mean if mean else float("inf")
+        print(f"{label:<20}{count:>8}{mean:>10.3f}{p95:>10.3f}{speedup:>9.1f}x")
+
+    compared = sign_match = house_match = retro_match = 0
+    for ker, swe_chart in zip(ker_charts, swe_charts):
+        for planet, k in ker.items():
+            s = swe_chart[planet]
+            compared += 1
+            sign_match += k["sign"] == s["sign"]
+            house_match += k["house"] == s["house"]
+            retro_match += k["retrograde"] == s["retrograde"]
+    print(f"\nAgreement with Kerykeion over {compared} placements: sign {sign_match / compared:.1%}, "
+          f"house {house_match / compared:.1%}, retrograde {retro_match / compared:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
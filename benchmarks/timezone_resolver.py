@@ -0,0 +1,93 @@
+"""
+Timezone lookups per second: raw timezonefinder (file-backed and in-memory) vs. the
+grid-cached TimezoneResolver.
+
+    python benchmarks/timezone_resolver.py                  # 20000 lookups
+    python benchmarks/timezone_resolver.py --lookups 100000 --places 500
+
+Lookups model location shares: points jittered by up to ~5 km around --places random
+populated spots, so repeat users and neighbours land in cells already cached. "cold" is
+the resolver's first pass over the points (every new cell is a polygon search), "warm" a
+second pass. Agreement is measured against the exact (unquantized) lookup. Run from the
+repo root with the app's .env present.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.geo.timezone_resolver import TimezoneResolver  # noqa: E402
+
+# (lat, lng) boxes around where our users are: India, Gulf, Europe, North America
+REGIONS = [(8, 32, 68, 92), (22, 30, 50, 57), (40, 58, -8, 25), (28, 48, -120, -75)]
+
+
+def sample_points(lookups: int, places: int, seed: int):
+    rng = random.Random(seed)
+    centres = []
+    for _ in range(places):
+        lat0, lat1, lng0, lng1 = rng.choice(REGIONS)
+        centres.append((rng.uniform(lat0, lat1), rng.uniform(lng0, lng1)))
+    return [
+        (lat + rng.uniform(-0.045, 0.045), lng + rng.uniform(-0.045, 0.045))
+        for lat, lng in (rng.choice(centres) for _ in range(lookups))
+    ]
+
+
+def timed(fn, points):
+    started = time.perf_counter()
+    results = fn(points)
+    return time.perf_counter() - started, results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Timezone resolver benchmark")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--places", type=int, default=300, help="Distinct places the lookups cluster around")
+    parser.add_argument("--raw-sample", type=int, default=2000, help="Lookups timed for the uncached finders")
+    parser.add_argument("--grid", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args(argv)
+
+    from timezonefinder import TimezoneFinder
+
+    points = sample_points(args.lookups, args.places, args.seed)
+    raw_points = points[:args.raw_sample]
+
+    rows = []
+    exact = None
+    for label, in_memory in (("timezonefinder (file-backed)", False), ("timezonefinder (in_memory)", True)):
+        started = time.perf_counter()
+        finder = TimezoneFinder(in_memory=in_memory)
+        load = time.perf_counter() - started
+        seconds, results = timed(lambda pts: [finder.timezone_at(lat=lat, lng=lng) for lat, lng in pts], raw_points)
+        rows.append((label, len(raw_points), seconds, load))
+        exact = results
+
+    resolver = TimezoneResolver(grid=args.grid, max_entries=max(args.lookups, 1), in_memory=True)
+    resolver.finder = lambda finder=TimezoneFinder(in_memory=True): finder
+    cold_seconds, cold = timed(resolver.resolve_many, points)
+    warm_seconds, _ = timed(resolver.resolve_many, points)
+    single_seconds, _ = timed(lambda pts: [resolver.resolve(lat, lng) for lat, lng in pts], points)
+    rows += [
+        (f"resolver cold ({args.grid}° grid)", len(points), cold_seconds, None),
+        ("resolver warm, batch", len(points), warm_seconds, None),
+        ("resolver warm, one at a time", len(points), single_seconds, None),
+    ]
+
+    print(f"{'method':<34}{'lookups':>9}{'lookups/s':>14}{'load s':>9}")
+    for label, count, seconds, load in rows:
+        print(f"{label:<34}{count:>9}{count / seconds:>14,.0f}{'' if load is None else f'{load:.2f}':>9}")
+
+    agree = sum(a == b for a, b in zip(exact, cold[:len(exact)]))
+    stats = resolver.stats()
+    print(f"\n{stats['cached_cells']} cells cached for {len(points)} points; "
+          f"agreement with exact lookups {agree / len(exact):.2%} over {len(exact)} points")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+gunicorn config: uvicorn workers forked from a master that has already loaded the app.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+With preload_app the master imports main and runs the fork-safe warmup steps (embedding
+model, skyfield and the memory-mapped de421 kernel, timezone polygons, kerykeion, intent classifier) before forking,
+so the weights and tables are shared copy-on-write by every worker instead of being
+loaded once per worker. gc.freeze() keeps the collector from touching (and so copying)
+those pages in the workers. Compare RSS and PSS per worker on GET /metrics/memory.
+"""
+import gc
+import os
+
+from app.config.settings import settings
+
+# HF tokenizers disable themselves (with a warning) if used before a fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = settings.WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = settings.PRELOAD_APP
+# Room for the webhook queue and outbound dispatcher to drain on shutdown
+graceful_timeout = int(settings.WEBHOOK_QUEUE_DRAIN_TIMEOUT + settings.OUTBOUND_DRAIN_TIMEOUT + 5)
+timeout = 120
+keepalive = 5
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from app.services.runtime.warmup import warmup
+
+    # Sockets and threads (vector store client, queues, dispatcher) are created per worker
+    warmup.run(fork_safe_only=True)
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded shared state in master: {sorted(warmup.report()['steps'])}")
@@ -1,51 +1,68 @@
+import asyncio
+import hmac
 import os
 import json
 import threading
 import time
 import logging
-import random
 from typing import Any, Counter, Dict, List, Tuple
 import uuid
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import httpx
 import pytz
-import requests
 import warnings
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from datetime import datetime
 
 from typing import Optional
-import swisseph as swe
 
-from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi import Depends, FastAPI, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from kerykeion import AstrologicalSubject
-from sentence_transformers import SentenceTransformer
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-import chromadb
-
 from app.config.settings import settings
-from app.helpers import coerce_time_to_hm, get_city_info, parse_date_flexible, parse_date_flexible_safe, parse_time_flexible, parse_time_flexible_safe
-from app.schemas import ChatRequest, ChatResponse, CompatibilityRequest, CompatibilityResponse, HoroscopeRequest, HoroscopeResponse, PaymentWebhookRequest, Profile, ProfileListRequest, ProfileListResponse, SimulatePaymentRequest, StartCheckoutRequest, StartCheckoutResponse
+from app.helpers import coerce_time_to_hm, parse_date_flexible, parse_date_flexible_safe, parse_time_flexible, parse_time_flexible_safe, resolve_birth_city
+from app.schemas import ChartBatchRequest, ChatRequest, ChatResponse, CompatibilityRequest, CompatibilityResponse, HoroscopeRequest, HoroscopeResponse, PaymentWebhookRequest, Profile, ProfileListRequest, ProfileListResponse, SimulatePaymentRequest, StartCheckoutRequest, StartCheckoutResponse
 from app.chatcontextmanager import ChatContextManager
 
-from app.config.constants import HEAVY_TASKS, LANGUAGES, PAYMENT_PLANS, PLAN_QUOTAS, PROMPTS, SIGN_ABBREV_TO_FULL, SIGNS, SKIP_COMMANDS, detect_special_intent
-from app.services.astrology.chart_calculations import calculate_natal_chart_multi_method, get_transits_swisseph
+from app.config.constants import HEAVY_TASKS, LANGUAGES, PAYMENT_PLANS, PLAN_QUOTAS, PROMPTS, SIGNS, SKIP_COMMANDS, detect_special_intent
+from app.services.astrology.chart_calculations import get_skyfield, get_transits_swisseph
+from app.services.astrology.chart_batch import iter_charts, shutdown_chart_pool, to_ndjson
+from app.services.astrology.chart_service import chart_cache, get_natal_chart
+from app.services.astrology.ephemeris_files import ephemeris_files, touch_served_range
+from app.services.astrology.event_index import event_index, prefill_event_index, safe_timing_context
+from app.services.astrology.horoscope import generate_horoscope
+from app.services.astrology.archetype_horoscopes import archetype_horoscopes
+from app.services.astrology.horoscope_precompute import horoscope_precompute, local_date, remember_horoscope, stored_horoscope
+from app.services.astrology.transit_cache import transit_cache
 from app.services.astrology.synastry_flow import handle_compatibility_flow, split_message
-from app.services.chroma_cloud.chromadbClient import create_chroma_client, get_relevant_passages, safe_get_relevant_passages
+from app.services.chroma_cloud.chromadbClient import get_embeddings, get_relevant_passages, get_vector_store, safe_get_relevant_passages
 from app.services.cloudflare.d1_client import execute_d1_query
-from app.services.cloudflare.feedback_service import create_feedback_tables,handle_feedback_flow_webhook, normalize_emoji, process_text_feedback_step, send_feedback_rating_prompt, start_feedback_flow, start_text_feedback, feedback_sessions
-from app.services.cloudflare.payments_service import ensure_payments_table, update_payment_status, upsert_payment
-from app.services.cloudflare.synastry_service import calculate_synastry_aspects, create_compatibility_tables, delete_compatibility_session, save_compatibility_result, save_compatibility_session
-from app.services.cloudflare.users_service import create_message_counter_table, create_profile, create_profiles_table, deactivate_all_profiles, delete_user, get_user, get_user_language, insert_user, list_profiles, reset_user_message_count, switch_active_profile, update_user_dob, update_user_language
-from app.services.lago.subscription import activate_subscription, check_and_prompt, compute_period_window, create_billing_tables, ensure_lago_plans, ensure_period_rollover_if_needed, get_current_subscription_row, get_usage_state, lago_upsert_customer, log_payment_activity, send_payment_prompt, terminate_subscription, upsert_active_subscription
+from app.services.cloudflare.migrations import run_migrations
+from app.services.cloudflare.feedback_service import handle_feedback_flow_webhook, normalize_emoji, process_text_feedback_step, send_feedback_rating_prompt, start_feedback_flow, start_text_feedback, feedback_sessions
+from app.services.cloudflare.payments_service import update_payment_status, upsert_payment
+from app.services.cloudflare.synastry_service import calculate_synastry_aspects, delete_compatibility_session, save_compatibility_result, save_compatibility_session
+from app.services.cloudflare.users_service import create_profile, deactivate_all_profiles, delete_user, get_user, get_user_language, insert_user, list_profiles, reset_user_message_count, switch_active_profile, update_user_dob, update_user_language
+from app.services.geo.gazetteer import get_gazetteer
+from app.services.geo.timezone_resolver import timezone_resolver
+from app.services.http.clients import close_http_clients, http_client
+from app.services.observability.capture import WebhookCaptureMiddleware
+from app.services.observability.metrics import registry
+from app.services.observability.tracing import span, trace
+from app.services.queue.job_queue import JobQueue
+from app.services.runtime.memory import memory_report
+from app.services.runtime.singletons import singletons
+from app.services.runtime.warmup import timed_import, warmup
+from app.services.state.dedup_store import dedup_store
+from app.services.state.session_store import session_scope, session_store
+from app.services.lago.subscription import activate_subscription, check_and_prompt, compute_period_window, ensure_period_rollover_if_needed, get_current_subscription_row, get_usage_state, lago_upsert_customer, log_payment_activity, send_payment_prompt, terminate_subscription, upsert_active_subscription
 from app.services.whatsapp.payments import send_upi_intent_payment_message, verify_meta_signature
+from app.services.whatsapp.outbound import outbound_dispatcher
+from app.services.whatsapp.webhook_batch import batch_stats, split_webhook_payload
 from app.services.whatsapp.send_messageAndEvents import send_feedback_request_prompt, send_language_selector, send_payment_invoice, send_profile_list_whatsapp, send_typing_indicator, send_whatsapp, send_whatsapp_interactive, send_whatsapp_location_request, send_whatsapp_reaction
 from app.util.natal_chart.send_chart import send_user_chart_pdf
-from app.util.CTA_buttons_NLP.buttons_nlp import determine_context_buttons
+from app.util.CTA_buttons_NLP.buttons_nlp import determine_context_buttons, get_intent_classifier
 
 import re
 import os
@@ -57,8 +74,7 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(mess
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-SWEPH_EPHE_PATH = os.getenv("SWEPH_EPHE_PATH", "./ephe") 
-swe.set_ephe_path(SWEPH_EPHE_PATH)
+ephemeris_files.configure_swisseph()
 
 # Embedding models
 # embed_model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -68,8 +84,7 @@ swe.set_ephe_path(SWEPH_EPHE_PATH)
 # chroma_client = chromadb.PersistentClient(path="./chromadb_data")
 # vector_store = Chroma(client=chroma_client, collection_name="astro_passages", embedding_function=embeddings)
 
-# ChromaDB client setup (CLOUD)
-chroma_client, vector_store = create_chroma_client()
+# ChromaDB client setup (CLOUD) is lazy: see get_vector_store() and the warmup steps below
 
 # Whatsapp Business API config
 WA_ACCESS_TOKEN = settings.WA_ACCESS_TOKEN
@@ -85,30 +100,46 @@ CF_API_TOKEN = settings.CF_API_TOKEN
 if not WORKER or not TOKEN:
     raise RuntimeError("Missing WORKER_URL or CF_TOKEN in .env")
 
-processed_messages = set()
-MESSAGE_TTL = 300  # 5 minutes
-
 def is_duplicate_message(message_id: str) -> bool:
-    """Check if message has been processed recently"""
-    global processed_messages
-    if message_id in processed_messages:
-        return True
-    processed_messages.add(message_id)
-    # Clean up old messages
-    if len(processed_messages) > 1000:
-        # Keep only recent 1000 messages
-        processed_messages = set(list(processed_messages)[-1000:])
-    return False
+    """Check if message has been processed recently (by any worker, within MESSAGE_TTL)"""
+    return dedup_store.is_duplicate(message_id)
 
 
 # --- FastAPI app ---
 app = FastAPI()
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
-
-
-
-from timezonefinder import TimezoneFinder
-tf = TimezoneFinder()
+if settings.CAPTURE_PATH:
+    # Record webhook traffic for load replays (see replay_webhooks.py)
+    app.add_middleware(WebhookCaptureMiddleware, path=settings.CAPTURE_PATH)
+
+
+@app.middleware("http")
+async def trace_http_requests(request: Request, call_next):
+    # Per-request stage breakdown in the logs and request latency histogram on /metrics
+    with trace("http", method=request.method, path=request.url.path):
+        return await call_next(request)
+
+# Background processing for WhatsApp webhooks
+webhook_queue = JobQueue(
+    "whatsapp",
+    workers=settings.WEBHOOK_QUEUE_WORKERS,
+    maxsize=settings.WEBHOOK_QUEUE_MAXSIZE,
+    drain_timeout=settings.WEBHOOK_QUEUE_DRAIN_TIMEOUT,
+)
+
+
+# Heavy models and data files load here instead of at import time, so a worker can bind
+# its port in well under a second; /ready reports when they are all in memory.
+warmup.register("embeddings", get_embeddings)
+warmup.register("vector_store", get_vector_store, fork_safe=False)
+warmup.register("skyfield", get_skyfield)
+warmup.register("ephemeris_pages", touch_served_range)
+warmup.register("transits", transit_cache.prefill)
+warmup.register("events", prefill_event_index)
+warmup.register("timezonefinder", timezone_resolver.warm)
+warmup.register("gazetteer", get_gazetteer)
+warmup.register("kerykeion", lambda: timed_import("kerykeion"))
+warmup.register("intent_classifier", get_intent_classifier)
 
 
 # Add this new endpoint after your existing endpoints
@@ -143,14 +174,14 @@ async def compatibility_analysis(req: CompatibilityRequest):
         
         try:
             logger.info(f"Sending compatibility request to Worker: {WORKER}/compatibility")
-            res = requests.post(f"{WORKER}/compatibility", json=payload, headers=headers, timeout=60)
+            res = http_client("worker").post(f"{WORKER}/compatibility", json=payload, headers=headers)
             logger.info(f"Worker compatibility response: {res.text}")
             res.raise_for_status()
             content = res.json()
             
             return CompatibilityResponse(**content)
             
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Worker error in compatibility: {e}")
             raise HTTPException(502, "AI service unavailable for compatibility analysis")
             
@@ -166,55 +197,46 @@ context_manager =None
 @app.on_event("startup")
 def startup():
     global context_manager
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS users (
-        user_id TEXT PRIMARY KEY,
-        name TEXT,
-        dob TEXT,
-        birth_time TEXT,
-        birth_city TEXT,
-        lat REAL,
-        lng REAL,
-        timezone TEXT,
-        natal_chart TEXT,
-        language TEXT DEFAULT 'en'
-    );
-    """
+    # Fail now, with the missing/corrupt file named, rather than on the first chart request
+    ephemeris_files.check()
 
-    try:
-        create_compatibility_tables();
-        execute_d1_query(create_table_sql)
-
-        logger.info("Users table created or already exists in Cloudflare D1.")
-        context_manager = ChatContextManager(
-            cf_account_id=CF_ACCOUNT_ID,
-            cf_d1_database_id=CF_D1_DATABASE_ID,
-            cf_api_token=CF_API_TOKEN
-        )
-        context_manager.create_chat_context_table()
-        create_feedback_tables()
-        create_message_counter_table()
-        create_profiles_table()
-        logger.info("Chat context system initialized")
-        create_billing_tables()
-        ensure_payments_table()
-        ensure_lago_plans()
+    if settings.D1_MIGRATIONS_ON_STARTUP:
+        try:
+            # Warm boot: a single version check; only one process applies pending migrations
+            run_migrations()
+        except Exception as e:
+            logger.error(f"Failed to migrate D1 schema: {e}")
 
+    context_manager = ChatContextManager(
+        cf_account_id=CF_ACCOUNT_ID,
+        cf_d1_database_id=CF_D1_DATABASE_ID,
+        cf_api_token=CF_API_TOKEN
+    )
+    logger.info("Chat context system initialized")
+
+    if settings.OUTBOUND_ASYNC:
+        outbound_dispatcher.start()
+    if settings.WEBHOOK_ASYNC_MODE:
+        webhook_queue.start()
+    if settings.HOROSCOPE_PRECOMPUTE_ENABLED:
+        # Every worker runs the loop; only the one holding the container's lock file does passes
+        horoscope_precompute.start()
+
+    if settings.FAST_STARTUP:
+        warmup.start_background()
+    else:
+        warmup.run()
 
-        
-        create_payment_log_table = """
-        CREATE TABLE IF NOT EXISTS payment_activity_log (
-            log_id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            action TEXT NOT NULL,
-            details TEXT,
-            created_at TEXT NOT NULL
-        );
-        """
-        execute_d1_query(create_payment_log_table)
-        logger.info("Payment activity log table created or already exists")
-    except Exception as e:
-        logger.error(f"Failed to create users table: {e}")
+
+@app.on_event("shutdown")
+def shutdown():
+    # Let in-flight and queued webhook jobs finish before the worker exits
+    webhook_queue.shutdown(drain=True)
+    # Then flush replies those jobs queued for sending
+    outbound_dispatcher.stop(timeout=settings.OUTBOUND_DRAIN_TIMEOUT)
+    horoscope_precompute.stop()
+    close_http_clients()
+    shutdown_chart_pool()
 
 def is_heavy_task(intent: str, text: str) -> bool:
     if intent in HEAVY_TASKS:
@@ -224,7 +246,7 @@ def is_heavy_task(intent: str, text: str) -> bool:
     return False
 
 
-active_payment_flows = {}
+active_payment_flows = session_store.namespace("payment_flows", ttl=settings.SESSION_TTL_FLOWS)
 
 def _clean_e164(e164: str) -> str:
     return e164.replace("whatsapp:", "").strip()
@@ -393,113 +415,12 @@ def ensure_free_subscription(phone_e164: str) -> bool:
 @app.post("/generate", response_model=HoroscopeResponse)
 async def generate(req: HoroscopeRequest):
     t0 = time.perf_counter()
-    # Natal chart (unchanged)
-    subj = AstrologicalSubject(
-        name=req.name, year=req.birth_year, month=req.birth_month, day=req.birth_day,
-        hour=req.birth_hour, minute=req.birth_minute, lat=req.lat, lng=req.lng, tz_str=req.timezone, online=False
-    )
-    print(subj.mars)
-    print(subj.sun)
-    logger.info("Calculating natal chart...")
-
-    natal, retro = {}, []
-    for p in ["sun", "moon", "mercury", "venus", "mars", "jupiter", "saturn", "uranus", "neptune", "pluto"]:
-        d = getattr(subj, p)
-        full_sign = SIGN_ABBREV_TO_FULL.get(d.get("sign"), "Unknown")
-        natal[p.capitalize()] = {"sign": full_sign, "degree": round(d["position"], 1), "house": d["house"]}
-        logger.info(f"Natal {p.capitalize()}: {full_sign} {natal[p.capitalize()]['degree']}°, House {d['house']}")
-        if d.get("retrograde"):
-            retro.append(p.capitalize())
-            logger.info(f"{p.capitalize()} is retrograde")
-    logger.info(f"Retrogrades: {retro if retro else 'None'}")
-    
-    # Transits (Swiss Ephemeris, not async)
-    dt = req.date or date.today().isoformat()
-    trans = get_transits_swisseph(req.lat, req.lng, dt)
-    logger.info("Calculating aspects...")
-    zodiac = SIGNS
-    aspects = []
-    aspect_types = {0: "conjunction", 60: "sextile", 90: "square", 120: "trine", 180: "opposition"}
-    for nat_p, nd in natal.items():
-        if nd["sign"] == "Unknown":
-            logger.warning(f"Skipping aspects for {nat_p} due to Unknown sign")
-            continue
-        for tr_p, td in trans.items():
-            if td["sign"] == "Unknown":
-                logger.warning(f"Skipping aspects for transit {tr_p} due to Unknown sign")
-                continue
-            nat_deg = zodiac.index(nd["sign"]) * 30 + nd["degree"]
-            tr_deg = zodiac.index(td["sign"]) * 30 + td["degree"]
-            diff = abs(nat_deg - tr_deg) % 360
-            diff = diff if diff <= 180 else 360 - diff
-            for ang, name in aspect_types.items():
-                if abs(diff - ang) <= 8:
-                    aspects.append(f"{tr_p} {name} natal {nat_p}")
-                    logger.info(f"Aspect detected: {tr_p} {name} natal {nat_p} (angle: {diff:.1f}°)")
-                    break
-
-    logger.info("Calculating natal-natal aspects...")
-    natal_aspects = []
-    planet_pairs = [
-        (p1, p2) for i, p1 in enumerate(natal.keys()) for p2 in list(natal.keys())[i+1:]
-    ]
-    for p1, p2 in planet_pairs:
-        if natal[p1]["sign"] == "Unknown" or natal[p2]["sign"] == "Unknown":
-            logger.warning(f"Skipping natal aspect between {p1} and {p2} due to Unknown sign")
-            continue
-        try:
-            deg1 = zodiac.index(natal[p1]["sign"]) * 30 + natal[p1]["degree"]
-            deg2 = zodiac.index(natal[p2]["sign"]) * 30 + natal[p2]["degree"]
-            diff = abs(deg1 - deg2) % 360
-            diff = diff if diff <= 180 else 360 - diff
-            for ang, name in aspect_types.items():
-                if abs(diff - ang) <= 8:
-                    natal_aspects.append(f"{p1} {name} {p2}")
-                    logger.info(f"Natal aspect detected: {p1} {name} {p2} (angle: {diff:.1f}°)")
-                    break
-        except Exception as e:
-            logger.error(f"Error calculating natal aspect between {p1} and {p2}: {e}")
-
-
-    # RAG query with transit availability check
-    unknown_count = sum(1 for p in trans.values() if p["sign"] == "Unknown")
-    trans_str = "Transit data unavailable" if unknown_count > 3 else json.dumps(trans)
-    qc = (f"Vedic horoscope for {req.name}: Natal Sun {natal['Sun']['sign']} {natal['Sun']['degree']}°, "
-          f"Moon {natal['Moon']['sign']} {natal['Moon']['degree']}°, Date {dt}, "
-          f"Transits {trans_str}, Aspects {aspects}, Retrogrades {retro}")
-    passages = safe_get_relevant_passages(qc)
-
-    # Prepare worker payload (unchanged)
-    payload = {
-        "name": req.name,
-        "natal_chart": natal,
-        "current_transits": trans,
-        "aspects": aspects,
-        "retrogrades": retro,
-        "passages": passages,
-        "date": dt,
-        "language": getattr(req, "language", "en")
-
-    }
-    headers = {"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"}
-    logger.info(f"Worker payload: {json.dumps(payload, indent=2)}")
     try:
-        logger.info(f"Sending request to Worker: {WORKER}/personal")
-        res = requests.post(f"{WORKER}/personal", json=payload, headers=headers, timeout=60)
-        logger.info(f"Worker response: {res.text}")
-        res.raise_for_status()
-        content = res.json()
-    except requests.RequestException as e:
+        content = generate_horoscope(req)
+    except httpx.HTTPError as e:
         logger.error(f"Worker error: {e}")
         raise HTTPException(502, "AI service unavailable")
 
-    if isinstance(content, dict):
-        content.setdefault("practical_guidance", {})
-        content["practical_guidance"]["lucky_numbers"] = random.sample(range(1, 91), 4)
-        content["practical_guidance"]["lucky_colors"] = random.sample(
-            ["Saffron", "Emerald", "Gold", "Silver", "Coral", "Pearl"], 2
-        )
-
     gen_time = time.perf_counter() - t0
     logger.info(f"Response generated in {gen_time:.3f} seconds")
     return HoroscopeResponse(horoscope=content, generation_time_seconds=gen_time)
@@ -568,7 +489,7 @@ async def astro_chat(req: ChatRequest):
     }
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     try:
-        res = requests.post(f"{worker_url}/chat", json=llm_payload, headers=headers, timeout=60)
+        res = http_client("worker").post(f"{worker_url}/chat", json=llm_payload, headers=headers)
         res.raise_for_status()
         result = res.json()
         answer = result.get("response", "I'm unable to answer at the moment.")
@@ -579,11 +500,10 @@ async def astro_chat(req: ChatRequest):
     return ChatResponse(response=answer)
 
 def call_worker(payload: dict) -> dict:
-    res = requests.post(
+    res = http_client("worker").post(
         f"{WORKER}/cosmic-guidance",
         json=payload,
-        headers={"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"},
-        timeout=30
+        headers={"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"}
     )
     res.raise_for_status()
     return res.json()
@@ -794,11 +714,10 @@ def call_worker1(natal_chart: dict) -> dict:
             "language": "en"  # Add language if available
         }
         
-        res = requests.post(
+        res = http_client("worker").post(
             f"{WORKER}/cosmic-guidance",
             json=payload,
-            headers={"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"},
-            timeout=30
+            headers={"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"}
         )
         res.raise_for_status()
         return res.json()
@@ -925,7 +844,8 @@ async def handle_payment_plan_selection(from_number: str, plan_id: str):
 
     try:
         # Send UPI intent message
-        send_upi_intent_payment_message(
+        await asyncio.to_thread(
+            send_upi_intent_payment_message,
             to_e164=f"whatsapp:{from_number}",
             reference_id=reference_id,
             amount_in_paise=plan["amount"],
@@ -955,9 +875,10 @@ async def handle_payment_plan_selection(from_number: str, plan_id: str):
 
 
 
-users = {}
-question_states = {}
-compatibility_sessions = {}
+# Conversation state lives in the shared session store so any worker can pick up a user's flow
+users = session_store.namespace("users", ttl=settings.SESSION_TTL_USERS)
+question_states = session_store.namespace("question_states", ttl=settings.SESSION_TTL_FLOWS)
+compatibility_sessions = session_store.namespace("compatibility", ttl=settings.SESSION_TTL_FLOWS)
 def to_wa_recipient(wa_id: str) -> str:
     return wa_id if str(wa_id).startswith("whatsapp:") else f"whatsapp:{wa_id}"
 
@@ -975,18 +896,207 @@ async def whatsapp_webhook_verify(request: Request):
 
 @app.post("/whatsapp")
 async def whatsapp_webhook(request: Request):
-    global context_manager
-
-    buttons = []  
-    footer=None
+    """Validate and acknowledge the webhook, then hand it to the background queue."""
     try:
         raw_body = await request.body()
-        payload = await request.json()
+        payload = json.loads(raw_body.decode("utf-8"))
     except Exception as e:
         logger.error(f"Failed to parse JSON: {e}")
         return PlainTextResponse("Invalid JSON", status_code=400)
-    body = json.loads(raw_body.decode("utf-8"))
-    logger.info(f"Incoming WA webhook: {json.dumps(body)[:500]}")
+    logger.info(f"Incoming WA webhook: {raw_body.decode('utf-8', errors='replace')[:500]}")
+
+    entries = payload.get("entry") if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        logger.error("Webhook payload has no entries")
+        return PlainTextResponse("Invalid message payload", status_code=400)
+
+    # A delivery can batch several entries/messages/statuses; fan every one of them out,
+    # grouped per user so each user's events stay together and in order
+    groups = split_webhook_payload(payload)
+    batch_stats.record(groups)
+    if not groups:
+        return JSONResponse({"status": "no events"})
+
+    if not settings.WEBHOOK_ASYNC_MODE:
+        result = None
+        for _, units in groups:
+            result = await handle_whatsapp_group(units)
+        return result if len(groups) == 1 else JSONResponse({"status": "processed", "groups": len(groups)})
+
+    # Same user -> same lane, so one user's messages are handled in order while
+    # different users run in parallel
+    rejected = 0
+    for user_key, units in groups:
+        if not webhook_queue.submit_keyed(user_key, handle_whatsapp_group, units):
+            rejected += 1
+    if rejected:
+        # Non-2xx makes Meta redeliver later instead of us silently dropping messages;
+        # groups that were queued are de-duplicated by message id on redelivery
+        return JSONResponse({"status": "busy", "rejected_groups": rejected}, status_code=503)
+    return JSONResponse({"status": "queued", "groups": len(groups)})
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Operator-only routes: `Authorization: Bearer <ADMIN_TOKEN>`. Closed when ADMIN_TOKEN is unset."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if not settings.ADMIN_TOKEN or scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.strip().encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="admin token required")
+
+
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+async def prometheus_metrics():
+    """Prometheus text exposition: dependency latency/error/in-flight series plus queue, dedup, session and batch stats."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+registry.add_stats_collector("astro_webhook_queue", webhook_queue.stats, "Webhook job queue")
+registry.add_stats_collector("astro_dedup", dedup_store.stats, "Webhook de-duplication")
+registry.add_stats_collector("astro_sessions", session_store.stats, "Conversation state store")
+registry.add_stats_collector("astro_webhook_batches", batch_stats.stats, "Webhook delivery batching")
+registry.add_stats_collector("astro_outbound", outbound_dispatcher.stats, "Outbound WhatsApp dispatcher")
+registry.add_stats_collector("astro_chart_cache", chart_cache.stats, "Natal chart cache")
+registry.add_stats_collector("astro_transit_cache", transit_cache.stats, "Daily transit cache")
+registry.add_stats_collector("astro_event_index", event_index.stats, "Astronomical event index")
+registry.add_stats_collector("astro_timezones", timezone_resolver.stats, "Timezone resolver")
+registry.add_stats_collector("astro_gazetteer", lambda: get_gazetteer().stats(), "Offline city gazetteer")
+registry.add_stats_collector("astro_horoscope_precompute", horoscope_precompute.stats, "Nightly horoscope precompute")
+registry.add_stats_collector("astro_archetype_horoscopes", archetype_horoscopes.stats, "Shared archetype horoscopes")
+
+
+@app.get("/metrics/queue", dependencies=[Depends(require_admin)])
+async def queue_metrics():
+    return webhook_queue.stats()
+
+
+@app.get("/metrics/dedup", dependencies=[Depends(require_admin)])
+async def dedup_metrics():
+    return dedup_store.stats()
+
+
+@app.get("/metrics/sessions", dependencies=[Depends(require_admin)])
+async def session_metrics():
+    return session_store.stats()
+
+
+@app.get("/metrics/outbound", dependencies=[Depends(require_admin)])
+async def outbound_metrics():
+    return outbound_dispatcher.stats()
+
+
+@app.get("/metrics/charts", dependencies=[Depends(require_admin)])
+async def chart_cache_metrics():
+    return {"natal": chart_cache.stats(), "transits": transit_cache.stats()}
+
+
+@app.get("/metrics/horoscopes", dependencies=[Depends(require_admin)])
+async def horoscope_metrics():
+    return {"precompute": horoscope_precompute.stats(), "archetypes": archetype_horoscopes.stats()}
+
+
+@app.get("/metrics/geo", dependencies=[Depends(require_admin)])
+async def geo_metrics():
+    return {"timezones": timezone_resolver.stats(), "gazetteer": get_gazetteer().stats()}
+
+
+@app.get("/geo/cities")
+def geo_cities(q: List[str] = Query(...), limit: int = Query(5, ge=1, le=20)):
+    """Ranked offline matches (coordinates and timezone) for one or more typed city names; repeat q for bulk."""
+    if len(q) > 1000:
+        raise HTTPException(status_code=413, detail="at most 1000 names per request")
+    candidates = get_gazetteer().search_many(q, limit=limit)
+    return {"results": [{"query": name, "candidates": found} for name, found in zip(q, candidates)]}
+
+
+@app.get("/transits")
+def transits_range(start: Optional[str] = None, end: Optional[str] = None):
+    """Daily transits (12:00 UTC) for start..end inclusive, YYYY-MM-DD; defaults to today."""
+    start = start or datetime.utcnow().strftime("%Y-%m-%d")
+    try:
+        return transit_cache.get_range(start, end or start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/events")
+def astro_events(start: Optional[str] = None, end: Optional[str] = None, days: int = 30,
+                 kind: Optional[List[str]] = Query(None), body: Optional[List[str]] = Query(None)):
+    """
+    Ingresses, stations, new/full moons and eclipses with exact UTC times, from start
+    (YYYY-MM-DD, default now) to end (default start + days), plus what is retrograde at start.
+    """
+    try:
+        begin = datetime.strptime(start, "%Y-%m-%d").replace(tzinfo=timezone.utc) if start else datetime.now(timezone.utc)
+        finish = datetime.strptime(end, "%Y-%m-%d").replace(tzinfo=timezone.utc) if end else begin + timedelta(days=days)
+        if (finish - begin).days > 3660:
+            raise ValueError("range is limited to 10 years")
+        return {
+            "events": event_index.between(begin, finish, kinds=kind, bodies=body),
+            "retrograde": event_index.retrogrades_at(begin),
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/charts/batch", dependencies=[Depends(require_admin)])
+def charts_batch(req: ChartBatchRequest):
+    """Natal charts for many birth records on the process pool, streamed back as NDJSON."""
+    if len(req.records) > settings.CHART_BATCH_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"at most {settings.CHART_BATCH_MAX_RECORDS} records per batch")
+    records = [record.model_dump() for record in req.records]
+    return StreamingResponse(to_ndjson(iter_charts(records, chunk_size=req.chunk_size)), media_type="application/x-ndjson")
+
+
+@app.get("/metrics/startup", dependencies=[Depends(require_admin)])
+async def startup_metrics():
+    return {**warmup.report(), "singletons": singletons.stats(), "ephemeris": ephemeris_files.stats()}
+
+
+@app.get("/metrics/memory", dependencies=[Depends(require_admin)])
+async def memory_metrics():
+    # RSS vs PSS per worker: the gap is memory shared copy-on-write with the preloading master
+    return memory_report()
+
+
+@app.get("/ready")
+async def ready():
+    # Readiness probe: 503 until the warmup steps have loaded models and ephemeris data
+    report = warmup.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+@app.get("/metrics/batches", dependencies=[Depends(require_admin)])
+async def batch_metrics():
+    return batch_stats.stats()
+
+
+async def handle_whatsapp_group(units: List[dict]):
+    """Handle one user's events from a delivery in order; a failing event doesn't block the rest."""
+    result = None
+    for unit in units:
+        try:
+            result = await handle_whatsapp_payload(unit)
+        except Exception as e:
+            logger.exception(f"Failed to process webhook event: {e}")
+    return result
+
+
+async def handle_whatsapp_payload(payload: dict):
+    # Persist any in-place edits to session state (users[n]["stage"] = ...) once the message is handled
+    value = payload["entry"][0]["changes"][0]["value"]
+    messages = value.get("messages") or []
+    event = messages[0].get("type") if messages else ("status" if value.get("statuses") else "other")
+    with trace("whatsapp", event=event, message_id=messages[0].get("id") if messages else None):
+        with session_scope():
+            return await process_whatsapp_payload(payload)
+
+
+async def process_whatsapp_payload(payload: dict):
+    global context_manager
+
+    buttons = []  
+    footer=None
 
     reply = None
     from_number = None
@@ -1479,7 +1589,8 @@ async def whatsapp_webhook(request: Request):
                 reference_id = f"ORDER-{from_number}-{int(time.time())}"
                 
                 # Send UPI intent message directly
-                send_upi_intent_payment_message(
+                await asyncio.to_thread(
+                    send_upi_intent_payment_message,
                     to_e164=f"whatsapp:{from_number}",
                     reference_id=reference_id,
                     amount_in_paise=plan["amount"],
@@ -1513,7 +1624,8 @@ async def whatsapp_webhook(request: Request):
                         birth_date = parse_date_flexible_safe(dob_str)
                         hour, minute = parse_time_flexible_safe(btime_str)
 
-                        send_user_chart_pdf(
+                        await asyncio.to_thread(
+                            send_user_chart_pdf,
                             to_e164=f"whatsapp:{from_number}",  
                             name=name_str or "Friend",
                             year=birth_date.year,
@@ -1598,18 +1710,22 @@ async def whatsapp_webhook(request: Request):
                 return {"status": "error"}
         
         elif not profile_data.get("birth_city"):
-            city_name = text
-            profile_data["birth_city"] = city_name
+            city_info, suggestion = resolve_birth_city(text, profile_data)
+            if city_info is None:
+                # A typo-corrected guess (or a "no" to one) is confirmed before it is used
+                reply = PROMPTS["confirm_birth_city"][lang_code].format(city=suggestion) if suggestion else PROMPTS["ask_birth_city"][lang_code]
+                send_whatsapp(from_number, reply)
+                return {"status": "profile_city_confirm"}
+            profile_data["birth_city"] = city_info["name"]
             
             try:
-                city_info = get_city_info(city_name)
-                profile_data.update(city_info)
+                profile_data.update(lat=city_info["lat"], lng=city_info["lng"], tz=city_info["tz"])
                 
                 # Calculate natal chart
                 birth_date = parse_date_flexible(profile_data["dob"])
                 hour, minute = profile_data["birth_time"].split(":")
                 
-                natal_chart = calculate_natal_chart_multi_method(
+                natal_chart = get_natal_chart(
                     profile_data["name"],
                     birth_date.year,
                     birth_date.month,
@@ -1716,10 +1832,9 @@ async def whatsapp_webhook(request: Request):
             # Send the compatibility response and return early
             if len(compatibility_response) > 1024:
                 chunks = split_message(compatibility_response)
-                for chunk in chunks[:-1]:
+                # Chunks are paced per recipient by the outbound dispatcher
+                for chunk in chunks:
                     send_whatsapp(from_number, chunk)
-                    time.sleep(0.5)
-                send_whatsapp(from_number, chunks[-1])
             else:
                 send_whatsapp(from_number, compatibility_response)
             
@@ -1758,7 +1873,8 @@ async def whatsapp_webhook(request: Request):
                     birth_date = parse_date_flexible_safe(dob_str)
                     hour, minute = parse_time_flexible_safe(btime_str)
 
-                    send_user_chart_pdf(
+                    await asyncio.to_thread(
+                        send_user_chart_pdf,
                         to_e164=f"whatsapp:{wa_id}",
                         name=name_str or "Friend",
                         year=birth_date.year,
@@ -1862,36 +1978,32 @@ async def whatsapp_webhook(request: Request):
                 # Call /generate route for daily horoscope
                 reaction_emoji = "🌟"
 
-                payload = {
-                    "name": user_data.get("name", "Friend"),
-                    "natal_chart": natal_chart,
-                    "current_transits": transits,
-                    "aspects": [],
-                    "retrogrades": [],
-                    "passages": safe_get_relevant_passages(context),
-                    "date": today_str,
-                    "language": lang_code
-                }
                 try:
-                    birth_date = datetime.strptime(user_data["dob"], "%d/%m/%Y")
-                    birth_hour, birth_minute = parse_time_flexible(user_data["birth_time"])
-
-                    horo_request = HoroscopeRequest(
-                        name=user_data["name"],
-                        birth_year=birth_date.year,
-                        birth_month=birth_date.month,
-                        birth_day=birth_date.day,
-                        birth_hour=birth_hour,
-                        birth_minute=birth_minute,
-                        lat=float(user_data["lat"]),
-                        lng=float(user_data["lng"]),
-                        timezone=user_data["timezone"],
-                        date=datetime.utcnow().strftime("%Y-%m-%d"),
-                        language=lang_code
-                    )
+                    # Precomputed after the user's local midnight; generate live (and keep it) on a miss
+                    horoscope_date = local_date(user_data.get("timezone"))
+                    profile_id = user_data.get("profile_id")
+                    horoscope_data = stored_horoscope(from_number, profile_id, horoscope_date, lang_code)
+                    if horoscope_data is None:
+                        birth_date = datetime.strptime(user_data["dob"], "%d/%m/%Y")
+                        birth_hour, birth_minute = parse_time_flexible(user_data["birth_time"])
+
+                        horo_request = HoroscopeRequest(
+                            name=user_data["name"],
+                            birth_year=birth_date.year,
+                            birth_month=birth_date.month,
+                            birth_day=birth_date.day,
+                            birth_hour=birth_hour,
+                            birth_minute=birth_minute,
+                            lat=float(user_data["lat"]),
+                            lng=float(user_data["lng"]),
+                            timezone=user_data["timezone"],
+                            date=horoscope_date,
+                            language=lang_code
+                        )
 
-                    response = await generate(horo_request)
-                    horoscope_data = response.horoscope
+                        response = await generate(horo_request)
+                        horoscope_data = response.horoscope
+                        remember_horoscope(from_number, profile_id, horoscope_date, lang_code, horoscope_data)
 
                     # Core summary
                     cosmic_summary = horoscope_data.get('cosmic_summary') or horoscope_data.get('summary') or "A day of cosmic flow awaits."
@@ -1933,6 +2045,9 @@ async def whatsapp_webhook(request: Request):
                         f"🌟 {intro_line} 🌟\n\n"
                         f"💫 {cosmic_summary}\n\n"
                     )
+                    # Archetype readings are shared; this line is the user's own sky
+                    personal = horoscope_data.get("personal_line")
+                    if personal: reply += f"🔭 {personal}\n\n"
                     if energy: reply += f"⚡ *Energy*:\n {energy}\n\n"
                     if career: reply += f"💼 *Career*:\n {career}\n\n"
                     if relationships: reply += f"❤️ *Relationships*:\n {relationships}\n\n"
@@ -1959,12 +2074,15 @@ async def whatsapp_webhook(request: Request):
                     return JSONResponse({"status": "limit_reached"})
 
                 passages = safe_get_relevant_passages(context + " " + text)
+                # Real upcoming ingresses/stations/lunations, so "best timing" names actual dates
+                timing = safe_timing_context(days=30)
                 payload = {
                     "name": user_data["name"],
                     "natal_chart": natal_chart,
                     "current_transits": transits,
                     "aspects": [],
-                    "retrogrades": [],
+                    "retrogrades": timing["retrogrades"],
+                    "upcoming_events": timing["upcoming_events"],
                     "passages": passages,
                     "question": text,
                     "date": today_str,
@@ -2108,11 +2226,10 @@ IMPORTANT:
                 }
 
                 try:
-                    response = requests.post(
+                    response = http_client("worker").post(
                         f"{WORKER}/chat",
                         json=llm_payload,
-                        headers={"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"},
-                        timeout=60
+                        headers={"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"}
                     )
                     response.raise_for_status()
                     result = response.json()
@@ -2262,7 +2379,7 @@ IMPORTANT:
                             user["birth_city"] = name
                             user["lat"] = float(lat)
                             user["lng"] = float(lng)
-                            user["timezone"] = tf.timezone_at(lat=float(lat), lng=float(lng)) or "Asia/Kolkata"
+                            user["timezone"] = timezone_resolver.resolve(float(lat), float(lng))
                             reaction_emoji = "📍"
                             reply = PROMPTS["creating_cosmic_profile"][lang_code]
                         except Exception as e:
@@ -2272,9 +2389,13 @@ IMPORTANT:
                             send_whatsapp(from_number, reply)
                             return {"status": "error"}
                 else:
-                    # Handle typed city
-                    user["birth_city"] = text.strip()
-                    city_info = get_city_info(text)
+                    # Handle typed city; a typo-corrected guess is confirmed before it is used
+                    city_info, suggestion = resolve_birth_city(text, user)
+                    if city_info is None:
+                        reply = PROMPTS["confirm_birth_city"][lang_code].format(city=suggestion) if suggestion else PROMPTS["ask_birth_city"][lang_code]
+                        send_whatsapp(from_number, reply)
+                        return {"status": "confirm_birth_city"}
+                    user["birth_city"] = city_info["name"]
                     user["lat"] = city_info["lat"]
                     user["lng"] = city_info["lng"]
                     user["timezone"] = city_info["tz"]
@@ -2298,7 +2419,7 @@ IMPORTANT:
                         hour = 12
                     if not (0 <= minute <= 59):
                         minute = 0
-                    natal_chart = calculate_natal_chart_multi_method(
+                    natal_chart = get_natal_chart(
                         user.get("name", "User"),
                         birth_date.year,
                         birth_date.month,
@@ -2336,7 +2457,8 @@ IMPORTANT:
 
                                 hour, minute = coerce_time_to_hm(user["birth_time_str"])  # Use the string version
 
-                                send_user_chart_pdf(
+                                await asyncio.to_thread(
+                                    send_user_chart_pdf,
                                     to_e164=f"whatsapp:{from_number}",  # Use from_number here
                                     name=user.get("name", "Friend"),
                                     year=birth_date_dt.year,
@@ -2450,10 +2572,9 @@ IMPORTANT:
         if len(reply) > 1800:
             chunks = split_message(reply)
             
-            # Send all chunks except last as text messages
+            # Send all chunks except last as text messages (paced per recipient by the outbound dispatcher)
             for chunk in chunks[:-1]:
                 send_whatsapp(from_number, chunk)
-                time.sleep(0.5)  # Brief delay between messages
             
             # Handle last chunk with buttons
             last_chunk = chunks[-1]
@@ -2462,7 +2583,6 @@ IMPORTANT:
             else:
                 send_whatsapp(from_number, last_chunk)
                 if buttons:
-                    time.sleep(0.5)
                     prompt = "What would you like to do next?"
                     send_whatsapp_interactive(from_number, prompt, buttons,footer)
         else:
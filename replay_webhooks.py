@@ -0,0 +1,209 @@
+"""
+Replay a webhook capture (written by WebhookCaptureMiddleware, see CAPTURE_PATH) against a running app.
+
+    python replay_webhooks.py capture.jsonl --url http://localhost:8000 --speed 1x
+    python replay_webhooks.py capture.jsonl --speed 10x --fresh-ids
+    python replay_webhooks.py capture.jsonl --speed max --concurrency 64
+
+--speed 1x keeps the recorded inter-arrival gaps, Nx compresses them N times, max sends
+as fast as --concurrency allows. Reports per-route latency percentiles and error rates.
+
+Latency is only meaningful if the app handles /whatsapp before responding, so run it with
+WEBHOOK_ASYNC_MODE=false. In the default async mode it answers "queued" as soon as the job
+is enqueued; the replay stops at the first such reply rather than report ack latency as
+processing time.
+
+The app will really process the messages (LLM calls, WhatsApp replies), so point it at a
+staging/TEST_MODE instance. Use --fresh-ids to give every replayed message a new id,
+otherwise the dedup store drops replays of messages it has already seen.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+
+class AsyncModeError(RuntimeError):
+    """The app acknowledged a /whatsapp delivery before processing it."""
+
+
+def load_capture(path: str, paths: Optional[List[str]] = None) -> List[dict]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping malformed line {n}")
+                continue
+            if "body" not in record or "path" not in record:
+                continue
+            if paths and record["path"] not in paths:
+                continue
+            records.append(record)
+    records.sort(key=lambda r: r.get("ts", 0))
+    return records
+
+
+def refresh_message_ids(body: str) -> str:
+    """Give every message in a WhatsApp delivery a new id so the dedup store doesn't drop it."""
+    try:
+        payload = json.loads(body)
+        for entry in payload.get("entry") or []:
+            for change in entry.get("changes") or []:
+                for msg in (change.get("value") or {}).get("messages") or []:
+                    if "id" in msg:
+                        msg["id"] = f"{msg['id']}.replay.{uuid.uuid4().hex[:8]}"
+        return json.dumps(payload)
+    except (ValueError, AttributeError):
+        return body
+
+
+def acked_before_processing(res: httpx.Response) -> bool:
+    """True for the async-mode replies ("queued", or "busy" when the queue is full)."""
+    try:
+        return res.json().get("status") in ("queued", "busy")
+    except (ValueError, AttributeError):
+        return False
+
+
+def parse_speed(value: str) -> Optional[float]:
+    value = value.strip().lower()
+    if value == "max":
+        return None
+    speed = float(value.rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive, e.g. 1x, 5x or max")
+    return speed
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def replay(records: List[dict], base_url: str, speed: Optional[float], concurrency: int,
+                 timeout: float, fresh_ids: bool) -> Dict[str, dict]:
+    results: Dict[str, dict] = defaultdict(lambda: {"latencies": [], "statuses": defaultdict(int), "errors": 0})
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async_mode = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def send(record: dict):
+            body = record["body"]
+            if fresh_ids and record["path"] == "/whatsapp":
+                # Only unsigned routes: rewriting a signed payment body would break its signature
+                body = refresh_message_ids(body)
+            headers = dict(record.get("headers") or {})
+            headers.setdefault("content-type", "application/json")
+            async with semaphore:
+                if async_mode.is_set():
+                    return
+                started = time.perf_counter()
+                try:
+                    res = await client.post(record["path"], content=body.encode("utf-8"), headers=headers)
+                    elapsed = time.perf_counter() - started
+                    if record["path"] == "/whatsapp" and acked_before_processing(res):
+                        async_mode.set()
+                        return
+                    stats = results[record["path"]]
+                    stats["latencies"].append(elapsed)
+                    stats["statuses"][res.status_code] += 1
+                    if res.status_code >= 400:
+                        stats["errors"] += 1
+                except httpx.HTTPError as e:
+                    stats = results[record["path"]]
+                    stats["latencies"].append(time.perf_counter() - started)
+                    stats["statuses"][type(e).__name__] += 1
+                    stats["errors"] += 1
+
+        tasks = []
+        t0_capture = records[0].get("ts", 0) if records else 0
+        t0_wall = time.perf_counter()
+        for record in records:
+            if async_mode.is_set():
+                break
+            if speed is not None:
+                due = (record.get("ts", t0_capture) - t0_capture) / speed
+                delay = due - (time.perf_counter() - t0_wall)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(record)))
+        await asyncio.gather(*tasks)
+    if async_mode.is_set():
+        raise AsyncModeError("/whatsapp replied before processing the message (WEBHOOK_ASYNC_MODE is on), so its "
+                             "latency would be ack latency; restart the app with WEBHOOK_ASYNC_MODE=false and replay again")
+    return results
+
+
+def report(results: Dict[str, dict], wall_seconds: float):
+    total = sum(len(s["latencies"]) for s in results.values())
+    errors = sum(s["errors"] for s in results.values())
+    logger.info(f"\nReplayed {total} requests in {wall_seconds:.2f}s ({total / wall_seconds if wall_seconds else 0:.1f} req/s), "
+                f"errors {errors} ({100.0 * errors / total if total else 0:.2f}%)")
+    logger.info(f"{'route':<20}{'count':>7}{'err%':>8}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for path, stats in sorted(results.items()):
+        lat = sorted(stats["latencies"])
+        count = len(lat)
+        err_pct = 100.0 * stats["errors"] / count if count else 0.0
+        logger.info(
+            f"{path:<20}{count:>7}{err_pct:>8.2f}"
+            + "".join(f"{percentile(lat, p) * 1000:>10.1f}" for p in (50, 90, 95, 99))
+            + f"{(lat[-1] if lat else 0) * 1000:>10.1f}"
+        )
+        logger.info(f"{'':<20}status codes: {dict(stats['statuses'])}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay captured WhatsApp/payment webhooks against a running app")
+    parser.add_argument("capture", help="JSONL capture file written by CAPTURE_PATH")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the app under test")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1x (recorded pace), Nx (N times faster) or max")
+    parser.add_argument("--concurrency", type=int, default=32, help="Max requests in flight")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--path", action="append", help="Only replay this route (repeatable)")
+    parser.add_argument("--limit", type=int, help="Replay at most N records")
+    parser.add_argument("--fresh-ids", action="store_true", help="Rewrite WhatsApp message ids so dedup doesn't drop replays")
+    args = parser.parse_args(argv)
+
+    records = load_capture(args.capture, args.path)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        logger.error("No records to replay")
+        return 1
+
+    span_s = records[-1].get("ts", 0) - records[0].get("ts", 0)
+    pace = "max speed" if args.speed is None else f"{args.speed:g}x (~{span_s / args.speed:.1f}s)"
+    logger.info(f"Replaying {len(records)} records spanning {span_s:.1f}s at {pace} against {args.url}")
+
+    started = time.perf_counter()
+    try:
+        results = asyncio.run(replay(records, args.url, args.speed, max(1, args.concurrency), args.timeout, args.fresh_ids))
+    except AsyncModeError as e:
+        logger.error(str(e))
+        return 1
+    report(results, time.perf_counter() - started)
+    total = sum(len(s["latencies"]) for s in results.values())
+    errors = sum(s["errors"] for s in results.values())
+    return 0 if total and errors == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
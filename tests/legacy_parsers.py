@@ -0,0 +1,131 @@
+"""
+The strptime parsers that app/helpers.py's single-pass date/time parsers replaced, verbatim,
+and generators for the kind of dates and times users type. Shared by
+tests/test_date_time_parsing.py (agreement) and benchmarks/date_time_parsing.py (speed).
+"""
+import random
+from datetime import datetime
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July", "August",
+               "September", "October", "November", "December"]
+
+
+def random_date(rng: random.Random) -> str:
+    year, month, day = rng.randint(1940, 2010), rng.randint(1, 12), rng.randint(1, 31)
+    if rng.random() < 0.05:
+        month = rng.randint(13, 31)  # invalid or a US-style month/day swap
+    d, m = (f"{day:02d}", f"{month:02d}") if rng.random() < 0.5 else (str(day), str(month))
+    y = f"{year % 100:02d}" if rng.random() < 0.2 else str(year)
+    form = rng.random()
+    if form < 0.55:
+        sep = rng.choice("/-. ")
+        return rng.choice([f"{d}{sep}{m}{sep}{y}", f"{year}{sep}{m}{sep}{d}", f"{m}{sep}{d}{sep}{y}", f"{d}{sep}{m}"])
+    if form < 0.85:
+        name = rng.choice([MONTHS[(month - 1) % 12], MONTH_NAMES[(month - 1) % 12]])
+        suffix = rng.choice(["", "th"])
+        return rng.choice([f"{day}{suffix} {name} {y}", f"{name} {day}{suffix}, {y}", f"{day}-{name}-{y}", f"{day} {name}"])
+    return rng.choice(["unknown", "dont know", "sometime in 1990", f"{d}//{m}", f"{y}"])
+
+
+def random_time(rng: random.Random) -> str:
+    hour, minute = rng.randint(0, 23), rng.randint(0, 59)
+    form = rng.random()
+    if form < 0.5:
+        return f"{hour:02d}{rng.choice(':.-')}{minute:02d}" if rng.random() < 0.8 else str(hour)
+    hour12 = hour % 12 or 12
+    suffix = rng.choice(["am", "pm", " AM", " pm", "PM"])
+    if form < 0.85:
+        return f"{hour12}:{minute:02d}{suffix}" if rng.random() < 0.7 else f"{hour12}{suffix}"
+    return rng.choice([f"{hour12}.{minute:02d}{suffix}", f"{hour12} p.m.", f"{hour:02d}{minute:02d}",
+                       "not known", "morning", f"{hour}:{minute:02d}:00"])
+
+
+def legacy_parse_date_flexible(date_str: str) -> datetime:
+    """The strptime-based parser parse_date_flexible replaced"""
+    date_str = date_str.strip().lower()
+    
+    if date_str in ['unknown', 'not known', 'dont know', "don't know", 'na', 'n/a']:
+        raise ValueError("Date unknown - using fallback") 
+
+    formats_with_year = [
+        "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %m %Y",
+        "%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d/%m/%y", "%d-%m-%y"
+    ]
+    formats_without_year = [
+        "%d/%m", "%d-%m", "%d.%m", "%d %m", "%m/%d", "%m-%d"
+    ]
+
+    for fmt in formats_with_year:
+        try:
+            parsed = datetime.strptime(date_str, fmt)
+            if parsed.year < 100:
+                parsed = parsed.replace(year=parsed.year + (2000 if parsed.year <= 30 else 1900))
+            return parsed
+        except ValueError:
+            continue
+
+    default_year = datetime.now().year - 30  
+    for fmt in formats_without_year:
+        try:
+            partial = datetime.strptime(date_str, fmt)
+            return partial.replace(year=default_year)
+        except ValueError:
+            continue
+
+    raise ValueError(f"Unable to parse date: {date_str}")
+
+
+def legacy_parse_time_flexible(time_str: str):
+    """The strptime-based parser parse_time_flexible replaced"""
+    if time_str.lower() in ['unknown', 'not known', 'dont know', "don't know", 'na', 'n/a']:
+        return 12, 0  # Default to noon
+    
+    time_str = time_str.strip().replace(' ', '')
+    
+    # Handle AM/PM format
+    if 'am' in time_str.lower() or 'pm' in time_str.lower():
+        try:
+            is_pm = 'pm' in time_str.lower()
+            time_str = time_str.lower().replace('am', '').replace('pm', '')
+            
+            if ':' in time_str:
+                hour, minute = map(int, time_str.split(':'))
+            else:
+                hour = int(time_str)
+                minute = 0
+            
+            if is_pm and hour != 12:
+                hour += 12
+            elif not is_pm and hour == 12:
+                hour = 0
+                
+            return hour, minute
+        except ValueError:
+            pass
+    
+    # Handle 24-hour format
+    formats = [
+        "%H:%M",    # HH:MM
+        "%H.%M",    # HH.MM
+        "%H-%M",    # HH-MM
+        "%H %M",    # HH MM
+    ]
+    
+    for fmt in formats:
+        try:
+            time_obj = datetime.strptime(time_str, fmt).time()
+            return time_obj.hour, time_obj.minute
+        except ValueError:
+            continue
+    
+    # Try to parse as just hour
+    try:
+        hour = int(time_str)
+        if 0 <= hour <= 23:
+            return hour, 0
+    except ValueError:
+        pass
+    
+    # Default fallback
+    return 12, 0
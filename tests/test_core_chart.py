@@ -0,0 +1,43 @@
+"""
+The PDF chart needs Rahu and Ketu whichever calculation method produced the natal chart;
+the Kerykeion and simplified fallbacks don't return them.
+"""
+from datetime import datetime
+
+import pytest
+
+from app.services.astrology import chart_service
+from app.services.astrology.chart_calculations import calculate_lunar_nodes
+from app.util.natal_chart.core_chart import PLANET_IDS, SIGNS, calc_natal_chart_swe, validate_chart_for_render
+
+BIRTH = ("Asha", 1990, 1, 1, 10, 30, 19.076, 72.8777, "Asia/Kolkata")
+
+
+def fallback_chart(*args):
+    """A Kerykeion-style chart: planets and Ascendant, no lunar nodes."""
+    return {body: {"sign": SIGNS[i], "degree": 10.0, "longitude": i * 30 + 10.0, "retrograde": False}
+            for i, body in enumerate(list(PLANET_IDS) + ["Ascendant"])}
+
+
+@pytest.mark.parametrize("nodes", [{}, {"Rahu": {"sign": "Unknown"}, "Ketu": {"sign": "Unknown"}}])
+def test_nodes_are_added_when_the_fallback_has_none(monkeypatch, nodes):
+    monkeypatch.setattr(chart_service, "get_natal_chart", lambda *args: {**fallback_chart(), **nodes})
+
+    chart = calc_natal_chart_swe(*BIRTH)
+
+    assert validate_chart_for_render(chart) == (True, "OK")
+    expected = calculate_lunar_nodes(datetime(*BIRTH[1:6]), *BIRTH[6:])
+    for node in ("Rahu", "Ketu"):
+        assert chart[node]["sign"] == expected[node]["sign"] != "Unknown"
+        assert chart[node]["longitude"] == expected[node]["longitude"]
+    assert (chart["Ketu"]["longitude"] - chart["Rahu"]["longitude"]) % 360 == pytest.approx(180, abs=0.02)
+    assert chart["Sun"] == {"sign": "Aries", "degree": 10.0, "longitude": 10.0, "retrograde": False}
+
+
+def test_unplaced_nodes_are_not_rendered():
+    chart = {**fallback_chart(), "Rahu": {"sign": "Unknown", "degree": 0.0, "longitude": 0.0, "retrograde": True},
+             "Ketu": {"sign": "Unknown", "degree": 0.0, "longitude": 0.0, "retrograde": True}}
+
+    ok, msg = validate_chart_for_render(chart)
+
+    assert not ok and "Rahu" in msg and "Ketu" in msg
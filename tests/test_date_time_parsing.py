@@ -0,0 +1,112 @@
+"""
+The single-pass date/time parsers in app/helpers.py against the strptime loops they
+replaced (tests/legacy_parsers.py). Over the same generated inputs every result is either
+  same       identical (or both rejected the input)
+  new only   the old parser rejected it (or fell back to noon), the new one parses it
+  changed    both produced a result and they differ
+and every "changed" input must be one of the deliberate fixes in INTENDED_CHANGES.
+"""
+import random
+import re
+from datetime import datetime
+
+import pytest
+
+from app.helpers import parse_date_flexible, parse_time_flexible
+from tests.legacy_parsers import legacy_parse_date_flexible, legacy_parse_time_flexible, random_date, random_time
+
+INTENDED_CHANGES = {
+    # strptime's %y put 31-68 in the 2000s; the old code meant 31-99 to be 1900s
+    "two-digit year 31-68": lambda text: bool(re.fullmatch(r".*\D(3[1-9]|[4-5]\d|6[0-8])", text.strip())),
+    # the old AM/PM branch only understood "H:MM"; "7.30pm" lost its PM
+    "am/pm with '.' or '-'": lambda text: bool(re.search(r"\d[.\-]\d.*[ap]", text.lower())),
+    # "0020" was read as hour 20; 3-4 digits are now HHMM
+    "HHMM": lambda text: bool(re.fullmatch(r"\d{3,4}", text.strip())),
+}
+
+PARSERS = {
+    "dates": (legacy_parse_date_flexible, parse_date_flexible, None, random_date),
+    "times": (legacy_parse_time_flexible, parse_time_flexible, (12, 0), random_time),
+}
+
+
+def outcome(fn, value):
+    try:
+        return fn(value)
+    except ValueError:
+        return None
+
+
+def split(label, inputs):
+    old_fn, new_fn, fallback, _ = PARSERS[label]
+    result = {"same": [], "new only": [], "changed": []}
+    for text in dict.fromkeys(inputs):
+        old, new = outcome(old_fn, text), outcome(new_fn, text)
+        if old == new:
+            result["same"].append(text)
+        elif old is None or old == fallback:
+            result["new only"].append(text)
+        else:
+            result["changed"].append((text, old, new))
+    return result
+
+
+@pytest.mark.parametrize("label", sorted(PARSERS))
+def test_only_intended_changes_on_generated_inputs(label):
+    rng = random.Random(5)
+    inputs = [PARSERS[label][3](rng) for _ in range(20000)]
+    result = split(label, inputs)
+    unexpected = [row for row in result["changed"] if not any(check(row[0]) for check in INTENDED_CHANGES.values())]
+    assert unexpected == []
+    # Most of what users type must come out exactly as before
+    assert len(result["same"]) > len(result["new only"]) + len(result["changed"])
+
+
+@pytest.mark.parametrize("text", ["12/05/1990", "1990-05-12", "12.05.1990", "12 5 1990", "05/28/1990", "12-05-90"])
+def test_dates_both_parsers_agree(text):
+    assert split("dates", [text])["same"] == [text]
+
+
+@pytest.mark.parametrize("text", ["12 May 1990", "May 12th, 1990", "12-may-1990"])
+def test_dates_only_new_parser_reads_month_names(text):
+    assert split("dates", [text])["new only"] == [text]
+    assert parse_date_flexible(text) == datetime(1990, 5, 12)
+
+
+@pytest.mark.parametrize("text", ["14:30", "2:30 PM", "9am", "12am", "07-05", "unknown"])
+def test_times_both_parsers_agree(text):
+    assert split("times", [text])["same"] == [text]
+
+
+@pytest.mark.parametrize("text, old, new", [
+    ("9-8-43", datetime(2043, 8, 9), datetime(1943, 8, 9)),
+    ("5/9/53", datetime(2053, 9, 5), datetime(1953, 9, 5)),
+    ("1/1/68", datetime(2068, 1, 1), datetime(1968, 1, 1)),
+])
+def test_intended_two_digit_years_are_1900s(text, old, new):
+    assert split("dates", [text])["changed"] == [(text, old, new)]
+    assert INTENDED_CHANGES["two-digit year 31-68"](text)
+
+
+@pytest.mark.parametrize("text, old, new", [
+    ("2.30pm", (2, 30), (14, 30)),
+    ("6.31 pm", (6, 31), (18, 31)),
+    ("11-15 PM", (11, 15), (23, 15)),
+])
+def test_intended_am_pm_with_dot_or_dash(text, old, new):
+    assert split("times", [text])["changed"] == [(text, old, new)]
+    assert INTENDED_CHANGES["am/pm with '.' or '-'"](text)
+
+
+@pytest.mark.parametrize("text, old, new", [
+    ("0020", (20, 0), (0, 20)),
+    ("0005", (5, 0), (0, 5)),
+])
+def test_intended_hhmm(text, old, new):
+    assert split("times", [text])["changed"] == [(text, old, new)]
+    assert INTENDED_CHANGES["HHMM"](text)
+
+
+def test_hhmm_the_old_parser_sent_to_noon_is_new_only():
+    assert split("times", ["0730", "1930"])["new only"] == ["0730", "1930"]
+    assert parse_time_flexible("1930") == (19, 30)
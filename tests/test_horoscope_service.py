@@ -0,0 +1,131 @@
+"""
+The daily horoscope queries against an in-memory SQLite database (D1 is SQLite): which
+users the precompute lists, and that a stored horoscope only serves the profile it was
+made for.
+"""
+import sqlite3
+
+import pytest
+
+from app.chatcontextmanager import CHAT_CONTEXTS_TABLE_SQL
+from app.services.cloudflare import horoscope_service
+from app.services.cloudflare.horoscope_service import (
+    DAILY_HOROSCOPES_TABLE_SQL,
+    claim_daily_horoscope,
+    get_daily_horoscope,
+    list_active_users,
+    save_daily_horoscope,
+    settled_daily_horoscopes,
+)
+from app.services.cloudflare.users_service import USER_PROFILES_TABLE_SQL, USERS_TABLE_SQL
+
+SINCE = "2026-10-01T00:00:00"
+
+
+@pytest.fixture
+def d1(monkeypatch):
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+
+    def execute_d1_query(sql, params=None):
+        rows = db.execute(sql, params or []).fetchall()
+        db.commit()
+        return [dict(row) for row in rows]
+
+    for sql in (USERS_TABLE_SQL, USER_PROFILES_TABLE_SQL, CHAT_CONTEXTS_TABLE_SQL, DAILY_HOROSCOPES_TABLE_SQL):
+        db.execute(sql)
+    monkeypatch.setattr(horoscope_service, "execute_d1_query", execute_d1_query)
+    return db
+
+
+def add_user(db, user_id, language="en", dob="01/01/1990", lat=19.0):
+    db.execute(
+        "INSERT INTO users (user_id, name, dob, birth_time, birth_city, lat, lng, timezone, natal_chart, language) "
+        "VALUES (?, ?, ?, '10:30', 'Mumbai', ?, 72.8, 'Asia/Kolkata', '{}', ?)",
+        [user_id, f"main {user_id}", dob, lat, language],
+    )
+
+
+def add_profile(db, user_id, profile_id, active):
+    db.execute(
+        "INSERT INTO user_profiles (profile_id, owner_user_id, name, dob, birth_time, birth_city, lat, lng, "
+        "timezone, natal_chart, is_active, created_at) "
+        "VALUES (?, ?, ?, '02/02/1992', '08:00', 'Delhi', 28.6, 77.2, 'Asia/Kolkata', '{}', ?, ?)",
+        [profile_id, user_id, f"profile {profile_id}", int(active), SINCE],
+    )
+
+
+def add_message(db, user_id, timestamp="2026-10-15T09:00:00", role="user"):
+    db.execute(
+        "INSERT INTO chat_contexts (user_id, role, message_text, timestamp, created_at, expires_at) "
+        "VALUES (?, ?, 'hi', ?, ?, ?)",
+        [user_id, role, timestamp, timestamp, timestamp],
+    )
+
+
+def test_lists_main_profile_users_and_active_profiles(d1):
+    add_user(d1, "911", language="hi")      # main profile only
+    add_user(d1, "912")                     # active secondary profile
+    add_profile(d1, "912", "p-912", active=True)
+    add_user(d1, "913")                     # inactive secondary: main profile is used
+    add_profile(d1, "913", "p-913", active=False)
+    for user_id in ("911", "912", "913"):
+        add_message(d1, user_id)
+
+    rows = list_active_users(SINCE)
+
+    assert [(r["user_id"], r["profile_id"], r["name"], r["language"]) for r in rows] == [
+        ("911", None, "main 911", "hi"),
+        ("912", "p-912", "profile p-912", "en"),
+        ("913", None, "main 913", "en"),
+    ]
+    assert rows[0]["dob"] == "01/01/1990" and rows[0]["timezone"] == "Asia/Kolkata"
+
+
+def test_skips_inactive_and_incomplete_users(d1):
+    add_user(d1, "921")
+    add_message(d1, "921", timestamp="2026-09-01T09:00:00")  # before SINCE
+    add_user(d1, "922")
+    add_message(d1, "922", role="assistant")                  # never wrote themselves
+    add_user(d1, "923", dob=None)                             # onboarding not finished
+    add_message(d1, "923")
+
+    assert list_active_users(SINCE) == []
+
+
+def test_pages_by_user_id_across_both_sources(d1):
+    for n in range(6):
+        user_id = f"93{n}"
+        add_user(d1, user_id)
+        if n % 2:
+            add_profile(d1, user_id, f"p-{user_id}", active=True)
+        add_message(d1, user_id)
+
+    first = list_active_users(SINCE, limit=4)
+    rest = list_active_users(SINCE, after_user_id=first[-1]["user_id"], limit=4)
+
+    assert [r["user_id"] for r in first + rest] == [f"93{n}" for n in range(6)]
+    assert [r["profile_id"] for r in first + rest] == [None, "p-931", None, "p-933", None, "p-935"]
+
+
+def test_stored_horoscope_only_serves_its_profile(d1):
+    save_daily_horoscope("941", "2026-10-16", "en", "p-941", {"summary": "secondary"})
+
+    assert get_daily_horoscope("941", "2026-10-16", "en", "p-941") == {"summary": "secondary"}
+    assert get_daily_horoscope("941", "2026-10-16", "en", None) is None
+    assert get_daily_horoscope("941", "2026-10-16", "en", "p-other") is None
+
+    save_daily_horoscope("941", "2026-10-16", "en", None, {"summary": "main"})
+
+    assert get_daily_horoscope("941", "2026-10-16", "en", None) == {"summary": "main"}
+    assert get_daily_horoscope("941", "2026-10-16", "en", "p-941") is None
+
+
+def test_a_reading_for_another_profile_is_neither_settled_nor_blocks_a_claim(d1):
+    save_daily_horoscope("951", "2026-10-16", "en", None, {"summary": "main"})
+
+    assert settled_daily_horoscopes(["2026-10-16"], 3) == {("951", "2026-10-16", "en", "")}
+    assert not claim_daily_horoscope("951", "2026-10-16", "en", None, "w1", 60, 3)
+    assert claim_daily_horoscope("951", "2026-10-16", "en", "p-951", "w1", 60, 3)
+    row = d1.execute("SELECT profile_id, status, attempts FROM daily_horoscopes").fetchone()
+    assert dict(row) == {"profile_id": "p-951", "status": "pending", "attempts": 1}
@@ -0,0 +1,65 @@
+"""
+Session namespaces: in-place edits inside session_scope() are written back without
+undoing what another worker did meanwhile, and values read outside a scope refuse edits
+that would otherwise be lost.
+"""
+import copy
+
+import pytest
+
+from app.services.state.session_store import MemorySessionBackend, SessionStore, session_scope
+
+
+@pytest.fixture
+def users():
+    return SessionStore(MemorySessionBackend()).namespace("users", ttl=3600)
+
+
+def test_in_place_edits_are_written_back(users):
+    users["911"] = {"stage": "ask_dob", "answers": []}
+
+    with session_scope():
+        users["911"]["stage"] = "ask_time"
+        users["911"]["answers"].append("01/01/1990")
+
+    assert users["911"] == {"stage": "ask_time", "answers": ["01/01/1990"]}
+
+
+def test_concurrent_edits_to_other_fields_are_merged(users):
+    users["912"] = {"stage": "ask_dob", "language": "en"}
+
+    with session_scope():
+        users["912"]["stage"] = "ask_time"
+        users.store.backend.set("users", "912", '{"language": "hi", "stage": "ask_dob"}', 3600)
+
+    assert users["912"] == {"stage": "ask_time", "language": "hi"}
+
+
+def test_a_concurrent_delete_is_kept(users):
+    users["913"] = {"stage": "ask_dob"}
+
+    with session_scope():
+        users["913"]["stage"] = "ask_time"
+        users.store.backend.delete("users", "913")  # another worker finished the flow
+
+    assert "913" not in users
+
+
+def test_values_read_outside_a_scope_are_read_only(users):
+    users["914"] = {"stage": "ask_dob", "answers": ["x"], "meta": {"n": 1}}
+    value = users["914"]
+
+    with pytest.raises(TypeError):
+        value["stage"] = "ask_time"
+    with pytest.raises(TypeError):
+        value["answers"].append("y")
+    with pytest.raises(TypeError):
+        value["meta"].update(n=2)
+    assert value == {"stage": "ask_dob", "answers": ["x"], "meta": {"n": 1}}
+
+    edited = copy.deepcopy(value)
+    edited["meta"]["n"] = 2
+    users["914"] = edited
+    assert users["914"]["meta"] == {"n": 2}
+    assert users.pop("914")["stage"] == "ask_dob"
+    assert "914" not in users